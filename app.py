@@ -5,33 +5,78 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import os
+
 from flask import Flask
+from clock import register_request_clock
 from database import init_database, add_sample_data
+from profiler import enable_profiling, get_profiler
+from rendering import configure_templates, register_compression
 from routes import register_blueprints
+from services.event_service import register_availability_events
+from services.report_cache_service import register_report_cache
+from services.suggest_service import register_suggest_updates
+from services.rate_limit_service import register_rate_limits
 
 
-def create_app():
+def create_app(dev_mode=None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        dev_mode: Seed sample data when True. Defaults to the LIBRARY_DEV_MODE
+            environment variable so production workers never touch seed data.
+    
     Returns:
         Flask: Configured Flask application instance
     """
+    if dev_mode is None:
+        dev_mode = os.environ.get('LIBRARY_DEV_MODE', '') == '1'
+    
     app = Flask(__name__)
     app.secret_key = "super secret key"
+    app.config['DEV_MODE'] = dev_mode
+    # Load tests may set the request time via this header (e.g. X-Clock-Now)
+    app.config['CLOCK_HEADER'] = os.environ.get('LIBRARY_CLOCK_HEADER')
     
-    # Initialize the database
+    # Opt-in per-statement SQL timings and slow-query log (see /api/sql_profile)
+    if os.environ.get('LIBRARY_PROFILE_SQL', '') == '1' and get_profiler() is None:
+        enable_profiling()
+    
+    # Initialize the database (no-op when the schema version is current)
     init_database()
     
     # Add sample data for testing and demonstration
-    add_sample_data()
+    if dev_mode:
+        add_sample_data()
     
     # Register all route blueprints
     register_blueprints(app)
     
+    # Compile templates now rather than on the first request
+    configure_templates(app, dev_mode)
+    
+    # One consistent "now" per request
+    register_request_clock(app)
+    
+    # Reject over-limit clients before they reach the database
+    register_rate_limits(app)
+    
+    # gzip/brotli for text responses, negotiated from Accept-Encoding
+    register_compression(app)
+    
+    # Push committed availability changes to /api/availability/stream
+    register_availability_events()
+    
+    # Extend the autocomplete index as books are added
+    register_suggest_updates()
+    
+    # Drop cached patron reports when their loans or payments change
+    register_report_cache()
+    
     return app
 
 
 if __name__ == '__main__':
-    app = create_app()
+    app = create_app(dev_mode=True)
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,376 @@
+"""
+Batch Jobs Module - CPU-heavy batch jobs on a process pool
+
+A BatchJob works through one table in ID ranges (partitions). Each partition
+is read and computed in a worker process of a ProcessPoolExecutor, on its own
+read-only connection, so the Python loops run on every core. Results come
+back to the parent, which is the only writer: it applies them in batches of
+about WRITE_BATCH_ROWS results, one BEGIN IMMEDIATE transaction per batch, so
+workers never contend for the write lock and request handlers only wait for
+short commits.
+
+Partitions are written in completion order and each write replaces its whole
+ID range, so a cancelled or failed run can simply be run again. When a run is
+cancelled, the ranges it never reached are written with no results, so no
+results from an earlier run are left looking current.
+
+Jobs:
+    fees             late fee of every overdue active loan, into fee_assessments
+    import-validate  R1 rules on every staged row of book_imports
+
+Usage:
+    python batch_jobs.py fees [--workers N] [--partition-size N]
+    python batch_jobs.py import-validate [--csv FILE] [--workers N]
+
+Workers are forked from the parent on Linux and see its configuration (fee
+policies, patron classes). With the spawn start method they re-import it.
+"""
+
+import argparse
+import csv
+import os
+import signal
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import clock
+import database
+from database import from_epoch, get_db_connection, to_epoch
+from services.fee_service import get_policy
+from services.library_service import validate_book_fields
+
+# IDs per partition (one task for one worker)
+DEFAULT_PARTITION_SIZE = 5000
+
+# Results applied per writer transaction
+WRITE_BATCH_ROWS = 20000
+
+# Seconds between cancellation checks while waiting on workers
+POLL_SECONDS = 0.1
+
+
+class BatchJob(ABC):
+    """
+    A job over ID ranges of `table`.
+
+    Subclasses set `name` and `table` and implement:
+      - run_partition(conn, first_id, last_id): runs in a worker process on a
+        read-only connection, with clock.now() frozen at the job's start
+        time. Returns a list of results for write().
+      - write(conn, first_id, last_id, results): runs in the parent inside
+        the writer's transaction. It must replace everything the job owns
+        in the range, so partitions can be re-run; with no results it
+        clears the range.
+    prepare(conn, first_id, last_id) runs once in the parent before any
+    partition, e.g. to clear results outside the table's current ID range.
+
+    Instances are pickled to the workers, so keep them to plain attributes.
+    """
+
+    name: str = None
+    table: str = None
+
+    def prepare(self, conn, first_id: Optional[int], last_id: Optional[int]):
+        pass
+
+    @abstractmethod
+    def run_partition(self, conn, first_id: int, last_id: int) -> List:
+        """Compute the results for one ID range (in a worker process)."""
+
+    @abstractmethod
+    def write(self, conn, first_id: int, last_id: int, results: List):
+        """Replace the job's rows for one ID range (in the parent's transaction)."""
+
+
+def id_partitions(conn, table: str, partition_size: int = DEFAULT_PARTITION_SIZE) -> List[Tuple[int, int]]:
+    """Inclusive (first_id, last_id) ranges covering every row of `table`."""
+    low, high = conn.execute(f'SELECT MIN(id), MAX(id) FROM {table}').fetchone()
+    if low is None:
+        return []
+    return [(first, min(first + partition_size - 1, high))
+            for first in range(low, high + 1, partition_size)]
+
+
+def _run_partition(job: BatchJob, db_path: str, first_id: int, last_id: int, now: datetime):
+    """Worker entry point: one partition on a read-only connection."""
+    conn = database.open_read_only(db_path)
+    try:
+        with clock.frozen(now):
+            return first_id, last_id, job.run_partition(conn, first_id, last_id)
+    finally:
+        conn.close()
+
+
+class _Writer:
+    """The parent's single writer: buffers partition results and commits them in batches."""
+
+    def __init__(self, job: BatchJob, batch_rows: int):
+        self.job = job
+        self.batch_rows = batch_rows
+        self.conn = get_db_connection()
+        self.conn.isolation_level = None
+        self.pending: List[Tuple[int, int, List]] = []
+        self.pending_rows = 0
+        self.written = set()
+        self.partitions = 0
+        self.rows = 0
+        self.commits = 0
+
+    def prepare(self, first_id: Optional[int], last_id: Optional[int]):
+        self.conn.execute('BEGIN IMMEDIATE')
+        self.job.prepare(self.conn, first_id, last_id)
+        self.conn.execute('COMMIT')
+
+    def add(self, first_id: int, last_id: int, results: List):
+        self.pending.append((first_id, last_id, results))
+        self.pending_rows += len(results)
+        if self.pending_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            for first_id, last_id, results in self.pending:
+                self.job.write(self.conn, first_id, last_id, results)
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.written.update((first_id, last_id) for first_id, last_id, _ in self.pending)
+        self.partitions += len(self.pending)
+        self.rows += self.pending_rows
+        self.commits += 1
+        self.pending, self.pending_rows = [], 0
+
+    def clear(self, ranges: List[Tuple[int, int]]) -> int:
+        """Write the ranges not yet written with no results, in one transaction."""
+        unwritten = [r for r in ranges if r not in self.written]
+        if unwritten:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                for first_id, last_id in unwritten:
+                    self.job.write(self.conn, first_id, last_id, [])
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.commits += 1
+        return len(unwritten)
+
+    def close(self):
+        self.conn.close()
+
+
+def run_job(job: BatchJob, workers: Optional[int] = None, partition_size: int = DEFAULT_PARTITION_SIZE,
+            write_batch_rows: int = WRITE_BATCH_ROWS, progress: Optional[Callable[[Dict], None]] = None,
+            cancel: Optional[threading.Event] = None) -> Dict:
+    """
+    Run a job over all partitions of its table.
+
+    Args:
+        job: The BatchJob to run
+        workers: Worker processes (default: one per CPU)
+        partition_size: IDs per partition
+        write_batch_rows: Results applied per writer transaction
+        progress: Called with {'partitions_done', 'partitions_total', 'rows'}
+            each time a partition finishes
+        cancel: Set it (e.g. from a signal handler) to stop. Partitions not
+            yet started are dropped and their ranges cleared; finished ones
+            are still written.
+
+    Returns:
+        dict: partitions (total, written and cleared), rows written,
+        commits, workers, seconds and whether the run was cancelled
+    """
+    workers = workers or os.cpu_count() or 1
+    cancel = cancel or threading.Event()
+    now = clock.now()
+    started = time.perf_counter()
+
+    writer = _Writer(job, write_batch_rows)
+    try:
+        ranges = id_partitions(writer.conn, job.table, partition_size)
+        writer.prepare(ranges[0][0] if ranges else None, ranges[-1][1] if ranges else None)
+
+        done = 0
+        cleared = 0
+        cancelled = False
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {executor.submit(_run_partition, job, database.DATABASE, first_id, last_id, now)
+                       for first_id, last_id in ranges}
+            while pending:
+                if cancel.is_set():
+                    cancelled = True
+                    for future in pending:
+                        future.cancel()
+                finished, pending = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future.cancelled():
+                        continue
+                    writer.add(*future.result())
+                    done += 1
+                    if progress:
+                        progress({'partitions_done': done, 'partitions_total': len(ranges),
+                                  'rows': writer.rows + writer.pending_rows})
+        writer.flush()
+        if cancelled:
+            cleared = writer.clear(ranges)
+    finally:
+        writer.close()
+
+    return {
+        'job': job.name,
+        'partitions': len(ranges),
+        'partitions_written': writer.partitions,
+        'partitions_cleared': cleared,
+        'rows': writer.rows,
+        'commits': writer.commits,
+        'workers': workers,
+        'seconds': round(time.perf_counter() - started, 3),
+        'cancelled': cancelled,
+    }
+
+
+# --- Jobs -------------------------------------------------------------------
+
+class FeeAssessmentJob(BatchJob):
+    """Nightly late fee for every overdue active loan, under each patron's policy."""
+
+    name = 'fees'
+    table = 'borrow_records'
+
+    def prepare(self, conn, first_id, last_id):
+        # Loans outside the current ID range were archived or deleted
+        if first_id is None:
+            conn.execute('DELETE FROM fee_assessments')
+        else:
+            conn.execute('DELETE FROM fee_assessments WHERE loan_id < ? OR loan_id > ?', (first_id, last_id))
+
+    def run_partition(self, conn, first_id, last_id):
+        now = clock.now()
+        as_of = now.strftime('%Y-%m-%d')
+        results = []
+        for loan in conn.execute('''
+            SELECT id, patron_id, book_id, due_ts FROM borrow_records
+            WHERE id BETWEEN ? AND ? AND return_date IS NULL AND due_ts < ?
+        ''', (first_id, last_id, to_epoch(now))):
+            fee, days_overdue = get_policy(loan['patron_id']).assess(from_epoch(loan['due_ts']), now)
+            if days_overdue > 0:
+                results.append((loan['id'], loan['patron_id'], loan['book_id'], as_of,
+                                days_overdue, round(fee, 2)))
+        return results
+
+    def write(self, conn, first_id, last_id, results):
+        conn.execute('DELETE FROM fee_assessments WHERE loan_id BETWEEN ? AND ?', (first_id, last_id))
+        conn.executemany('''
+            INSERT INTO fee_assessments (loan_id, patron_id, book_id, as_of, days_overdue, fee_amount)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', results)
+
+
+class ImportValidationJob(BatchJob):
+    """
+    R1 rules on every staged book_imports row, plus ISBN uniqueness against
+    the catalog and earlier rows of the same import. stage_book_imports()
+    drops rows validated by earlier runs, so every row in the table belongs
+    to the current import.
+    """
+
+    name = 'import-validate'
+    table = 'book_imports'
+
+    def run_partition(self, conn, first_id, last_id):
+        in_catalog = {row[0] for row in conn.execute('''
+            SELECT isbn FROM books
+            WHERE isbn IN (SELECT isbn FROM book_imports WHERE id BETWEEN ? AND ?)
+        ''', (first_id, last_id))}
+        repeated = {row[0] for row in conn.execute('''
+            SELECT i.id FROM book_imports i
+            WHERE i.id BETWEEN ? AND ?
+              AND EXISTS (SELECT 1 FROM book_imports e WHERE e.isbn = i.isbn AND e.id < i.id)
+        ''', (first_id, last_id))}
+
+        results = []
+        for row in conn.execute('''
+            SELECT id, title, author, isbn, total_copies FROM book_imports WHERE id BETWEEN ? AND ?
+        ''', (first_id, last_id)):
+            isbn = row['isbn'] or ''
+            try:
+                total_copies = int(row['total_copies'])
+            except (TypeError, ValueError):
+                total_copies = None
+            error = validate_book_fields(row['title'] or '', row['author'] or '', isbn, total_copies)
+            if not error and isbn in in_catalog:
+                error = "A book with this ISBN already exists."
+            if not error and row['id'] in repeated:
+                error = "ISBN appears earlier in this import."
+            results.append(('invalid' if error else 'valid', error, row['id']))
+        return results
+
+    def write(self, conn, first_id, last_id, results):
+        conn.executemany('UPDATE book_imports SET status = ?, error = ? WHERE id = ?', results)
+
+
+JOBS = {job.name: job for job in (FeeAssessmentJob, ImportValidationJob)}
+
+
+def stage_book_imports(rows: Iterable[Dict]) -> int:
+    """
+    Add raw import rows ({'title', 'author', 'isbn', 'total_copies'}) to
+    book_imports as 'pending'.
+
+    Rows already validated by an earlier import are deleted first, so ISBNs
+    are only compared within the current import. Rows still pending (e.g.
+    from a cancelled run) are validated together with the new ones.
+
+    Returns:
+        int: Rows staged
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute("DELETE FROM book_imports WHERE status != 'pending'")
+        count = conn.executemany('''
+            INSERT INTO book_imports (title, author, isbn, total_copies) VALUES (?, ?, ?, ?)
+        ''', ((row.get('title'), row.get('author'), (row.get('isbn') or '').strip(), row.get('total_copies'))
+              for row in rows)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('job', choices=sorted(JOBS))
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPUs)')
+    parser.add_argument('--partition-size', type=int, default=DEFAULT_PARTITION_SIZE)
+    parser.add_argument('--csv', help='stage this CSV (title,author,isbn,total_copies) before validating')
+    args = parser.parse_args()
+
+    if args.csv:
+        with open(args.csv, newline='', encoding='utf-8') as source:
+            print(f"Staged {stage_book_imports(csv.DictReader(source))} rows", file=sys.stderr)
+
+    def report_progress(state):
+        print(f"\r{state['partitions_done']}/{state['partitions_total']} partitions, "
+              f"{state['rows']} rows", end='', file=sys.stderr)
+
+    # Ctrl-C stops handing out partitions; finished ones are still written
+    cancel = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: cancel.set())
+    report = run_job(JOBS[args.job](), args.workers, args.partition_size,
+                     progress=report_progress, cancel=cancel)
+    print(file=sys.stderr)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Batch Job Benchmark - scaling of batch_jobs.run_job() across worker processes
+
+Builds a temporary database with the requested number of active loans and
+staged import rows, then runs the fee and import-validation jobs with 1, 2,
+4, ... worker processes (up to --max-workers) and reports time and speedup
+over one worker.
+
+Usage:
+    python benchmarks/bench_batch_jobs.py [--loans N] [--imports N] [--max-workers N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clock
+import database
+from batch_jobs import FeeAssessmentJob, ImportValidationJob, run_job, stage_book_imports
+
+NOW = datetime(2026, 6, 1, 12, 0)
+
+
+def build_database(path: str, loans: int, imports: int):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, 100, 100)
+    ''', [(f'Book {i}', f'Author {i % 500}', f'{i:013d}') for i in range(1000)])
+
+    rng = random.Random(42)
+
+    def loan_rows():
+        for i in range(loans):
+            borrowed = NOW - timedelta(days=rng.randint(0, 60), minutes=rng.randint(0, 1440))
+            yield (f'{i % 20000:06d}', rng.randint(1, 1000), borrowed.isoformat(),
+                   (borrowed + timedelta(days=14)).isoformat())
+
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+        VALUES (?, ?, ?, ?)
+    ''', loan_rows())
+    conn.commit()
+    conn.close()
+
+    # Mostly valid rows, with some bad fields and ISBNs already in the catalog
+    stage_book_imports({
+        'title': '' if i % 50 == 0 else f'Imported {i}',
+        'author': f'Author {i % 700}',
+        'isbn': f'{rng.randint(0, 10 ** 7):013d}' if i % 40 == 0 else f'9{i:012d}',
+        'total_copies': 'x' if i % 90 == 0 else str(1 + i % 5),
+    } for i in range(imports))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=500000)
+    parser.add_argument('--imports', type=int, default=500000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    build_database(os.path.join(tempfile.mkdtemp(), 'library.db'), args.loans, args.imports)
+    print(f"{os.cpu_count()} CPUs, {args.loans} loans, {args.imports} import rows")
+
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    for job in (FeeAssessmentJob(), ImportValidationJob()):
+        baseline = None
+        for workers in counts:
+            with clock.frozen(NOW):
+                report = run_job(job, workers=workers)
+            baseline = baseline or report['seconds']
+            print(f"{job.name:>16} workers {workers:>2}: {report['seconds']:7.2f} s, "
+                  f"{report['rows']} rows in {report['commits']} commits, "
+                  f"speedup {baseline / report['seconds']:4.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Catalog Rendering Benchmark - time to first byte, total time and size of /catalog
+
+Builds a temporary catalog of the requested size and fetches the streamed
+catalog page uncompressed and with gzip (and brotli, if installed).
+
+Usage:
+    python benchmarks/bench_catalog_render.py [--books N] [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import rendering
+from app import create_app
+
+
+def fetch(client, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    start = time.perf_counter()
+    response = client.get('/catalog', headers=headers, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks, b''))
+    first_byte = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    response.close()
+    return first_byte * 1000, (time.perf_counter() - start) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, 3, ?)
+    ''', ((f'Book {i}', f'Author {i % 500}', f'{i:013d}', i % 4) for i in range(args.books)))
+    conn.commit()
+    conn.close()
+
+    client = create_app(dev_mode=False).test_client()
+    encodings = ['', 'gzip'] + (['br'] if rendering.brotli is not None else [])
+    for encoding in encodings:
+        samples = [fetch(client, encoding) for _ in range(args.runs)]
+        print(f"{encoding or 'identity':>8}: ttfb {statistics.median(s[0] for s in samples):7.2f} ms, "
+              f"total {statistics.median(s[1] for s in samples):8.2f} ms, "
+              f"{samples[0][2] / 1024:8.1f} KiB for {args.books} books")
+
+
+if __name__ == '__main__':
+    main()
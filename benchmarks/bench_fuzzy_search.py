@@ -0,0 +1,78 @@
+"""
+Fuzzy Search Benchmark - latency of typo-tolerant search on a large catalog
+
+Builds a temporary catalog of synthetic titles/authors, indexes it, then times
+fuzzy queries with one or two typos.
+
+Usage:
+    python benchmarks/bench_fuzzy_search.py [--books N] [--queries N]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from search_index import index_book
+from services.library_service import search_books_in_catalog
+
+SYLLABLES = [c + v + e for c in 'bcdfghklmnprstvwz' for v in 'aeiou' for e in ('', 'n', 'r', 'l')]
+
+
+def make_word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def typo(rng, word):
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    database.init_database()
+
+    authors = [f'{make_word(rng).title()} {make_word(rng).title()}' for _ in range(args.books // 10 + 1)]
+    conn = database.get_db_connection()
+    start = time.perf_counter()
+    for i in range(args.books):
+        title = ' '.join(make_word(rng) for _ in range(rng.randint(1, 4))).title()
+        author = rng.choice(authors)
+        cursor = conn.execute('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES (?, ?, ?, 1, 1)
+        ''', (title, author, f'{i:013d}'))
+        index_book(conn, cursor.lastrowid, title, author)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    print(f"indexed {args.books} books in {time.perf_counter() - start:.1f} s")
+
+    samples = []
+    for _ in range(args.queries):
+        surname = rng.choice(authors).split()[-1]
+        query = typo(rng, surname.lower())
+        start = time.perf_counter()
+        search_books_in_catalog(query, 'author', fuzzy=True)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    print(f"median: {statistics.median(samples):.2f} ms")
+    print(f"p95:    {samples[int(len(samples) * 0.95) - 1]:.2f} ms")
+    print(f"max:    {samples[-1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
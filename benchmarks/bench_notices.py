@@ -0,0 +1,82 @@
+"""
+Overdue Notice Benchmark - throughput and memory of the notice pipeline
+
+Builds a temporary database with the requested number of patrons and active
+loans (a fraction of them overdue), then times spool_overdue_notices().
+
+Usage:
+    python benchmarks/bench_notices.py [--patrons N] [--loans-per-patron N] [--format FMT]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.notice_service import NOTICE_FORMATS, spool_overdue_notices
+
+
+def build_database(path: str, patrons: int, loans_per_patron: int, now: datetime):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, 100, 100)
+    ''', [(f'Book {i}', f'Author {i % 500}', f'{i:013d}') for i in range(1000)])
+
+    rng = random.Random(42)
+
+    def loans():
+        for patron in range(patrons):
+            for _ in range(loans_per_patron):
+                borrowed = now - timedelta(days=rng.randint(0, 40), minutes=rng.randint(0, 1440))
+                yield (f'{patron:06d}', rng.randint(1, 1000), borrowed.isoformat(),
+                       (borrowed + timedelta(days=14)).isoformat())
+
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+        VALUES (?, ?, ?, ?)
+    ''', loans())
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--patrons', type=int, default=20000)
+    parser.add_argument('--loans-per-patron', type=int, default=5)
+    parser.add_argument('--format', choices=NOTICE_FORMATS, default='jsonl')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    now = datetime.now()
+    build_database(os.path.join(workdir, 'library.db'), args.patrons, args.loans_per_patron, now)
+
+    start = time.perf_counter()
+    result = spool_overdue_notices(args.format, os.path.join(workdir, 'spool'), now)
+    elapsed = time.perf_counter() - start
+
+    # Separate run for memory, since tracing slows allocation down a lot
+    tracemalloc.start()
+    spool_overdue_notices(args.format, os.path.join(workdir, 'spool'), now)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    loans = args.patrons * args.loans_per_patron
+    print(f"loans scanned:   {loans}")
+    print(f"notices written: {result['notices']}")
+    print(f"elapsed:         {elapsed:.2f} s")
+    print(f"throughput:      {result['notices'] / elapsed:,.0f} notices/s")
+    print(f"peak memory:     {peak / 1024:,.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Repository Benchmark - batch checkout on the SQLite and in-memory backends
+
+Runs the same borrow_books_by_patron/return_books_by_patron cycle against a
+temporary SQLite file and a MemoryStore, so the cost of storage can be told
+apart from the cost of the business rules.
+
+Usage:
+    python benchmarks/bench_repository.py [--books N] [--cycles N] [--batch N]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clock
+import database
+import repository
+from services.library_service import borrow_books_by_patron, return_books_by_patron
+
+# Fixed time so every run stamps the same borrow and due dates
+BENCH_NOW = datetime(2026, 1, 5, 12, 0)
+
+
+def run(label, cycles, batch, books):
+    samples = []
+    for cycle in range(cycles):
+        patron_id = f'{cycle % 900000 + 100000:06d}'
+        book_ids = [(cycle * batch + i) % books + 1 for i in range(batch)]
+        start = time.perf_counter()
+        with clock.frozen(BENCH_NOW):
+            borrow_books_by_patron(patron_id, book_ids)
+            return_books_by_patron(patron_id, book_ids)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    print(f"{label:>7}: median {statistics.median(samples):.3f} ms, "
+          f"p99 {samples[int(len(samples) * 0.99) - 1]:.3f} ms per borrow+return of {batch}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--cycles', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=5)
+    args = parser.parse_args()
+
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    database.init_database()
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, 'Author', ?, 3, 3)
+    ''', ((f'Book {i}', f'{i:013d}') for i in range(args.books)))
+    conn.commit()
+    conn.close()
+    run('sqlite', args.cycles, args.batch, args.books)
+
+    store = repository.MemoryStore()
+    for i in range(args.books):
+        store.add_book(f'Book {i}', 'Author', f'{i:013d}', 3)
+    repository.STORE = store
+    run('memory', args.cycles, args.batch, args.books)
+
+
+if __name__ == '__main__':
+    main()
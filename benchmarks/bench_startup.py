@@ -0,0 +1,55 @@
+"""
+Startup Benchmark - measures cold start time of create_app()
+
+Each sample runs in a fresh interpreter so import costs are included, which is
+what every new worker pays. The first sample builds the schema; the rest hit
+the schema-version fast path.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--db PATH]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_CODE = (
+    "import database; database.DATABASE = {db!r}; "
+    "from app import create_app; create_app()"
+)
+
+
+def time_cold_start(db_path: str) -> float:
+    """Run create_app() in a new interpreter and return wall time in ms."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", STARTUP_CODE.format(db=db_path)],
+        cwd=ROOT, check=True, env={**os.environ, "LIBRARY_DEV_MODE": "0"},
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--db', default=None, help='database file (default: temp file)')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'library.db')
+
+    first = time_cold_start(db_path)
+    samples = [time_cold_start(db_path) for _ in range(args.runs)]
+
+    print(f"first start (schema build): {first:8.1f} ms")
+    print(f"warm schema, median:        {statistics.median(samples):8.1f} ms")
+    print(f"warm schema, max:           {max(samples):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
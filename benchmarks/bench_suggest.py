@@ -0,0 +1,71 @@
+"""
+Suggest Benchmark - autocomplete latency on a large catalog
+
+Builds a temporary catalog with synthetic titles/authors and random loan
+counts, builds the prefix index, then times suggest() for 1-4 character prefixes.
+
+Usage:
+    python benchmarks/bench_suggest.py [--books N] [--queries N]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.suggest_service import SuggestIndex
+
+LETTERS = 'abcdefghiklmnoprstuvw'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    database.DATABASE = os.path.join(tempfile.mkdtemp(), 'library.db')
+    database.init_database()
+
+    def word():
+        return ''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 9)))
+
+    conn = database.get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, 1, 1)
+    ''', ((' '.join(word() for _ in range(rng.randint(1, 4))), f'{word()} {word()}', f'{i:013d}')
+          for i in range(args.books)))
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES ('123456', ?, '2026-01-01T00:00:00', '2026-01-15T00:00:00', '2026-01-10T00:00:00')
+    ''', ((int(rng.paretovariate(1.2)) % args.books + 1,) for _ in range(args.books)))
+    conn.commit()
+    conn.close()
+
+    index = SuggestIndex()
+    start = time.perf_counter()
+    index.refresh(force=True)
+    print(f"built index over {args.books} books in {time.perf_counter() - start:.2f} s")
+
+    for length in (1, 2, 3, 4):
+        samples = []
+        for _ in range(args.queries):
+            prefix = ''.join(rng.choice(LETTERS) for _ in range(length))
+            start = time.perf_counter()
+            index.suggest(prefix)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        print(f"prefix length {length}: median {statistics.median(samples):.3f} ms, "
+              f"p99 {samples[int(len(samples) * 0.99) - 1]:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Clock Module - The single source of "now" for business logic
+
+Code that needs the current time calls clock.now() instead of datetime.now().
+Inside a frozen() block every call returns the same instant, so one request or
+batch job sees one consistent time: a report can't count a loan as overdue in
+one row and not the next, and a benchmark run is reproducible.
+
+    with clock.frozen(datetime(2026, 3, 1)):
+        borrow_book_by_patron("123456", 1)      # borrowed and due relative to Mar 1
+
+The app freezes the clock once per request (register_request_clock). When
+app.config['CLOCK_HEADER'] is set (load tests only, never production) a request
+can supply its own time in that header as ISO-8601, which lets a replay drive
+months of simulated loans through the HTTP API in seconds.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+# Where now() reads the time outside frozen() blocks; tests may swap it
+source: Callable[[], datetime] = datetime.now
+
+_frozen: ContextVar[Optional[datetime]] = ContextVar('library_clock', default=None)
+
+
+def now() -> datetime:
+    """The frozen time for this request or job, else the current time."""
+    value = _frozen.get()
+    return value if value is not None else source()
+
+
+@contextmanager
+def frozen(at: Optional[datetime] = None) -> Iterator[datetime]:
+    """Fix now() to `at` (default: the current time) for the duration of the block."""
+    value = at or source()
+    token = _frozen.set(value)
+    try:
+        yield value
+    finally:
+        _frozen.reset(token)
+
+
+def register_request_clock(app):
+    """Freeze the clock for each request handled by `app`."""
+    from flask import g, request
+
+    @app.before_request
+    def freeze_clock():
+        at = None
+        header = app.config.get('CLOCK_HEADER')
+        if header and request.headers.get(header):
+            try:
+                at = datetime.fromisoformat(request.headers[header])
+            except ValueError:
+                at = None
+        g.clock_token = _frozen.set(at or source())
+
+    @app.teardown_request
+    def release_clock(exc):
+        token = g.pop('clock_token', None)
+        if token is not None:
+            _frozen.reset(token)
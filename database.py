@@ -3,50 +3,325 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import os
 import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import clock
+from search_index import index_book
 
 # Database configuration
 DATABASE = 'library.db'
 
+# Optional separate file for archived loans; None keeps them in the main file
+ARCHIVE_DATABASE = None
+
+# Optional snapshot file that heavy read endpoints are served from. A read that
+# finds the snapshot older than READ_REPLICA_MAX_STALENESS seconds starts a
+# background refresh and is served from the current snapshot meanwhile. None
+# serves reads from DATABASE directly.
+READ_REPLICA = None
+READ_REPLICA_MAX_STALENESS = 5.0
+
+# A refresh lock file older than this (seconds) was left by a crashed process
+READ_REPLICA_LOCK_TIMEOUT = 300.0
+
+# After a refresh abandoned under heavy writes (see COPY_MAX_RESTARTS), wait
+# this long (seconds) before trying again; the old snapshot is served meanwhile
+READ_REPLICA_RETRY_DELAY = 30.0
+
+# Online copies (replica refreshes, backups) copy this many pages per step and
+# pause between steps so live traffic keeps the disk and the write lock
+COPY_PAGES_PER_STEP = 256
+COPY_STEP_PAUSE = 0.005
+
+# A write on another connection restarts a paged copy from the first page;
+# after this many restarts the copy is abandoned (CopyAbandoned) rather than
+# taken in one step, which would hold a read lock and block writers for its
+# whole length under the rollback journal
+COPY_MAX_RESTARTS = 5
+
+# Branch that copies are shelved at unless another branch is given
+DEFAULT_BRANCH = 'Main'
+
+# Connection class for get_db_connection() and the read connections; set by
+# profiler.enable_profiling(). None opens plain sqlite3 connections.
+CONNECTION_FACTORY = None
+
+_replica_lock = threading.Lock()
+_replica_refresher: Optional[threading.Thread] = None
+_replica_refresher_lock = threading.Lock()
+_replica_retry_at = 0.0
+
+ARCHIVE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY,
+        patron_id TEXT NOT NULL,
+        book_id INTEGER NOT NULL,
+        borrow_date TEXT NOT NULL,
+        due_date TEXT NOT NULL,
+        return_date TEXT NOT NULL
+    )
+'''
+
+# Loan dates are also stored as integer seconds since this (naive) epoch
+EPOCH = datetime(1970, 1, 1)
+SECONDS_PER_DAY = 86400
+
+# SQL for the epoch day number of an ISO-8601 TEXT date column
+DAY_SQL = "CAST(strftime('%s', {column}) AS INTEGER) / 86400"
+
+def to_epoch(value: datetime) -> int:
+    """Convert a naive datetime to the integer epoch seconds used in *_ts columns."""
+    return int((value - EPOCH).total_seconds())
+
+def from_epoch(seconds: int) -> datetime:
+    """Convert *_ts epoch seconds back to a naive datetime."""
+    return EPOCH + timedelta(seconds=seconds)
+
+# Callables notified with [{'book_id', 'available_copies', 'total_copies'}, ...]
+# after a write that changes availability has committed
+availability_listeners: List[Callable[[List[Dict]], None]] = []
+
+# Callables notified with the new book's row after insert_book() commits
+book_insert_listeners: List[Callable[[Dict], None]] = []
+
+# Callables notified with a patron ID after a write to that patron's loans or
+# payments has committed
+patron_listeners: List[Callable[[str], None]] = []
+
+def notify_availability_change(conn, book_ids: Iterable[int]):
+    """Send the current counts for the given books to availability listeners."""
+    book_ids = list(set(book_ids))
+    if not availability_listeners or not book_ids:
+        return
+    placeholders = ','.join('?' * len(book_ids))
+    changes = [dict(row) for row in conn.execute(f'''
+        SELECT id AS book_id, available_copies, total_copies
+        FROM books WHERE id IN ({placeholders})
+    ''', book_ids)]
+    for listener in availability_listeners:
+        listener(changes)
+
+def notify_patron_change(patron_ids: Iterable[str]):
+    """Tell patron listeners that these patrons' loans or payments changed."""
+    for patron_id in set(patron_ids):
+        for listener in patron_listeners:
+            listener(patron_id)
+
+def _connect(database: str, **kwargs):
+    if CONNECTION_FACTORY is not None:
+        kwargs['factory'] = CONNECTION_FACTORY
+    return sqlite3.connect(database, **kwargs)
+
 def get_db_connection():
     """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+    conn = _connect(DATABASE)
     conn.row_factory = sqlite3.Row  # This enables column access by name
     return conn
 
-def init_database():
-    """Initialize the database with required tables."""
-    conn = get_db_connection()
-    
-    # Create books table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT UNIQUE NOT NULL,
-            total_copies INTEGER NOT NULL,
-            available_copies INTEGER NOT NULL
-        )
-    ''')
-    
-    # Create borrow_records table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS borrow_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patron_id TEXT NOT NULL,
-            book_id INTEGER NOT NULL,
-            borrow_date TEXT NOT NULL,
-            due_date TEXT NOT NULL,
-            return_date TEXT,
-            FOREIGN KEY (book_id) REFERENCES books (id)
-        )
-    ''')
+class CopyAbandoned(sqlite3.OperationalError):
+    """A paged copy was restarted by concurrent writes more than its limit allows."""
+
+def copy_database(source, path: str, pages_per_step: int = COPY_PAGES_PER_STEP,
+                  pause: float = COPY_STEP_PAUSE, max_restarts: int = COPY_MAX_RESTARTS) -> int:
+    """
+    Copy a live database into a new file at `path`.
     
-    conn.commit()
+    Uses the online backup API `pages_per_step` pages at a time with a pause
+    after each step, so writers only wait for one short step. Every write on
+    another connection restarts the copy. After `max_restarts` restarts the
+    copy is given up and the partial file removed; callers retry later.
+    
+    Returns:
+        int: Pages in the copy
+        
+    Raises:
+        CopyAbandoned: If writes restarted the copy too often
+    """
+    state = {'pages': 0, 'remaining': None, 'restarts': 0}
+
+    def throttle(status, remaining, total):
+        if state['remaining'] is not None and remaining >= state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise CopyAbandoned(f"Copy restarted {state['restarts']} times by concurrent writes.")
+        state['pages'], state['remaining'] = total, remaining
+        if remaining and pause:
+            time.sleep(pause)
+
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target, pages=pages_per_step, progress=throttle)
+    except BaseException:
+        target.close()
+        os.remove(path)
+        raise
+    target.close()
+    return state['pages']
+
+def _replica_age() -> float:
+    """Seconds since the replica file was last replaced (by any process)."""
+    try:
+        return time.time() - os.path.getmtime(READ_REPLICA)
+    except OSError:
+        return float('inf')
+
+def _take_lock_file(path: str) -> bool:
+    """Create `path` exclusively, breaking it first if it is older than READ_REPLICA_LOCK_TIMEOUT."""
+    try:
+        if time.time() - os.path.getmtime(path) > READ_REPLICA_LOCK_TIMEOUT:
+            os.remove(path)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+def refresh_read_replica(force: bool = False) -> bool:
+    """
+    Rebuild READ_REPLICA from the primary database if it is too stale.
+    
+    The snapshot is built in a temporary file with copy_database() and then
+    renamed over the replica, so connections already open keep reading the
+    previous snapshot and new ones see the new one whole. A lock file next
+    to the replica lets only one worker process refresh at a time; the
+    staleness check is repeated once it is held.
+    
+    The copy never takes a long read lock on the primary: if writes keep
+    restarting it, it is abandoned and the previous snapshot stays.
+    
+    Returns:
+        bool: True if a refresh was performed
+        
+    Raises:
+        CopyAbandoned: If concurrent writes restarted the copy too often
+    """
+    with _replica_lock:
+        if not force and _replica_age() <= READ_REPLICA_MAX_STALENESS:
+            return False
+        lock_path = READ_REPLICA + '.lock'
+        if not _take_lock_file(lock_path):
+            return False
+        try:
+            if not force and _replica_age() <= READ_REPLICA_MAX_STALENESS:
+                return False
+            tmp_path = f'{READ_REPLICA}.{os.getpid()}.tmp'
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            source = get_db_connection()
+            try:
+                copy_database(source, tmp_path)
+            finally:
+                source.close()
+            os.replace(tmp_path, READ_REPLICA)
+            return True
+        finally:
+            os.remove(lock_path)
+
+def _refresh_replica_quietly():
+    global _replica_retry_at
+    try:
+        refresh_read_replica()
+    except (sqlite3.Error, OSError):
+        # Keep serving the current snapshot and let the writers settle
+        _replica_retry_at = time.time() + READ_REPLICA_RETRY_DELAY
+
+def _start_replica_refresh():
+    """Refresh READ_REPLICA on a background thread unless one is already running."""
+    global _replica_refresher
+    with _replica_refresher_lock:
+        if _replica_refresher is not None and _replica_refresher.is_alive():
+            return
+        _replica_refresher = threading.Thread(target=_refresh_replica_quietly,
+                                              name='read-replica-refresh', daemon=True)
+        _replica_refresher.start()
+
+def wait_for_replica_refresh(timeout: Optional[float] = None):
+    """Block until this process's background replica refresh (if any) finishes."""
+    refresher = _replica_refresher
+    if refresher is not None:
+        refresher.join(timeout)
+
+def get_read_connection():
+    """
+    Get a read-only connection for catalog, search and report queries.
+    
+    Served from READ_REPLICA if configured, otherwise from the primary file
+    opened read-only. A stale replica is refreshed in the background and
+    still served; until the first snapshot exists reads go to the primary.
+    A failed refresh is retried after READ_REPLICA_RETRY_DELAY seconds.
+    """
+    path = DATABASE
+    if READ_REPLICA:
+        if _replica_age() > READ_REPLICA_MAX_STALENESS and time.time() >= _replica_retry_at:
+            _start_replica_refresh()
+        if os.path.exists(READ_REPLICA):
+            path = READ_REPLICA
+    return open_read_only(path)
+
+def open_read_only(path: str):
+    """Open an existing SQLite file in read-only mode."""
+    conn = _connect(Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def get_schema_version(conn) -> int:
+    """Get the schema version recorded in the database file."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def attach_archive(conn) -> str:
+    """
+    Make the loan archive visible on a connection.
+    
+    Returns:
+        str: Qualified name of the archive table to use in queries
+    """
+    if not ARCHIVE_DATABASE:
+        return 'borrow_records_archive'
+    
+    attached = [row['name'] for row in conn.execute('PRAGMA database_list')]
+    if 'archive' not in attached:
+        conn.execute('ATTACH DATABASE ? AS archive', (ARCHIVE_DATABASE,))
+        conn.execute(ARCHIVE_TABLE_SQL.format(table='archive.borrow_records_archive'))
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_patron ON borrow_records_archive (patron_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_borrow_date ON borrow_records_archive (borrow_date)')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_return_date ON borrow_records_archive (return_date)')
+    return 'archive.borrow_records_archive'
+
+def init_database() -> bool:
+    """
+    Initialize the database by applying any pending schema migrations.
+    
+    Skips all schema work when the database already reports the current
+    schema version, so repeated worker start-ups only pay for one PRAGMA read.
+    
+    Returns:
+        bool: True if schema work was performed, False if it was already current
+    """
+    from migrations import latest_version, migrate
+    
+    conn = get_db_connection()
+    current = get_schema_version(conn)
     conn.close()
+    
+    if ARCHIVE_DATABASE:
+        # Create the archive file up front so read-only connections can attach it
+        conn = get_db_connection()
+        attach_archive(conn)
+        conn.close()
+    
+    if current >= latest_version():
+        return False
+    
+    migrate()
+    return True
 
 def add_sample_data():
     """Add sample data to the database if it's empty."""
@@ -62,18 +337,20 @@ def add_sample_data():
         ]
         
         for title, author, isbn, copies in sample_books:
-            conn.execute('''
+            cursor = conn.execute('''
                 INSERT INTO books (title, author, isbn, total_copies, available_copies)
                 VALUES (?, ?, ?, ?, ?)
             ''', (title, author, isbn, copies, copies))
+            index_book(conn, cursor.lastrowid, title, author)
+            create_copies(conn, cursor.lastrowid, ['available'] * copies)
         
-        # Make 1984 unavailable by adding a borrow record
+        # Make 1984 unavailable by adding a borrow record (a trigger checks out its copy)
         conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', ('123456', 3, 
-              (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
+              (clock.now() - timedelta(days=5)).isoformat(),
+              (clock.now() + timedelta(days=9)).isoformat()))
         
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
@@ -86,7 +363,7 @@ def add_sample_data():
 
 def get_all_books() -> List[Dict]:
     """Get all books from the database."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
     conn.close()
     return [dict(book) for book in books]
@@ -107,14 +384,18 @@ def get_book_by_isbn(isbn: str) -> Optional[Dict]:
 
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
+    now_ts = to_epoch(clock.now())
     conn = get_db_connection()
+    # Dates come back as integers and the overdue test runs in SQL,
+    # so no per-row string parsing is needed
     records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+        SELECT br.book_id, br.borrow_ts, br.due_ts, br.due_ts < ? AS is_overdue,
+               b.title, b.author
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
-        ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
+        ORDER BY br.borrow_ts
+    ''', (now_ts, patron_id)).fetchall()
     conn.close()
     
     borrowed_books = []
@@ -123,13 +404,61 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
             'book_id': record['book_id'],
             'title': record['title'],
             'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+            'borrow_date': from_epoch(record['borrow_ts']),
+            'due_date': from_epoch(record['due_ts']),
+            'is_overdue': bool(record['is_overdue'])
         })
     
     return borrowed_books
 
+def iter_overdue_loans(now: datetime) -> Iterator[Dict]:
+    """
+    Stream every active overdue loan, grouped by patron then due date.
+    
+    Rows come straight off an index-ordered cursor, so memory use does not grow
+    with the number of loans. Days overdue are computed in SQL from the integer
+    day numbers, matching the R5 calendar-day rule.
+    """
+    today = to_epoch(now) // SECONDS_PER_DAY
+    conn = get_read_connection()
+    try:
+        cursor = conn.execute('''
+            SELECT br.id, br.patron_id, br.book_id, br.due_ts,
+                   ? - br.due_ts / 86400 AS days_overdue,
+                   b.title, b.author
+            FROM borrow_records br
+            JOIN books b ON br.book_id = b.id
+            WHERE br.return_date IS NULL AND br.due_ts < ? * 86400
+            ORDER BY br.patron_id, br.due_ts
+        ''', (today, today))
+        for record in cursor:
+            yield dict(record)
+    finally:
+        conn.close()
+
+def get_overdue_loans(now: datetime) -> List[Dict]:
+    """Get every active overdue loan, grouped by patron."""
+    return list(iter_overdue_loans(now))
+
+def get_patron_borrow_history(patron_id: str) -> List[Dict]:
+    """Get all loans for a patron, newest first, including archived ones."""
+    conn = get_read_connection()
+    archive_table = attach_archive(conn)
+    records = conn.execute(f'''
+        SELECT h.book_id, h.borrow_date, h.due_date, h.return_date, b.title, b.author
+        FROM (
+            SELECT book_id, borrow_date, due_date, return_date
+            FROM borrow_records WHERE patron_id = ?
+            UNION ALL
+            SELECT book_id, borrow_date, due_date, return_date
+            FROM {archive_table} WHERE patron_id = ?
+        ) h
+        JOIN books b ON h.book_id = b.id
+        ORDER BY h.borrow_date DESC
+    ''', (patron_id, patron_id)).fetchall()
+    conn.close()
+    return [dict(record) for record in records]
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
     conn = get_db_connection()
@@ -144,40 +473,232 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
     """Insert a new book into the database."""
     conn = get_db_connection()
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             INSERT INTO books (title, author, isbn, total_copies, available_copies)
             VALUES (?, ?, ?, ?, ?)
         ''', (title, author, isbn, total_copies, available_copies))
+        index_book(conn, cursor.lastrowid, title, author)
+        create_copies(conn, cursor.lastrowid, ['available'] * available_copies
+                      + ['missing'] * max(total_copies - available_copies, 0))
         conn.commit()
+        notify_availability_change(conn, [cursor.lastrowid])
+        if book_insert_listeners:
+            book = dict(conn.execute('SELECT * FROM books WHERE id = ?', (cursor.lastrowid,)).fetchone())
+            for listener in book_insert_listeners:
+                listener(book)
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
 
-def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
-    """Insert a new borrow record into the database."""
+def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                         copy_id: Optional[int] = None) -> bool:
+    """
+    Insert a new borrow record into the database.
+    
+    Without copy_id a trigger checks out the patron's held copy or the
+    first available one; with copy_id that copy must be available.
+    """
     conn = get_db_connection()
     try:
         conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, copy_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat(), copy_id))
         conn.commit()
         conn.close()
+        notify_patron_change([patron_id])
         return True
     except Exception as e:
         conn.close()
         return False
 
+def create_copies(conn, book_id: int, statuses: List[str], branch: str = DEFAULT_BRANCH) -> List[int]:
+    """
+    Add physical copies of a book, one per status, on the caller's transaction.
+    
+    Barcodes are the book ID plus a per-book sequence number (e.g. B000042-003).
+    
+    Returns:
+        list: IDs of the new copies, in the order of `statuses`
+    """
+    count = conn.execute('SELECT COUNT(*) FROM copies WHERE book_id = ?', (book_id,)).fetchone()[0]
+    copy_ids = []
+    for offset, status in enumerate(statuses, start=1):
+        cursor = conn.execute('''
+            INSERT INTO copies (book_id, barcode, branch, status) VALUES (?, ?, ?, ?)
+        ''', (book_id, f'B{book_id:06d}-{count + offset:03d}', branch, status))
+        copy_ids.append(cursor.lastrowid)
+    return copy_ids
+
+def get_copy_by_barcode(barcode: str) -> Optional[Dict]:
+    """Get a physical copy by barcode."""
+    conn = get_db_connection()
+    copy = conn.execute('SELECT * FROM copies WHERE barcode = ?', (barcode,)).fetchone()
+    conn.close()
+    return dict(copy) if copy else None
+
+def get_available_copy(book_id: int, branch: str) -> Optional[Dict]:
+    """Get an on-shelf copy of a book at a branch."""
+    conn = get_db_connection()
+    copy = conn.execute('''
+        SELECT * FROM copies WHERE book_id = ? AND status = 'available' AND branch = ?
+        ORDER BY id LIMIT 1
+    ''', (book_id, branch)).fetchone()
+    conn.close()
+    return dict(copy) if copy else None
+
+def get_branch_availability(branch: Optional[str] = None, book_id: Optional[int] = None) -> List[Dict]:
+    """
+    Count on-shelf copies per book and branch.
+    
+    Both filters are answered from covering indexes on copies.
+    
+    Returns:
+        list: {'book_id', 'branch', 'available_copies'} for rows with copies on the shelf
+    """
+    clauses, params = ["status = 'available'"], []
+    if branch is not None:
+        clauses.append('branch = ?')
+        params.append(branch)
+    if book_id is not None:
+        clauses.append('book_id = ?')
+        params.append(book_id)
+    conn = get_read_connection()
+    try:
+        rows = conn.execute(f'''
+            SELECT book_id, branch, COUNT(*) AS available_copies FROM copies
+            WHERE {' AND '.join(clauses)}
+            GROUP BY book_id, branch
+            ORDER BY book_id, branch
+        ''', params).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+def assign_copies_to_holds(conn, returned: Dict[int, int]) -> Dict[int, int]:
+    """
+    Hand returned copies to waiting holds in FIFO order, on the caller's transaction.
+    
+    Args:
+        conn: Open connection; the caller commits
+        returned: Number of copies returned per book ID
+        
+    Returns:
+        dict: Copies per book ID left over for the shelf
+    """
+    if not returned:
+        return {}
+    
+    placeholders = ','.join('?' * len(returned))
+    waiting = conn.execute(f'''
+        SELECT id, book_id FROM holds
+        WHERE status = 'waiting' AND book_id IN ({placeholders})
+        ORDER BY book_id, position
+    ''', list(returned)).fetchall()
+    
+    leftover = dict(returned)
+    ready = []
+    for hold in waiting:
+        if leftover[hold['book_id']] > 0:
+            leftover[hold['book_id']] -= 1
+            ready.append(hold['id'])
+    
+    now = clock.now().isoformat()
+    conn.executemany("UPDATE holds SET status = 'ready', ready_at = ? WHERE id = ?",
+                     [(now, hold_id) for hold_id in ready])
+    return leftover
+
 def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
+    """
+    Update the available copies of a book by a given amount (+1 for return, -1 for borrow).
+    
+    Returned copies go to the next waiting hold first, in the same transaction,
+    and only the remainder is put back on the shelf.
+    """
     conn = get_db_connection()
     try:
+        if change > 0:
+            change = assign_copies_to_holds(conn, {book_id: change})[book_id]
         conn.execute('''
             UPDATE books SET available_copies = available_copies + ? WHERE id = ?
         ''', (change, book_id))
         conn.commit()
+        if change:
+            notify_availability_change(conn, [book_id])
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def get_latest_change_seq() -> int:
+    """Get the sequence number of the newest change_log entry (0 if empty)."""
+    conn = get_db_connection()
+    seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+    conn.close()
+    return seq
+
+def iter_changes(since: int, limit: int) -> Iterator[Dict]:
+    """
+    Stream change_log entries with seq > since, oldest first.
+    
+    seq is the rowid, so this is a primary-key range scan whose cost depends
+    only on the number of changes returned.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            SELECT seq, table_name, row_id, op, row, changed_at FROM change_log
+            WHERE seq > ? ORDER BY seq LIMIT ?
+        ''', (since, limit))
+        for record in cursor:
+            yield dict(record)
+    finally:
+        conn.close()
+
+def prune_change_log(up_to_seq: int) -> int:
+    """
+    Delete change_log entries every consumer has already read (DELETE /api/changes).
+    
+    Returns:
+        int: Rows deleted
+    """
+    conn = get_db_connection()
+    deleted = conn.execute('DELETE FROM change_log WHERE seq <= ?', (up_to_seq,)).rowcount
+    conn.commit()
+    conn.close()
+    return deleted
+
+def get_ready_hold(patron_id: str, book_id: int) -> Optional[Dict]:
+    """Get a patron's hold on a book whose copy is waiting for pickup."""
+    conn = get_db_connection()
+    hold = conn.execute('''
+        SELECT * FROM holds WHERE patron_id = ? AND book_id = ? AND status = 'ready'
+    ''', (patron_id, book_id)).fetchone()
+    conn.close()
+    return dict(hold) if hold else None
+
+def fulfill_hold(hold_id: int, release_held_copy: bool = False) -> bool:
+    """
+    Mark a ready hold as picked up.
+    
+    With release_held_copy, the patron took another copy off the shelf, so
+    the copy set aside for the hold goes back on the shelf in the same
+    transaction (the shelf count is unchanged: one copy left, one came back).
+    """
+    conn = get_db_connection()
+    try:
+        if release_held_copy:
+            conn.execute('''
+                UPDATE copies SET status = 'available' WHERE id = (
+                    SELECT id FROM copies
+                    WHERE book_id = (SELECT book_id FROM holds WHERE id = ?) AND status = 'held'
+                    ORDER BY id LIMIT 1)
+            ''', (hold_id,))
+        conn.execute("UPDATE holds SET status = 'fulfilled' WHERE id = ?", (hold_id,))
+        conn.commit()
         conn.close()
         return True
     except Exception as e:
@@ -195,6 +716,7 @@ def update_borrow_record_return_date(patron_id: str, book_id: int, return_date:
         ''', (return_date.isoformat(), patron_id, book_id))
         conn.commit()
         conn.close()
+        notify_patron_change([patron_id])
         return True
     except Exception as e:
         conn.close()
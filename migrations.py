@@ -0,0 +1,690 @@
+"""
+Migrations Module - Versioned schema migrations for the Library Management System
+
+Every schema change is a numbered Migration. Applied versions are recorded in the
+schema_version table and mirrored into PRAGMA user_version so start-up can tell
+in a single read whether anything needs to run.
+
+A migration has two phases:
+  1. statements - short DDL run in one transaction
+  2. backfill   - optional data rewrite run in id-ordered chunks, each chunk in
+                  its own short write transaction. The chunk cursor is committed
+                  with the chunk, so an interrupted run resumes where it stopped.
+
+Usage:
+    python migrations.py [--dry-run] [--batch-size N] [--target VERSION]
+"""
+
+import argparse
+import math
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import database
+from database import ARCHIVE_TABLE_SQL, DAY_SQL, create_copies, get_db_connection
+from search_index import index_book
+
+# Fallback rate used by dry runs for migrations without a backfill to sample
+DEFAULT_ROWS_PER_SECOND = 200000
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Migration:
+    """
+    A single schema migration.
+    
+    Args:
+        version: Unique, increasing version number
+        description: Short human readable summary
+        statements: DDL statements applied in one transaction
+        backfill: Optional callable(conn, after_id, limit) that processes up to
+            `limit` rows with id > after_id and returns (last_id, rows_changed),
+            or None when there is nothing left
+        table: Table whose row count drives dry-run estimates
+        estimate: For backfills whose cursor is not a row id, a callable(conn,
+            cursor) returning (rows, chunks) still to process; a dry run
+            times one chunk and multiplies by `chunks`
+    """
+
+    def __init__(self, version: int, description: str, statements: List[str] = None,
+                 backfill: Optional[Callable] = None, table: Optional[str] = None,
+                 estimate: Optional[Callable] = None):
+        self.version = version
+        self.description = description
+        self.statements = statements or []
+        self.backfill = backfill
+        self.table = table
+        self.estimate = estimate
+
+
+# SET clause converting ISO-8601 TEXT dates to integer epoch seconds. Naive
+# datetimes are read as UTC, so ts // 86400 is the loan's calendar day.
+# {row} is '' for plain updates or 'NEW.' inside triggers.
+EPOCH_COLUMNS_SET = ', '.join(
+    f"{name}_ts = CAST(strftime('%s', {{row}}{name}_date) AS INTEGER)"
+    for name in ('borrow', 'due', 'return')
+)
+
+
+def _backfill_epoch_columns(conn, after_id, limit):
+    """Fill borrow_ts/due_ts/return_ts from the TEXT date columns."""
+    row = conn.execute('''
+        SELECT MAX(id) AS last_id, COUNT(*) AS n FROM (
+            SELECT id FROM borrow_records WHERE id > ? ORDER BY id LIMIT ?
+        )
+    ''', (after_id, limit)).fetchone()
+    if not row['n']:
+        return None
+    conn.execute(f'''
+        UPDATE borrow_records SET {EPOCH_COLUMNS_SET.format(row='')}
+        WHERE id > ? AND id <= ?
+    ''', (after_id, row['last_id']))
+    return row['last_id'], row['n']
+
+
+# Columns captured in change_log snapshots for each tracked table
+CHANGE_LOG_COLUMNS = {
+    'books': ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies'),
+    'borrow_records': ('id', 'patron_id', 'book_id', 'borrow_date', 'due_date', 'return_date'),
+}
+
+
+# changed_at as a naive local ISO-8601 time, like every other date the app stores
+CHANGED_AT_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+
+def _change_log_triggers(changed_at: str = CHANGED_AT_SQL) -> List[str]:
+    """Build insert/update/delete triggers that append to change_log."""
+    statements = []
+    for table, columns in CHANGE_LOG_COLUMNS.items():
+        snapshot = 'json_object(' + ', '.join(f"'{c}', NEW.{c}" for c in columns) + ')'
+        # Only the tracked columns, so derived-column updates (e.g. *_ts) don't log twice
+        tracked = ', '.join(c for c in columns if c != 'id')
+        for op, event, row_id, row in (
+            ('insert', 'INSERT', 'NEW.id', snapshot),
+            ('update', f'UPDATE OF {tracked}', 'NEW.id', snapshot),
+            ('delete', 'DELETE', 'OLD.id', 'NULL'),
+        ):
+            statements.append(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_log_{op} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, op, row, changed_at)
+                    VALUES ('{table}', {row_id}, '{op}', {row}, {changed_at});
+                END
+            ''')
+    return statements
+
+
+def _backfill_book_trigrams(conn, after_id, limit):
+    """Index title/author trigrams for books with id > after_id."""
+    books = conn.execute('SELECT id, title, author FROM books WHERE id > ? ORDER BY id LIMIT ?',
+                         (after_id, limit)).fetchall()
+    if not books:
+        return None
+    for book in books:
+        index_book(conn, book['id'], book['title'], book['author'])
+    return books[-1]['id'], len(books)
+
+
+ROLLUP_RETURN_SET = f'''
+    returns = returns + 1,
+    loan_days = loan_days + excluded.loan_days,
+    overdue_returns = overdue_returns + excluded.overdue_returns
+'''
+
+ROLLUP_RETURN_VALUES = (
+    f"{DAY_SQL.format(column='NEW.return_date')}, NEW.book_id, 0, 1, "
+    f"{DAY_SQL.format(column='NEW.return_date')} - {DAY_SQL.format(column='NEW.borrow_date')}, "
+    "date(NEW.return_date) > date(NEW.due_date)"
+)
+
+
+def _backfill_rollups(conn, after_day, limit):
+    """
+    Recompute daily_book_stats for the next days with loan activity.
+
+    The cursor is an epoch day number rather than a row id. An archive in a
+    separate file cannot be attached inside the chunk transaction, so it is
+    left out here; run `python -m services.analytics_service` afterwards.
+    """
+    from services.analytics_service import BACKFILL_DAYS_PER_CHUNK, loan_day_range, rebuild_rollup_days
+
+    archive_table = None if database.ARCHIVE_DATABASE else 'borrow_records_archive'
+    first_day, last_day = loan_day_range(conn, archive_table)
+    if first_day is None:
+        return None
+    start = max(after_day + 1, first_day)
+    if start > last_day:
+        return None
+    end = min(start + BACKFILL_DAYS_PER_CHUNK - 1, last_day)
+    return end, rebuild_rollup_days(conn, start, end, archive_table)
+
+
+def _estimate_rollups(conn, after_day):
+    """Loans and chunks of days left for _backfill_rollups after `after_day`."""
+    from services.analytics_service import BACKFILL_DAYS_PER_CHUNK, from_day, loan_day_range
+
+    archive_table = None if database.ARCHIVE_DATABASE else 'borrow_records_archive'
+    first_day, last_day = loan_day_range(conn, archive_table)
+    if first_day is None:
+        return 0, 0
+    start = max(after_day + 1, first_day)
+    if start > last_day:
+        return 0, 0
+    start_text = from_day(start).isoformat()
+    rows = sum(conn.execute(f'''
+        SELECT COUNT(*) FROM {table} WHERE borrow_date >= ? OR return_date >= ?
+    ''', (start_text, start_text)).fetchone()[0]
+        for table in ['borrow_records'] + ([archive_table] if archive_table else []))
+    return rows, math.ceil((last_day - start + 1) / BACKFILL_DAYS_PER_CHUNK)
+
+
+def _backfill_copies(conn, after_id, limit):
+    """
+    Create copy rows for books that predate the copies table.
+    
+    Copies are split to match the counters: on-shelf copies first, then one
+    per active loan (linked via borrow_records.copy_id) and one per ready hold;
+    anything the counters cannot account for is 'missing'.
+    """
+    books = conn.execute('''
+        SELECT id, total_copies, available_copies FROM books
+        WHERE id > ? ORDER BY id LIMIT ?
+    ''', (after_id, limit)).fetchall()
+    if not books:
+        return None
+
+    created = 0
+    for book in books:
+        if conn.execute('SELECT 1 FROM copies WHERE book_id = ? LIMIT 1', (book['id'],)).fetchone():
+            continue
+        loans = [row[0] for row in conn.execute('''
+            SELECT id FROM borrow_records WHERE book_id = ? AND return_date IS NULL ORDER BY id
+        ''', (book['id'],))]
+        ready = conn.execute("SELECT COUNT(*) FROM holds WHERE book_id = ? AND status = 'ready'",
+                             (book['id'],)).fetchone()[0]
+        statuses = (['available'] * max(book['available_copies'], 0)
+                    + ['on_loan'] * len(loans) + ['held'] * ready)[:book['total_copies']]
+        statuses += ['missing'] * (book['total_copies'] - len(statuses))
+
+        copy_ids = create_copies(conn, book['id'], statuses)
+        on_loan = [copy_id for copy_id, status in zip(copy_ids, statuses) if status == 'on_loan']
+        conn.executemany('UPDATE borrow_records SET copy_id = ? WHERE id = ?', zip(on_loan, loans))
+        created += len(copy_ids)
+    return books[-1]['id'], created
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'Create books and borrow_records tables', [
+        '''
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            isbn TEXT UNIQUE NOT NULL,
+            total_copies INTEGER NOT NULL,
+            available_copies INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS borrow_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+        ''',
+    ]),
+    Migration(2, 'Index active loans by patron and by book', [
+        'CREATE INDEX IF NOT EXISTS idx_borrow_patron_active ON borrow_records (patron_id, return_date)',
+        'CREATE INDEX IF NOT EXISTS idx_borrow_book_active ON borrow_records (book_id, return_date)',
+    ], table='borrow_records'),
+    Migration(3, 'Add archive table for returned loans', [
+        ARCHIVE_TABLE_SQL.format(table='borrow_records_archive'),
+        'CREATE INDEX IF NOT EXISTS idx_archive_patron ON borrow_records_archive (patron_id)',
+        'CREATE INDEX IF NOT EXISTS idx_borrow_returned ON borrow_records (return_date) WHERE return_date IS NOT NULL',
+    ], table='borrow_records'),
+    Migration(4, 'Store loan dates as integer epoch seconds', [
+        'ALTER TABLE borrow_records ADD COLUMN borrow_ts INTEGER',
+        'ALTER TABLE borrow_records ADD COLUMN due_ts INTEGER',
+        'ALTER TABLE borrow_records ADD COLUMN return_ts INTEGER',
+        # Keep the integer columns in sync with every writer of the TEXT columns
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_borrow_epoch_insert AFTER INSERT ON borrow_records
+        BEGIN
+            UPDATE borrow_records SET {EPOCH_COLUMNS_SET.format(row='NEW.')} WHERE id = NEW.id;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_borrow_epoch_update
+        AFTER UPDATE OF borrow_date, due_date, return_date ON borrow_records
+        BEGIN
+            UPDATE borrow_records SET {EPOCH_COLUMNS_SET.format(row='NEW.')} WHERE id = NEW.id;
+        END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_borrow_active_due ON borrow_records (due_ts) WHERE return_date IS NULL',
+    ], backfill=_backfill_epoch_columns, table='borrow_records'),
+    Migration(5, 'Index active loans by patron and due date', [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_borrow_active_patron_due
+        ON borrow_records (patron_id, due_ts) WHERE return_date IS NULL
+        ''',
+    ], table='borrow_records'),
+    Migration(6, 'Add per-book FIFO hold queue', [
+        '''
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'waiting',
+            created_at TEXT NOT NULL,
+            ready_at TEXT,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_book_position ON holds (book_id, position)',
+        'CREATE INDEX IF NOT EXISTS idx_holds_queue ON holds (book_id, status, position)',
+        'CREATE INDEX IF NOT EXISTS idx_holds_patron ON holds (patron_id, book_id, status)',
+    ]),
+    Migration(7, 'Add change_log feed for books and borrow_records', [
+        '''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            row TEXT,
+            changed_at TEXT NOT NULL
+        )
+        ''',
+    ] + _change_log_triggers("strftime('%Y-%m-%dT%H:%M:%f', 'now')")),
+    Migration(8, 'Add trigram index for fuzzy title/author search', [
+        '''
+        CREATE TABLE IF NOT EXISTS book_trigrams (
+            field TEXT NOT NULL,
+            trigram TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            PRIMARY KEY (field, trigram, book_id)
+        ) WITHOUT ROWID
+        ''',
+    ], backfill=_backfill_book_trigrams, table='books'),
+    Migration(9, 'Add daily circulation rollups', [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_book_stats (
+            day INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrows INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            loan_days INTEGER NOT NULL DEFAULT 0,
+            overdue_returns INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, book_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_borrow_borrow_date ON borrow_records (borrow_date)',
+        'CREATE INDEX IF NOT EXISTS idx_archive_borrow_date ON borrow_records_archive (borrow_date)',
+        'CREATE INDEX IF NOT EXISTS idx_archive_return_date ON borrow_records_archive (return_date)',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_borrow AFTER INSERT ON borrow_records
+        BEGIN
+            INSERT INTO daily_book_stats (day, book_id, borrows)
+            VALUES ({DAY_SQL.format(column='NEW.borrow_date')}, NEW.book_id, 1)
+            ON CONFLICT (day, book_id) DO UPDATE SET borrows = borrows + 1;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_insert_returned AFTER INSERT ON borrow_records
+        WHEN NEW.return_date IS NOT NULL
+        BEGIN
+            INSERT INTO daily_book_stats (day, book_id, borrows, returns, loan_days, overdue_returns)
+            VALUES ({ROLLUP_RETURN_VALUES})
+            ON CONFLICT (day, book_id) DO UPDATE SET {ROLLUP_RETURN_SET};
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_return AFTER UPDATE OF return_date ON borrow_records
+        WHEN OLD.return_date IS NULL AND NEW.return_date IS NOT NULL
+        BEGIN
+            INSERT INTO daily_book_stats (day, book_id, borrows, returns, loan_days, overdue_returns)
+            VALUES ({ROLLUP_RETURN_VALUES})
+            ON CONFLICT (day, book_id) DO UPDATE SET {ROLLUP_RETURN_SET};
+        END
+        ''',
+    ], backfill=_backfill_rollups, estimate=_estimate_rollups),
+    Migration(10, 'Add copy-level inventory', [
+        '''
+        CREATE TABLE IF NOT EXISTS copies (
+            id INTEGER PRIMARY KEY,
+            book_id INTEGER NOT NULL REFERENCES books (id),
+            barcode TEXT UNIQUE NOT NULL,
+            branch TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'available'
+                CHECK (status IN ('available', 'on_loan', 'held', 'missing'))
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_copies_book_status ON copies (book_id, status, branch)',
+        'CREATE INDEX IF NOT EXISTS idx_copies_branch_status ON copies (branch, status, book_id)',
+        'ALTER TABLE borrow_records ADD COLUMN copy_id INTEGER REFERENCES copies (id)',
+        # An explicitly chosen copy must be on the shelf
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_copy_check BEFORE INSERT ON borrow_records
+        WHEN NEW.copy_id IS NOT NULL
+        BEGIN
+            SELECT RAISE(ABORT, 'copy is not available')
+            WHERE NOT EXISTS (SELECT 1 FROM copies
+                              WHERE id = NEW.copy_id AND book_id = NEW.book_id AND status = 'available');
+        END
+        ''',
+        # Otherwise take the copy held for this patron, or the first one on the shelf
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_copy_checkout AFTER INSERT ON borrow_records
+        WHEN NEW.return_date IS NULL
+        BEGIN
+            UPDATE borrow_records SET copy_id = (
+                SELECT id FROM copies
+                WHERE book_id = NEW.book_id
+                  AND (status = 'available'
+                       OR (status = 'held' AND EXISTS (
+                           SELECT 1 FROM holds WHERE patron_id = NEW.patron_id
+                           AND book_id = NEW.book_id AND status = 'ready')))
+                ORDER BY status = 'held' DESC, id
+                LIMIT 1
+            ) WHERE id = NEW.id AND NEW.copy_id IS NULL;
+            UPDATE copies SET status = 'on_loan'
+            WHERE id = (SELECT copy_id FROM borrow_records WHERE id = NEW.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_copy_checkin AFTER UPDATE OF return_date ON borrow_records
+        WHEN OLD.return_date IS NULL AND NEW.return_date IS NOT NULL AND NEW.copy_id IS NOT NULL
+        BEGIN
+            UPDATE copies SET status = 'available' WHERE id = NEW.copy_id AND status = 'on_loan';
+        END
+        ''',
+        # A hold becoming ready sets a shelf copy aside; cancelling it puts the copy back
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_copy_hold_ready AFTER UPDATE OF status ON holds
+        WHEN OLD.status = 'waiting' AND NEW.status = 'ready'
+        BEGIN
+            UPDATE copies SET status = 'held' WHERE id = (
+                SELECT id FROM copies WHERE book_id = NEW.book_id AND status = 'available'
+                ORDER BY id LIMIT 1);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_copy_hold_cancel AFTER UPDATE OF status ON holds
+        WHEN OLD.status = 'ready' AND NEW.status = 'cancelled'
+        BEGIN
+            UPDATE copies SET status = 'available' WHERE id = (
+                SELECT id FROM copies WHERE book_id = NEW.book_id AND status = 'held'
+                ORDER BY id LIMIT 1);
+        END
+        ''',
+    ], backfill=_backfill_copies, table='books'),
+    Migration(11, 'Add payments ledger', [
+        '''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER,
+            amount REAL NOT NULL,
+            transaction_id TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('payment', 'refund')),
+            created_at TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_payments_transaction ON payments (transaction_id)',
+        'CREATE INDEX IF NOT EXISTS idx_payments_patron ON payments (patron_id)',
+    ]),
+    Migration(12, 'Index books by title for paged catalog reads', [
+        'CREATE INDEX IF NOT EXISTS idx_books_title ON books (title, id)',
+    ]),
+    Migration(13, 'Add book import staging and nightly fee tables', [
+        '''
+        CREATE TABLE IF NOT EXISTS book_imports (
+            id INTEGER PRIMARY KEY,
+            title TEXT,
+            author TEXT,
+            isbn TEXT,
+            total_copies TEXT,
+            status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'valid', 'invalid')),
+            error TEXT
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_book_imports_isbn ON book_imports (isbn, id)',
+        '''
+        CREATE TABLE IF NOT EXISTS fee_assessments (
+            loan_id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            as_of TEXT NOT NULL,
+            days_overdue INTEGER NOT NULL,
+            fee_amount REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_fee_assessments_patron ON fee_assessments (patron_id)',
+    ]),
+    # One UPDATE with the trigger swap, so no entry is converted twice; the
+    # feed is pruned as consumers catch up, so the table stays small
+    Migration(14, 'Record change_log times in local time', [
+        f'DROP TRIGGER IF EXISTS trg_{table}_log_{op}'
+        for table in CHANGE_LOG_COLUMNS for op in ('insert', 'update', 'delete')
+    ] + _change_log_triggers() + [
+        "UPDATE change_log SET changed_at = strftime('%Y-%m-%dT%H:%M:%f', changed_at, 'localtime')",
+    ]),
+]
+
+
+def latest_version() -> int:
+    """Get the newest version known to this code base."""
+    return MIGRATIONS[-1].version
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            state TEXT NOT NULL,
+            backfill_cursor INTEGER NOT NULL DEFAULT 0,
+            applied_at TEXT
+        )
+    ''')
+
+
+def get_migration_states(conn) -> Dict[int, Dict]:
+    """Get recorded migration rows keyed by version."""
+    _ensure_version_table(conn)
+    rows = conn.execute('SELECT * FROM schema_version').fetchall()
+    return {row['version']: dict(row) for row in rows}
+
+
+def _migration_state(conn, version: int) -> Optional[Dict]:
+    row = conn.execute('SELECT * FROM schema_version WHERE version = ?', (version,)).fetchone()
+    return dict(row) if row else None
+
+
+def _pending(states: Dict[int, Dict], target: int) -> List[Migration]:
+    return [m for m in MIGRATIONS
+            if m.version <= target and states.get(m.version, {}).get('state') != 'applied']
+
+
+def _estimate(conn, migration: Migration, cursor: int, batch_size: int, started: bool) -> Dict:
+    """
+    Estimate remaining rows and time for one migration.
+    
+    Runs inside the dry run's rolled-back transaction, after every earlier
+    pending migration has had its statements applied, so tables created by
+    those migrations exist here. Earlier backfills are only sampled, not run
+    to completion.
+    """
+    if not started:
+        for sql in migration.statements:
+            conn.execute(sql)
+
+    def time_one_chunk():
+        # A real chunk; the caller rolls it back with everything else
+        start = time.perf_counter()
+        chunk = migration.backfill(conn, cursor, batch_size)
+        return chunk, time.perf_counter() - start
+
+    if migration.estimate:
+        rows, chunks = migration.estimate(conn, cursor)
+        seconds = time_one_chunk()[1] * chunks if migration.backfill and chunks else 0.0
+    else:
+        rows = 0
+        if migration.table:
+            rows = conn.execute(f'SELECT COUNT(*) FROM {migration.table} WHERE id > ?',
+                                (cursor,)).fetchone()[0]
+        rate = DEFAULT_ROWS_PER_SECOND
+        if migration.backfill and rows:
+            chunk, elapsed = time_one_chunk()
+            if chunk is not None and elapsed > 0:
+                rate = max(chunk[1], 1) / elapsed
+        seconds = rows / rate
+
+    return {
+        'version': migration.version,
+        'description': migration.description,
+        'estimated_rows': rows,
+        'estimated_seconds': round(seconds, 3),
+    }
+
+
+def _dry_run(conn, pending: List[Migration], states: Dict[int, Dict], batch_size: int) -> List[Dict]:
+    """Estimate every pending migration in order inside one transaction that is always rolled back."""
+    report = []
+    conn.execute('BEGIN')
+    try:
+        for migration in pending:
+            state = states.get(migration.version)
+            cursor = state['backfill_cursor'] if state else 0
+            report.append(_estimate(conn, migration, cursor, batch_size, state is not None))
+    finally:
+        conn.execute('ROLLBACK')
+    return report
+
+
+def _set_user_version(conn, states: Dict[int, Dict]):
+    """Mirror the highest contiguously applied version into PRAGMA user_version."""
+    version = 0
+    for migration in MIGRATIONS:
+        if states.get(migration.version, {}).get('state') != 'applied':
+            break
+        version = migration.version
+    conn.execute(f'PRAGMA user_version = {version}')
+
+
+def migrate(target: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+            dry_run: bool = False, progress: Optional[Callable] = None) -> List[Dict]:
+    """
+    Apply pending migrations up to `target` (default: latest).
+    
+    Args:
+        target: Highest version to apply
+        batch_size: Rows per backfill transaction
+        dry_run: Report what would run and how long it should take, change nothing
+        progress: Optional callable(version, rows_done) called after each chunk
+        
+    Returns:
+        list: One dict per migration with rows processed and elapsed seconds,
+        or estimated_rows/estimated_seconds for a dry run
+    """
+    target = latest_version() if target is None else target
+    conn = get_db_connection()
+    # Manage transactions explicitly so each chunk holds the write lock briefly
+    conn.isolation_level = None
+
+    try:
+        states = get_migration_states(conn)
+        if dry_run:
+            return _dry_run(conn, _pending(states, target), states, batch_size)
+
+        report = []
+        for migration in _pending(states, target):
+            start = time.perf_counter()
+            # Another process may have got here first: decide under the write lock
+            conn.execute('BEGIN IMMEDIATE')
+            state = _migration_state(conn, migration.version)
+            if state is None:
+                for sql in migration.statements:
+                    conn.execute(sql)
+                conn.execute('''
+                    INSERT INTO schema_version (version, description, state)
+                    VALUES (?, ?, ?)
+                ''', (migration.version, migration.description,
+                      'backfilling' if migration.backfill else 'applied'))
+            conn.execute('COMMIT')
+            if state is not None and state['state'] == 'applied':
+                continue
+
+            rows_done = 0
+            if migration.backfill:
+                while True:
+                    conn.execute('BEGIN IMMEDIATE')
+                    # Re-read the cursor so concurrent runs never redo a chunk
+                    state = _migration_state(conn, migration.version)
+                    chunk = None
+                    if state['state'] != 'applied':
+                        chunk = migration.backfill(conn, state['backfill_cursor'], batch_size)
+                    if chunk is None:
+                        conn.execute('COMMIT')
+                        break
+                    cursor, changed = chunk
+                    rows_done += changed
+                    conn.execute('UPDATE schema_version SET backfill_cursor = ? WHERE version = ?',
+                                 (cursor, migration.version))
+                    conn.execute('COMMIT')
+                    if progress:
+                        progress(migration.version, rows_done)
+
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                UPDATE schema_version SET state = 'applied', applied_at = ?
+                WHERE version = ? AND state != 'applied'
+            ''', (datetime.now().isoformat(), migration.version))
+            states = get_migration_states(conn)
+            _set_user_version(conn, states)
+            conn.execute('COMMIT')
+
+            report.append({
+                'version': migration.version,
+                'description': migration.description,
+                'rows': rows_done,
+                'seconds': round(time.perf_counter() - start, 3),
+            })
+
+        return report
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply schema migrations to the library database.')
+    parser.add_argument('--dry-run', action='store_true', help='report pending work and estimated time')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--target', type=int, default=None)
+    args = parser.parse_args()
+
+    def show_progress(version, rows):
+        print(f'  v{version}: {rows} rows')
+
+    report = migrate(args.target, args.batch_size, args.dry_run, show_progress)
+    if not report:
+        print('Schema is up to date.')
+    for entry in report:
+        if args.dry_run:
+            print(f"v{entry['version']} {entry['description']}: "
+                  f"~{entry['estimated_rows']} rows, ~{entry['estimated_seconds']}s")
+        else:
+            print(f"v{entry['version']} {entry['description']}: "
+                  f"{entry['rows']} rows in {entry['seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+"""
+Profiler Module - Opt-in SQL statement profiling and slow-query log
+
+enable_profiling() makes every connection from database.get_db_connection()
+and the read connections a ProfiledConnection. Each statement they run is
+recorded under its normalized text (literals and IN-lists replaced by
+placeholders): execution count, total and max time, and rows returned
+(or changed, for writes). Time includes fetching, not just the first step.
+
+The first time a statement is seen its EXPLAIN QUERY PLAN is captured. A
+statement whose plan scans a table without an index is written to the
+slow-query log once, so a dropped or unused index shows up on the first
+request instead of at the next capacity review. Executions slower than
+SLOW_QUERY_MS (reads and writes have separate thresholds) are written there
+every time.
+
+    LIBRARY_PROFILE_SQL=1 python app.py
+    curl localhost:5000/api/sql_profile?sort=max_ms
+
+Profiling is off by default; when off, connections are plain sqlite3 ones.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, List, Optional
+
+import database
+
+# Executions at or above these times (ms) are written to the slow-query log
+SLOW_QUERY_MS = {'read': 50.0, 'write': 20.0}
+
+SLOW_QUERY_LOG = os.path.join('logs', 'slow_queries.jsonl')
+
+DEFAULT_SUMMARY_LIMIT = 20
+
+SUMMARY_SORT_KEYS = ('total_ms', 'max_ms', 'count', 'rows')
+
+# Statements that have a query plan worth capturing
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+_READS = ('SELECT', 'WITH', 'PRAGMA', 'EXPLAIN')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)', re.IGNORECASE)
+
+# A full table scan in EXPLAIN QUERY PLAN output: "SCAN books", but not
+# "SCAN books USING INDEX ..." or "SCAN (subquery-1)"
+_TABLE_SCAN = re.compile(r'^SCAN (?!\()(?!.*\bUSING\b)')
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and replace literals and IN-lists with placeholders."""
+    text = _STRING.sub('?', sql)
+    text = _NUMBER.sub('?', text)
+    text = _SPACE.sub(' ', text).strip()
+    return _IN_LIST.sub('IN (?, ...)', text)
+
+
+def _statement_kind(sql: str) -> str:
+    return 'read' if sql.lstrip().upper().startswith(_READS) else 'write'
+
+
+class StatementStats:
+    """Totals for one normalized statement."""
+
+    __slots__ = ('sql', 'kind', 'count', 'total', 'max', 'rows', 'plan')
+
+    def __init__(self, sql: str, plan: List[str]):
+        self.sql = sql
+        self.kind = _statement_kind(sql)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.plan = plan
+
+    @property
+    def table_scans(self) -> List[str]:
+        return [step for step in self.plan if _TABLE_SCAN.match(step)]
+
+    def as_dict(self) -> Dict:
+        return {
+            'sql': self.sql,
+            'kind': self.kind,
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'avg_ms': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+            'rows': self.rows,
+            'plan': self.plan,
+            'table_scans': self.table_scans,
+        }
+
+
+class SQLProfiler:
+    """
+    Per-statement statistics shared by all profiled connections.
+
+    Args:
+        slow_ms: Slow-query thresholds in ms, by 'read' and 'write'
+        log_path: Slow-query log (JSON lines); None disables the log
+    """
+
+    def __init__(self, slow_ms: Optional[Dict[str, float]] = None, log_path: Optional[str] = SLOW_QUERY_LOG):
+        self.slow_ms = dict(slow_ms or SLOW_QUERY_MS)
+        self.log_path = log_path
+        self._stats: Dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def is_new(self, normalized: str) -> bool:
+        return normalized not in self._stats
+
+    def add_statement(self, normalized: str, plan: List[str]):
+        """Register a statement on first sighting, logging it if its plan scans a table."""
+        with self._lock:
+            if normalized in self._stats:
+                return
+            stats = self._stats[normalized] = StatementStats(normalized, plan)
+        if stats.table_scans:
+            self._log({'event': 'table_scan', 'sql': normalized, 'plan': plan})
+
+    def record(self, normalized: str, seconds: float, rows: int):
+        """Add one finished execution."""
+        with self._lock:
+            stats = self._stats.get(normalized)
+            if stats is None:
+                stats = self._stats[normalized] = StatementStats(normalized, [])
+            stats.count += 1
+            stats.total += seconds
+            stats.rows += rows
+            if seconds > stats.max:
+                stats.max = seconds
+        ms = seconds * 1000
+        if ms >= self.slow_ms.get(stats.kind, float('inf')):
+            self._log({'event': 'slow', 'sql': normalized, 'ms': round(ms, 3), 'rows': rows,
+                       'threshold_ms': self.slow_ms[stats.kind], 'plan': stats.plan})
+
+    def _log(self, entry: Dict):
+        if not self.log_path:
+            return
+        entry = {'at': time.strftime('%Y-%m-%dT%H:%M:%S'), **entry}
+        with self._log_lock:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as log:
+                log.write(json.dumps(entry) + '\n')
+
+    def summary(self, sort: str = 'total_ms', limit: int = DEFAULT_SUMMARY_LIMIT) -> Dict:
+        """
+        Statement statistics, busiest first.
+
+        Returns:
+            dict: totals (statements, executions, ms) and the top `limit`
+            statements sorted by `sort` (one of SUMMARY_SORT_KEYS)
+        """
+        if sort not in SUMMARY_SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        with self._lock:
+            statements = [stats.as_dict() for stats in self._stats.values()]
+        statements.sort(key=lambda stats: stats[sort], reverse=True)
+        return {
+            'enabled': True,
+            'slow_query_ms': self.slow_ms,
+            'statements': len(statements),
+            'executions': sum(stats['count'] for stats in statements),
+            'total_ms': round(sum(stats['total_ms'] for stats in statements), 3),
+            'table_scan_statements': sum(1 for stats in statements if stats['table_scans']),
+            'top': statements[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that times each execution, including its fetches, and reports it when done."""
+
+    _profiler: Optional[SQLProfiler] = None
+    _normalized: Optional[str] = None
+
+    def _start(self, sql: str, parameters) -> float:
+        self._finish()
+        profiler = ProfiledConnection.profiler
+        normalized = normalize_sql(sql)
+        if profiler.is_new(normalized):
+            profiler.add_statement(normalized, self._explain(sql, parameters))
+        self._profiler, self._normalized = profiler, normalized
+        self._elapsed, self._rows = 0.0, 0
+        return time.perf_counter()
+
+    def _explain(self, sql: str, parameters) -> List[str]:
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        try:
+            # A plain cursor, so the EXPLAIN itself is not profiled
+            rows = sqlite3.Cursor(self.connection).execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+            return [row[3] for row in rows]
+        except (sqlite3.Error, ValueError):
+            return []
+
+    def _finish(self):
+        if self._normalized is not None:
+            normalized, self._normalized = self._normalized, None
+            self._profiler.record(normalized, self._elapsed, self._rows)
+
+    def _fetched(self, started: float, rows: int):
+        if self._normalized is not None:
+            self._elapsed += time.perf_counter() - started
+            self._rows += rows
+
+    def execute(self, sql, parameters=()):
+        started = self._start(sql, parameters)
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._elapsed += time.perf_counter() - started
+        if self.description is None:
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        # The first parameter set is peeked at so EXPLAIN has values to bind
+        rows = iter(seq_of_parameters)
+        first = next(rows, None)
+        if first is None:
+            return super().executemany(sql, [])
+        started = self._start(sql, first)
+        try:
+            super().executemany(sql, chain([first], rows))
+        finally:
+            self._elapsed += time.perf_counter() - started
+        self._rows = max(self.rowcount, 0)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0)
+            self._finish()
+            raise
+        self._fetched(started, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Statements read with a single fetchone() are reported when the cursor goes away
+        self._finish()
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors report to ProfiledConnection.profiler."""
+
+    profiler: Optional[SQLProfiler] = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts run the statement on the C cursor type directly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def enable_profiling(slow_ms: Optional[Dict[str, float]] = None,
+                     log_path: Optional[str] = SLOW_QUERY_LOG) -> SQLProfiler:
+    """Profile every connection opened by the database module from now on."""
+    ProfiledConnection.profiler = SQLProfiler(slow_ms, log_path)
+    database.CONNECTION_FACTORY = ProfiledConnection
+    return ProfiledConnection.profiler
+
+
+def disable_profiling():
+    """Open plain connections again (open profiled connections keep reporting)."""
+    database.CONNECTION_FACTORY = None
+
+
+def get_profiler() -> Optional[SQLProfiler]:
+    """The active profiler, or None when profiling is off."""
+    return ProfiledConnection.profiler if database.CONNECTION_FACTORY is ProfiledConnection else None
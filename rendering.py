@@ -0,0 +1,139 @@
+"""
+Rendering Module - Template caching, streamed pages and response compression
+
+configure_templates() compiles every template once at start-up and turns off
+the per-render modification check outside dev mode. With TEMPLATE_CACHE_DIR
+set, compiled templates are also kept on disk, so new worker processes skip
+Jinja compilation entirely.
+
+stream_page() renders a template as it is sent, in chunks of
+STREAM_BUFFER_EVENTS template events, so the page header leaves before the
+book rows are even read and time-to-first-byte doesn't grow with the catalog.
+
+register_compression() compresses text responses with brotli (if the brotli
+package is installed) or gzip, whichever the client prefers in
+Accept-Encoding. Streamed responses are compressed chunk by chunk and flushed
+after each one, so streaming still reaches the client incrementally.
+"""
+
+import gzip
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import Response, current_app, get_flashed_messages, request, stream_with_context
+from jinja2 import FileSystemBytecodeCache
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+# Directory for compiled template bytecode shared by worker processes; None keeps it in memory
+TEMPLATE_CACHE_DIR = None
+
+# Template events (text runs, expressions, macro calls) per streamed chunk
+STREAM_BUFFER_EVENTS = 200
+
+# Responses smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 500
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+    'application/json', 'application/javascript', 'application/x-ndjson',
+}
+
+
+def configure_templates(app, dev_mode: bool = False):
+    """Precompile all templates; only re-check template files in dev mode."""
+    env = app.jinja_env
+    env.auto_reload = dev_mode
+    if TEMPLATE_CACHE_DIR:
+        env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    for name in env.list_templates(extensions=['html']):
+        env.get_template(name)
+
+
+def stream_page(template_name: str, **context) -> Response:
+    """
+    Like flask.stream_template, with output sent in buffered chunks.
+
+    Flashed messages are read before streaming starts: the session cookie is
+    written with the headers, so a flash popped mid-stream would reappear on
+    the next page.
+    """
+    app = current_app._get_current_object()
+    get_flashed_messages(with_categories=True)
+    template = app.jinja_env.get_or_select_template(template_name)
+    app.update_template_context(context)
+    stream = template.stream(context)
+    stream.enable_buffering(STREAM_BUFFER_EVENTS)
+    return Response(stream_with_context(stream), mimetype='text/html')
+
+
+def _negotiate_encoding() -> Optional[str]:
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def _encoded(chunks: Iterable) -> Iterator[bytes]:
+    try:
+        for chunk in chunks:
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+    finally:
+        # The app's iterable (e.g. a stream_with_context generator) is ours to close now
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+def compress_response(response: Response) -> Response:
+    """Compress a response in place if it is compressible and the client accepts it."""
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _negotiate_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        chunks = _encoded(response.response)
+        response.response = _brotli_stream(chunks) if encoding == 'br' else _gzip_stream(chunks)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        else:
+            response.set_data(gzip.compress(data, GZIP_LEVEL))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def register_compression(app):
+    """Compress eligible responses of `app` (see compress_response)."""
+    app.after_request(compress_response)
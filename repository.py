@@ -0,0 +1,487 @@
+"""
+Repository Module - Storage interface for books, loans, holds and payments
+
+Business logic that touches several tables at once talks to a UnitOfWork
+instead of module-level database functions:
+
+    with unit_of_work() as uow:
+        books = uow.books.get_many(book_ids)
+        uow.loans.add_many(patron_id, book_ids, borrow_date, due_date)
+        uow.books.adjust_available({book_id: -1 for book_id in book_ids})
+
+Everything inside the block shares one connection and one write transaction,
+which commits when the block exits (or rolls back on an exception). Repository
+methods take and return lists/dicts so a batch is one statement, not one per
+row. Availability and patron listeners are notified after the commit.
+
+Two backends implement the same methods:
+  - SQLite (default) on database.DATABASE
+  - MemoryStore, plain dicts in this process, for tests and benchmarks.
+    Set repository.STORE = MemoryStore() to use it. Copy-level inventory and
+    other trigger-maintained tables are not modelled there.
+
+Only the batch borrow/return, payment and refund paths use a unit of work.
+The single-item helpers (borrow_book_by_patron, return_book_by_patron,
+get_patron_status_report) still call the database module directly and always
+hit SQLite, even with a MemoryStore configured: they handle holds, branches
+and copies through SQLite triggers, and their tests patch those module-level
+functions.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from itertools import count
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import clock
+import database
+from database import from_epoch, notify_availability_change
+
+# None uses SQLite; a MemoryStore instance keeps all data in process memory
+STORE = None
+
+# Books read per query by iter_by_title()
+BOOK_PAGE_SIZE = 500
+
+
+class UnitOfWork(ABC):
+    """
+    One transaction over the books, loans, holds and payments repositories.
+
+    Subclasses set the four repositories and implement _commit/_rollback/_notify
+    (and close, if they hold resources).
+    """
+
+    books = loans = holds = payments = None
+
+    def __init__(self):
+        self.changed_books = set()
+        self.changed_patrons = set()
+
+    def __enter__(self) -> 'UnitOfWork':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        finally:
+            self.close()
+
+    def commit(self):
+        self._commit()
+        changed, self.changed_books = self.changed_books, set()
+        if changed:
+            self._notify(changed)
+        patrons, self.changed_patrons = self.changed_patrons, set()
+        database.notify_patron_change(patrons)
+
+    def rollback(self):
+        self.changed_books = set()
+        self.changed_patrons = set()
+        self._rollback()
+
+    @abstractmethod
+    def _commit(self):
+        """Make the unit's changes durable."""
+
+    @abstractmethod
+    def _rollback(self):
+        """Discard the unit's changes."""
+
+    @abstractmethod
+    def _notify(self, book_ids):
+        """Tell availability listeners about committed changes to these books."""
+
+    def close(self):
+        pass
+
+
+# --- SQLite -----------------------------------------------------------------
+
+class SQLiteBookRepository:
+    def __init__(self, conn, uow: UnitOfWork):
+        self.conn = conn
+        self.uow = uow
+
+    def get(self, book_id: int) -> Optional[Dict]:
+        row = self.conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_many(self, book_ids: Iterable[int]) -> Dict[int, Dict]:
+        book_ids = list(book_ids)
+        if not book_ids:
+            return {}
+        placeholders = ','.join('?' * len(book_ids))
+        return {row['id']: dict(row) for row in self.conn.execute(
+            f'SELECT * FROM books WHERE id IN ({placeholders})', book_ids)}
+
+    def get_by_isbn(self, isbn: str) -> Optional[Dict]:
+        row = self.conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+        return dict(row) if row else None
+
+    def list_all(self) -> List[Dict]:
+        return [dict(row) for row in self.conn.execute('SELECT * FROM books ORDER BY title')]
+
+    def iter_by_title(self, page_size: int = BOOK_PAGE_SIZE) -> Iterator[Dict]:
+        """
+        All books in title order, one page per query.
+
+        Each page is a short read on idx_books_title, so a slow consumer (a
+        streamed page) never holds a read lock while writers wait.
+        """
+        rows = self.conn.execute('SELECT * FROM books ORDER BY title, id LIMIT ?', (page_size,)).fetchall()
+        while rows:
+            for row in rows:
+                yield dict(row)
+            if len(rows) < page_size:
+                return
+            rows = self.conn.execute('''
+                SELECT * FROM books WHERE (title, id) > (?, ?) ORDER BY title, id LIMIT ?
+            ''', (rows[-1]['title'], rows[-1]['id'], page_size)).fetchall()
+
+    def page_by_id(self, after_id: int, limit: int) -> List[Dict]:
+        """Up to `limit` books with IDs above `after_id`, in ID order."""
+        return [dict(row) for row in self.conn.execute(
+            'SELECT * FROM books WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit))]
+
+    def adjust_available(self, changes: Dict[int, int]):
+        """Add a delta to available_copies for each book ID."""
+        changes = {book_id: delta for book_id, delta in changes.items() if delta}
+        self.conn.executemany('UPDATE books SET available_copies = available_copies + ? WHERE id = ?',
+                              [(delta, book_id) for book_id, delta in changes.items()])
+        self.uow.changed_books.update(changes)
+
+
+class SQLiteLoanRepository:
+    def __init__(self, conn, uow: UnitOfWork):
+        self.conn = conn
+        self.uow = uow
+
+    def count_active(self, patron_id: str) -> int:
+        return self.conn.execute('''
+            SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL
+        ''', (patron_id,)).fetchone()[0]
+
+    def open_loans(self, patron_id: str, book_ids: Iterable[int]) -> Dict[int, List[Dict]]:
+        """Active loans per book ID, oldest first, as {'id', 'book_id', 'due_date'}."""
+        book_ids = list(book_ids)
+        placeholders = ','.join('?' * len(book_ids))
+        loans = {}
+        for row in self.conn.execute(f'''
+            SELECT id, book_id, due_ts FROM borrow_records
+            WHERE patron_id = ? AND return_date IS NULL AND book_id IN ({placeholders})
+            ORDER BY borrow_ts
+        ''', [patron_id] + book_ids):
+            loans.setdefault(row['book_id'], []).append(
+                {'id': row['id'], 'book_id': row['book_id'], 'due_date': from_epoch(row['due_ts'])})
+        return loans
+
+    def open_loan_for_copy(self, patron_id: str, copy_id: int) -> Optional[Dict]:
+        """The patron's active loan of one physical copy, as {'id', 'book_id', 'due_date'}."""
+        row = self.conn.execute('''
+            SELECT id, book_id, due_ts FROM borrow_records
+            WHERE patron_id = ? AND copy_id = ? AND return_date IS NULL
+        ''', (patron_id, copy_id)).fetchone()
+        return {'id': row['id'], 'book_id': row['book_id'], 'due_date': from_epoch(row['due_ts'])} if row else None
+
+    def add_many(self, patron_id: str, book_ids: Iterable[int], borrow_date: datetime, due_date: datetime):
+        self.conn.executemany('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+            VALUES (?, ?, ?, ?)
+        ''', [(patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()) for book_id in book_ids])
+        self.uow.changed_patrons.add(patron_id)
+
+    def mark_returned(self, patron_id: str, loan_ids: Iterable[int], return_date: datetime):
+        """Close the patron's loans with these IDs."""
+        self.conn.executemany('UPDATE borrow_records SET return_date = ? WHERE id = ?',
+                              [(return_date.isoformat(), loan_id) for loan_id in loan_ids])
+        self.uow.changed_patrons.add(patron_id)
+
+
+class SQLiteHoldRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def ready_for_patron(self, patron_id: str, book_ids: Iterable[int]) -> Dict[int, int]:
+        """Hold ID per book ID for the patron's ready holds."""
+        book_ids = list(book_ids)
+        placeholders = ','.join('?' * len(book_ids))
+        return {row['book_id']: row['id'] for row in self.conn.execute(f'''
+            SELECT id, book_id FROM holds
+            WHERE patron_id = ? AND status = 'ready' AND book_id IN ({placeholders})
+        ''', [patron_id] + book_ids)}
+
+    def fulfill(self, hold_ids: Iterable[int]):
+        self.conn.executemany("UPDATE holds SET status = 'fulfilled' WHERE id = ?",
+                              [(hold_id,) for hold_id in hold_ids])
+
+    def assign_returned(self, returned: Dict[int, int]) -> Dict[int, int]:
+        """Ready waiting holds with returned copies; returns copies left for the shelf."""
+        return database.assign_copies_to_holds(self.conn, returned)
+
+
+class SQLitePaymentRepository:
+    def __init__(self, conn, uow: UnitOfWork):
+        self.conn = conn
+        self.uow = uow
+
+    def add(self, patron_id: str, book_id: Optional[int], amount: float,
+            transaction_id: str, kind: str = 'payment') -> int:
+        cursor = self.conn.execute('''
+            INSERT INTO payments (patron_id, book_id, amount, transaction_id, kind, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (patron_id, book_id, amount, transaction_id, kind, clock.now().isoformat()))
+        self.uow.changed_patrons.add(patron_id)
+        return cursor.lastrowid
+
+    def for_transaction(self, transaction_id: str) -> List[Dict]:
+        return [dict(row) for row in self.conn.execute(
+            'SELECT * FROM payments WHERE transaction_id = ? ORDER BY id', (transaction_id,))]
+
+    def for_patron(self, patron_id: str) -> List[Dict]:
+        return [dict(row) for row in self.conn.execute(
+            'SELECT * FROM payments WHERE patron_id = ? ORDER BY id', (patron_id,))]
+
+
+class SQLiteUnitOfWork(UnitOfWork):
+    """
+    Repositories sharing one connection.
+
+    Writable units hold the write lock (BEGIN IMMEDIATE) for their lifetime;
+    read_only units use database.get_read_connection() and take no lock.
+    """
+
+    def __init__(self, read_only: bool = False):
+        super().__init__()
+        self.read_only = read_only
+        self.conn = database.get_read_connection() if read_only else database.get_db_connection()
+        self.conn.isolation_level = None
+        if not read_only:
+            self.conn.execute('BEGIN IMMEDIATE')
+        self.books = SQLiteBookRepository(self.conn, self)
+        self.loans = SQLiteLoanRepository(self.conn, self)
+        self.holds = SQLiteHoldRepository(self.conn)
+        self.payments = SQLitePaymentRepository(self.conn, self)
+
+    def _commit(self):
+        if self.conn.in_transaction:
+            self.conn.execute('COMMIT')
+
+    def _rollback(self):
+        if self.conn.in_transaction:
+            self.conn.execute('ROLLBACK')
+
+    def _notify(self, book_ids):
+        notify_availability_change(self.conn, book_ids)
+
+    def close(self):
+        self.conn.close()
+
+
+# --- In memory --------------------------------------------------------------
+
+class MemoryStore:
+    """Tables as dicts keyed by ID; one unit of work at a time holds the lock."""
+
+    def __init__(self):
+        self.books: Dict[int, Dict] = {}
+        self.loans: Dict[int, Dict] = {}
+        self.holds: Dict[int, Dict] = {}
+        self.payments: Dict[int, Dict] = {}
+        self.ids = {table: count(1) for table in ('books', 'loans', 'holds', 'payments')}
+        self.lock = threading.RLock()
+
+    def add_book(self, title: str, author: str, isbn: str, total_copies: int,
+                 available_copies: Optional[int] = None) -> int:
+        """Seed a book outside any unit of work."""
+        book_id = next(self.ids['books'])
+        self.books[book_id] = {
+            'id': book_id, 'title': title, 'author': author, 'isbn': isbn,
+            'total_copies': total_copies,
+            'available_copies': total_copies if available_copies is None else available_copies,
+        }
+        return book_id
+
+    def add_hold(self, patron_id: str, book_id: int, status: str = 'waiting') -> int:
+        """Seed a hold at the back of a book's queue outside any unit of work."""
+        hold_id = next(self.ids['holds'])
+        position = 1 + max((h['position'] for h in self.holds.values() if h['book_id'] == book_id), default=0)
+        self.holds[hold_id] = {'id': hold_id, 'patron_id': patron_id, 'book_id': book_id,
+                               'position': position, 'status': status}
+        return hold_id
+
+
+class _MemoryRepository:
+    def __init__(self, store: MemoryStore, undo: List[Callable]):
+        self.store = store
+        self.undo = undo
+
+    def _set(self, table: Dict, row_id: int, field: str, value):
+        old = table[row_id][field]
+        table[row_id][field] = value
+        self.undo.append(lambda: table[row_id].__setitem__(field, old))
+
+    def _insert(self, table: Dict, row: Dict):
+        table[row['id']] = row
+        self.undo.append(lambda: table.pop(row['id'], None))
+
+
+class MemoryBookRepository(_MemoryRepository):
+    def __init__(self, store, undo, uow: UnitOfWork):
+        super().__init__(store, undo)
+        self.uow = uow
+
+    def get(self, book_id: int) -> Optional[Dict]:
+        book = self.store.books.get(book_id)
+        return dict(book) if book else None
+
+    def get_many(self, book_ids: Iterable[int]) -> Dict[int, Dict]:
+        return {book_id: dict(self.store.books[book_id])
+                for book_id in book_ids if book_id in self.store.books}
+
+    def get_by_isbn(self, isbn: str) -> Optional[Dict]:
+        return next((dict(b) for b in self.store.books.values() if b['isbn'] == isbn), None)
+
+    def list_all(self) -> List[Dict]:
+        return sorted((dict(b) for b in self.store.books.values()), key=lambda b: b['title'])
+
+    def iter_by_title(self, page_size: int = BOOK_PAGE_SIZE) -> Iterator[Dict]:
+        return iter(sorted((dict(b) for b in self.store.books.values()), key=lambda b: (b['title'], b['id'])))
+
+    def page_by_id(self, after_id: int, limit: int) -> List[Dict]:
+        return [dict(self.store.books[book_id])
+                for book_id in sorted(self.store.books) if book_id > after_id][:limit]
+
+    def adjust_available(self, changes: Dict[int, int]):
+        for book_id, delta in changes.items():
+            if delta and book_id in self.store.books:
+                self._set(self.store.books, book_id, 'available_copies',
+                          self.store.books[book_id]['available_copies'] + delta)
+                self.uow.changed_books.add(book_id)
+
+
+class MemoryLoanRepository(_MemoryRepository):
+    def __init__(self, store, undo, uow: UnitOfWork):
+        super().__init__(store, undo)
+        self.uow = uow
+
+    def count_active(self, patron_id: str) -> int:
+        return sum(1 for loan in self.store.loans.values()
+                   if loan['patron_id'] == patron_id and loan['return_date'] is None)
+
+    def open_loans(self, patron_id: str, book_ids: Iterable[int]) -> Dict[int, List[Dict]]:
+        book_ids = set(book_ids)
+        loans = {}
+        for loan in sorted(self.store.loans.values(), key=lambda l: l['borrow_date']):
+            if loan['patron_id'] == patron_id and loan['return_date'] is None and loan['book_id'] in book_ids:
+                loans.setdefault(loan['book_id'], []).append(
+                    {'id': loan['id'], 'book_id': loan['book_id'], 'due_date': loan['due_date']})
+        return loans
+
+    def open_loan_for_copy(self, patron_id: str, copy_id: int) -> Optional[Dict]:
+        loan = next((l for l in self.store.loans.values()
+                     if l['patron_id'] == patron_id and l.get('copy_id') == copy_id
+                     and l['return_date'] is None), None)
+        return {'id': loan['id'], 'book_id': loan['book_id'], 'due_date': loan['due_date']} if loan else None
+
+    def add_many(self, patron_id: str, book_ids: Iterable[int], borrow_date: datetime, due_date: datetime):
+        for book_id in book_ids:
+            self._insert(self.store.loans, {
+                'id': next(self.store.ids['loans']), 'patron_id': patron_id, 'book_id': book_id,
+                'borrow_date': borrow_date, 'due_date': due_date, 'return_date': None,
+            })
+        self.uow.changed_patrons.add(patron_id)
+
+    def mark_returned(self, patron_id: str, loan_ids: Iterable[int], return_date: datetime):
+        for loan_id in loan_ids:
+            self._set(self.store.loans, loan_id, 'return_date', return_date)
+        self.uow.changed_patrons.add(patron_id)
+
+
+class MemoryHoldRepository(_MemoryRepository):
+    def ready_for_patron(self, patron_id: str, book_ids: Iterable[int]) -> Dict[int, int]:
+        book_ids = set(book_ids)
+        return {hold['book_id']: hold['id'] for hold in self.store.holds.values()
+                if hold['patron_id'] == patron_id and hold['status'] == 'ready'
+                and hold['book_id'] in book_ids}
+
+    def fulfill(self, hold_ids: Iterable[int]):
+        for hold_id in hold_ids:
+            self._set(self.store.holds, hold_id, 'status', 'fulfilled')
+
+    def assign_returned(self, returned: Dict[int, int]) -> Dict[int, int]:
+        leftover = dict(returned)
+        waiting = sorted((h for h in self.store.holds.values()
+                          if h['status'] == 'waiting' and h['book_id'] in returned),
+                         key=lambda h: (h['book_id'], h['position']))
+        for hold in waiting:
+            if leftover[hold['book_id']] > 0:
+                leftover[hold['book_id']] -= 1
+                self._set(self.store.holds, hold['id'], 'status', 'ready')
+        return leftover
+
+
+class MemoryPaymentRepository(_MemoryRepository):
+    def __init__(self, store, undo, uow: UnitOfWork):
+        super().__init__(store, undo)
+        self.uow = uow
+
+    def add(self, patron_id: str, book_id: Optional[int], amount: float,
+            transaction_id: str, kind: str = 'payment') -> int:
+        payment_id = next(self.store.ids['payments'])
+        self._insert(self.store.payments, {
+            'id': payment_id, 'patron_id': patron_id, 'book_id': book_id, 'amount': amount,
+            'transaction_id': transaction_id, 'kind': kind, 'created_at': clock.now().isoformat(),
+        })
+        self.uow.changed_patrons.add(patron_id)
+        return payment_id
+
+    def for_transaction(self, transaction_id: str) -> List[Dict]:
+        return [dict(p) for p in self.store.payments.values() if p['transaction_id'] == transaction_id]
+
+    def for_patron(self, patron_id: str) -> List[Dict]:
+        return [dict(p) for p in self.store.payments.values() if p['patron_id'] == patron_id]
+
+
+class MemoryUnitOfWork(UnitOfWork):
+    """Repositories over a MemoryStore; rollback replays an undo log."""
+
+    def __init__(self, store: MemoryStore, read_only: bool = False):
+        super().__init__()
+        self.store = store
+        self._undo: List[Callable] = []
+        store.lock.acquire()
+        self.books = MemoryBookRepository(store, self._undo, self)
+        self.loans = MemoryLoanRepository(store, self._undo, self)
+        self.holds = MemoryHoldRepository(store, self._undo)
+        self.payments = MemoryPaymentRepository(store, self._undo, self)
+
+    def _commit(self):
+        self._undo.clear()
+
+    def _rollback(self):
+        while self._undo:
+            self._undo.pop()()
+
+    def _notify(self, book_ids):
+        if database.availability_listeners:
+            changes = [{'book_id': book_id,
+                        'available_copies': self.store.books[book_id]['available_copies'],
+                        'total_copies': self.store.books[book_id]['total_copies']}
+                       for book_id in book_ids]
+            for listener in database.availability_listeners:
+                listener(changes)
+
+    def close(self):
+        self.store.lock.release()
+
+
+def unit_of_work(read_only: bool = False) -> UnitOfWork:
+    """Open a unit of work on the configured backend (see STORE)."""
+    if STORE is not None:
+        return MemoryUnitOfWork(STORE, read_only)
+    return SQLiteUnitOfWork(read_only)
@@ -2,8 +2,31 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+import json
+from datetime import date
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog,
+    borrow_books_by_patron, return_books_by_patron, pay_late_fees,
+    add_book_to_catalog, REPORT_FIELDS
+)
+from services.hold_service import place_hold, get_hold_status, cancel_hold
+from services.event_service import availability_bus, stream_events
+from services.backup_service import create_backup, list_backups
+from services.suggest_service import suggest_index, DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS
+from services.analytics_service import (
+    get_most_borrowed_books, get_average_loan_length, get_overdue_rate_by_author,
+    DEFAULT_REPORT_LIMIT
+)
+from services.report_cache_service import report_cache
+from services.inventory_service import add_copies_to_book, borrow_copy_by_patron, return_copy_by_patron
+from profiler import DEFAULT_SUMMARY_LIMIT, SUMMARY_SORT_KEYS, get_profiler
+from database import (
+    CopyAbandoned, DEFAULT_BRANCH, get_branch_availability, get_latest_change_seq, iter_changes,
+    prune_change_log
+)
+from repository import unit_of_work
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -16,24 +39,554 @@ def get_late_fee(patron_id, book_id):
     result = calculate_late_fee_for_book(patron_id, book_id)
     return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
 
+@api_bp.route('/late_fee/<patron_id>/<int:book_id>/pay', methods=['POST'])
+def pay_late_fee_api(patron_id, book_id):
+    """
+    Pay the late fee on a borrowed book.
+    
+    Charges through app.config['PAYMENT_GATEWAY'] when set (load tests use a
+    stub there), otherwise through the real PaymentGateway.
+    """
+    success, message, transaction_id = pay_late_fees(patron_id, book_id,
+                                                     current_app.config.get('PAYMENT_GATEWAY'))
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'message': message, 'transaction_id': transaction_id})
+
 @api_bp.route('/search')
 def search_books_api():
     """
     Search for books via API endpoint.
     Alternative API interface for R5: Book Search Functionality
+    
+    Pass fuzzy=1 for typo-tolerant title/author matching.
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    fuzzy = request.args.get('fuzzy', '') in ('1', 'true')
     
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
     
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    books = search_books_in_catalog(search_term, search_type, fuzzy)
     
     return jsonify({
         'search_term': search_term,
         'search_type': search_type,
+        'fuzzy': fuzzy,
         'results': books,
         'count': len(books)
     })
+
+
+def _batch_request_args():
+    """Extract (patron_id, book_ids) from a batch JSON body."""
+    data = request.get_json(silent=True) or {}
+    patron_id = str(data.get('patron_id', '')).strip()
+    book_ids = data.get('book_ids')
+    if not isinstance(book_ids, list):
+        book_ids = []
+    return patron_id, book_ids
+
+@api_bp.route('/borrow/batch', methods=['POST'])
+def batch_borrow_api():
+    """
+    Borrow several books for one patron in one transaction.
+    Batch interface for R3: Book Borrowing (self-checkout kiosks)
+    
+    Body: {"patron_id": "123456", "book_ids": [1, 2, 3]}
+    """
+    patron_id, book_ids = _batch_request_args()
+    success, message, results = borrow_books_by_patron(patron_id, book_ids)
+    
+    if not results:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({
+        'patron_id': patron_id,
+        'success': success,
+        'message': message,
+        'results': results
+    })
+
+@api_bp.route('/return/batch', methods=['POST'])
+def batch_return_api():
+    """
+    Return several books for one patron in one transaction.
+    Batch interface for R4: Book Return Processing (return desk)
+    
+    Body: {"patron_id": "123456", "book_ids": [1, 2, 3]}
+    """
+    patron_id, book_ids = _batch_request_args()
+    success, message, results = return_books_by_patron(patron_id, book_ids)
+    
+    if not results:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({
+        'patron_id': patron_id,
+        'success': success,
+        'message': message,
+        'results': results
+    })
+
+@api_bp.route('/holds', methods=['POST'])
+def place_hold_api():
+    """
+    Join the hold queue for an unavailable book.
+    
+    Body: {"patron_id": "123456", "book_id": 3}
+    """
+    data = request.get_json(silent=True) or {}
+    patron_id = str(data.get('patron_id', '')).strip()
+    book_id = data.get('book_id')
+    if not isinstance(book_id, int):
+        return jsonify({'error': 'Invalid book ID.'}), 400
+    
+    success, message = place_hold(patron_id, book_id)
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'message': message, **get_hold_status(patron_id, book_id)}), 201
+
+@api_bp.route('/holds/<patron_id>/<int:book_id>', methods=['GET'])
+def hold_status_api(patron_id, book_id):
+    """Report a patron's position in a book's hold queue."""
+    return jsonify(get_hold_status(patron_id, book_id))
+
+@api_bp.route('/holds/<patron_id>/<int:book_id>', methods=['DELETE'])
+def cancel_hold_api(patron_id, book_id):
+    """Leave a book's hold queue."""
+    success, message = cancel_hold(patron_id, book_id)
+    if not success:
+        return jsonify({'error': message}), 404
+    return jsonify({'message': message})
+
+@api_bp.route('/availability/stream')
+def availability_stream():
+    """
+    Server-Sent Events stream of availability changes for display screens.
+    
+    Each 'availability' event carries a list of
+    {"book_id", "available_copies", "total_copies"} for books that changed.
+    """
+    # Subscribe before returning so no change between now and the first read is missed
+    subscription = availability_bus.subscribe()
+    response = Response(
+        stream_with_context(stream_events(subscription)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Also covers clients that disconnect before the stream is first read
+    response.call_on_close(subscription.close)
+    return response
+
+# Page size limits for /api/changes
+CHANGES_DEFAULT_LIMIT = 1000
+CHANGES_MAX_LIMIT = 10000
+
+@api_bp.route('/changes')
+def changes_feed():
+    """
+    Incremental change feed for books and borrow_records.
+    
+    Streams newline-delimited JSON, one change per line, for entries after
+    `since`. Consumers store the last seq they processed and pass it back as
+    `since`. X-Latest-Seq tells them whether more pages are waiting.
+    Archived loans appear as deletes from borrow_records.
+    
+    Query: since (default 0), limit (default 1000, max 10000)
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', CHANGES_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if since < 0 or limit <= 0:
+        return jsonify({'error': 'since must be >= 0 and limit must be positive'}), 400
+    limit = min(limit, CHANGES_MAX_LIMIT)
+    
+    def generate():
+        for change in iter_changes(since, limit):
+            change['row'] = json.loads(change['row']) if change['row'] else None
+            yield json.dumps(change) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'X-Latest-Seq': str(get_latest_change_seq())})
+
+@api_bp.route('/changes', methods=['DELETE'])
+def prune_changes():
+    """
+    Drop change_log entries up to and including `through`.
+    
+    Call it with the lowest seq every consumer has processed; later entries
+    are kept. Without it the log grows with every write.
+    
+    Query: through (required, at most X-Latest-Seq)
+    """
+    try:
+        through = int(request.args['through'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'through must be an integer'}), 400
+    latest = get_latest_change_seq()
+    if through < 0 or through > latest:
+        return jsonify({'error': f'through must be between 0 and the latest seq ({latest})'}), 400
+    return jsonify({'deleted': prune_change_log(through), 'latest_seq': latest})
+
+@api_bp.route('/backups', methods=['GET'])
+def list_backups_api():
+    """List database snapshots, newest first."""
+    return jsonify({'backups': list_backups()})
+
+@api_bp.route('/backups', methods=['POST'])
+def create_backup_api():
+    """
+    Take a throttled online snapshot of the database.
+    Restores are only available from the command line.
+    """
+    try:
+        return jsonify(create_backup()), 201
+    except CopyAbandoned:
+        return (jsonify({'error': 'The database is too busy for a snapshot. Please retry later.'}),
+                503, {'Retry-After': '60'})
+
+@api_bp.route('/suggest')
+def suggest_api():
+    """
+    Autocomplete suggestions for the search box.
+    
+    Query: q (prefix of any title/author word), limit (default 10, max 50)
+    """
+    prefix = request.args.get('q', '').strip()
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_SUGGESTIONS)), MAX_SUGGESTIONS)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    return jsonify({'q': prefix, 'suggestions': suggest_index.suggest(prefix, max(limit, 1))})
+
+def _analytics_range():
+    """Parse optional start/end (YYYY-MM-DD) query args; raises ValueError."""
+    start = request.args.get('start')
+    end = request.args.get('end')
+    return (date.fromisoformat(start) if start else None,
+            date.fromisoformat(end) if end else None)
+
+@api_bp.route('/analytics/most-borrowed')
+def most_borrowed_api():
+    """
+    Most borrowed books in a date range.
+    
+    Query: start, end (YYYY-MM-DD, inclusive, optional), limit (default 10)
+    """
+    try:
+        start, end = _analytics_range()
+        limit = int(request.args.get('limit', DEFAULT_REPORT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'start/end must be YYYY-MM-DD and limit an integer'}), 400
+    
+    return jsonify({'start': request.args.get('start'), 'end': request.args.get('end'),
+                    'books': get_most_borrowed_books(start, end, max(limit, 1))})
+
+@api_bp.route('/analytics/loan-length')
+def loan_length_api():
+    """
+    Average loan length of loans returned in a date range.
+    
+    Query: start, end (YYYY-MM-DD, inclusive, optional), book_id (optional)
+    """
+    try:
+        start, end = _analytics_range()
+        book_id = request.args.get('book_id', type=int)
+    except ValueError:
+        return jsonify({'error': 'start/end must be YYYY-MM-DD'}), 400
+    
+    result = get_average_loan_length(start, end, book_id)
+    result.update({'start': request.args.get('start'), 'end': request.args.get('end')})
+    return jsonify(result)
+
+@api_bp.route('/analytics/overdue-by-author')
+def overdue_by_author_api():
+    """
+    Share of returns that were late, per author, in a date range.
+    
+    Query: start, end (YYYY-MM-DD, inclusive, optional), limit (optional)
+    """
+    try:
+        start, end = _analytics_range()
+        limit = request.args.get('limit', type=int)
+    except ValueError:
+        return jsonify({'error': 'start/end must be YYYY-MM-DD'}), 400
+    
+    return jsonify({'start': request.args.get('start'), 'end': request.args.get('end'),
+                    'authors': get_overdue_rate_by_author(start, end, limit)})
+
+@api_bp.route('/availability')
+def branch_availability_api():
+    """
+    On-shelf copies per book and branch.
+    
+    Query: branch, book_id (both optional)
+    """
+    book_id = request.args.get('book_id', type=int)
+    return jsonify({'availability': get_branch_availability(request.args.get('branch'), book_id)})
+
+@api_bp.route('/books/<int:book_id>/copies', methods=['POST'])
+def add_copies_api(book_id):
+    """Shelve new copies of a book. Body: {"count": 2, "branch": "East"}"""
+    data = request.get_json(silent=True) or {}
+    success, message, barcodes = add_copies_to_book(book_id, data.get('count'),
+                                                    data.get('branch') or DEFAULT_BRANCH)
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'message': message, 'barcodes': barcodes}), 201
+
+@api_bp.route('/copies/<barcode>/borrow', methods=['POST'])
+def borrow_copy_api(barcode):
+    """Check out a specific copy. Body: {"patron_id": "123456"}"""
+    data = request.get_json(silent=True) or {}
+    success, message = borrow_copy_by_patron(str(data.get('patron_id', '')).strip(), barcode)
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'message': message})
+
+@api_bp.route('/copies/<barcode>/return', methods=['POST'])
+def return_copy_api(barcode):
+    """Check in a specific copy. Body: {"patron_id": "123456"}"""
+    data = request.get_json(silent=True) or {}
+    success, message = return_copy_by_patron(str(data.get('patron_id', '')).strip(), barcode)
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'message': message})
+
+@api_bp.route('/rate_limits')
+def rate_limits_api():
+    """Rejection counts (by group and 429/503), in-flight requests and configured limits."""
+    return jsonify(current_app.extensions['rate_limiter'].stats())
+
+@api_bp.route('/sql_profile', methods=['GET'])
+def sql_profile_api():
+    """
+    Per-statement SQL timings, busiest first (needs LIBRARY_PROFILE_SQL=1).
+    
+    Query: sort (total_ms, max_ms, count or rows), limit
+    """
+    profiler = get_profiler()
+    if profiler is None:
+        return jsonify({'enabled': False})
+    
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in SUMMARY_SORT_KEYS:
+        return jsonify({'error': f"sort must be one of {', '.join(SUMMARY_SORT_KEYS)}"}), 400
+    
+    return jsonify(profiler.summary(sort, request.args.get('limit', DEFAULT_SUMMARY_LIMIT, type=int)))
+
+@api_bp.route('/sql_profile', methods=['DELETE'])
+def reset_sql_profile_api():
+    """Clear the SQL statistics, e.g. between benchmark runs."""
+    profiler = get_profiler()
+    if profiler is None:
+        return jsonify({'error': 'SQL profiling is not enabled'}), 404
+    
+    profiler.reset()
+    return '', 204
+
+# --- Consolidated JSON API ---------------------------------------------------
+#
+# JSON counterparts of the HTML form routes: no templates, no redirects, no
+# flashes. Service error messages are mapped to status codes below; list and
+# report responses can be trimmed with ?fields=a,b.
+
+BOOK_FIELDS = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies')
+
+# Page size limits for /api/books
+BOOKS_DEFAULT_LIMIT = 100
+BOOKS_MAX_LIMIT = 1000
+
+# HTTP status for a service error message, by message fragment; others are 400
+ERROR_STATUSES = (
+    ('not found', 404),
+    ('not available', 409),
+    ('maximum borrowing limit', 409),
+    ('not borrowed by this patron', 409),
+    ('already exists', 409),
+    ('Database error', 500),
+)
+
+def _error_status(message):
+    return next((status for fragment, status in ERROR_STATUSES if fragment in message), 400)
+
+def _requested_fields(allowed):
+    """Names from ?fields=a,b, or None for all; raises ValueError on unknown names."""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown or not names:
+        raise ValueError(f"fields must be a comma-separated subset of {', '.join(allowed)}")
+    return names
+
+def _select(row, fields):
+    return row if fields is None else {field: row[field] for field in fields}
+
+@api_bp.route('/books', methods=['GET'])
+def list_books_api():
+    """
+    Catalog page in ID order.
+    
+    Query: after (last ID of the previous page, default 0), limit (default
+    100, max 1000), fields. next_after is null on the last page.
+    """
+    try:
+        fields = _requested_fields(BOOK_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        after = int(request.args.get('after', 0))
+        limit = int(request.args.get('limit', BOOKS_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'after and limit must be integers'}), 400
+    if limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    limit = min(limit, BOOKS_MAX_LIMIT)
+    
+    with unit_of_work(read_only=True) as uow:
+        books = uow.books.page_by_id(after, limit)
+    
+    return jsonify({
+        'books': [_select(book, fields) for book in books],
+        'next_after': books[-1]['id'] if len(books) == limit else None
+    })
+
+@api_bp.route('/books/<int:book_id>', methods=['GET'])
+def get_book_api(book_id):
+    """One book. Query: fields"""
+    try:
+        fields = _requested_fields(BOOK_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with unit_of_work(read_only=True) as uow:
+        book = uow.books.get(book_id)
+    if not book:
+        return jsonify({'error': 'Book not found.'}), 404
+    
+    return jsonify(_select(book, fields))
+
+@api_bp.route('/books', methods=['POST'])
+def add_book_api():
+    """
+    Add a book to the catalog.
+    JSON interface for R1: Book Catalog Management
+    
+    Body: {"title": "...", "author": "...", "isbn": "9780000000001", "total_copies": 3}
+    """
+    data = request.get_json(silent=True) or {}
+    total_copies = data.get('total_copies')
+    if not isinstance(total_copies, int) or isinstance(total_copies, bool):
+        return jsonify({'error': 'Total copies must be a valid positive integer.'}), 400
+    
+    isbn = str(data.get('isbn') or '').strip()
+    success, message = add_book_to_catalog(str(data.get('title') or ''), str(data.get('author') or ''),
+                                           isbn, total_copies)
+    if not success:
+        return jsonify({'error': message}), _error_status(message)
+    
+    with unit_of_work(read_only=True) as uow:
+        book = uow.books.get_by_isbn(isbn)
+    response = jsonify({'message': message, 'book': book})
+    response.headers['Location'] = url_for('api.get_book_api', book_id=book['id'])
+    return response, 201
+
+def _loan_request_args():
+    """
+    (patron_id, book_ids, single) from {"patron_id", "book_id"} or
+    {"patron_id", "book_ids": [...]}.
+    """
+    data = request.get_json(silent=True) or {}
+    patron_id = str(data.get('patron_id', '')).strip()
+    if 'book_id' in data:
+        return patron_id, [data['book_id']], True
+    book_ids = data.get('book_ids')
+    return patron_id, book_ids if isinstance(book_ids, list) else [], False
+
+def _loan_response(patron_id, single, success_status, outcome):
+    """
+    Response for a borrow/return through the batch services.
+    
+    A single book gets its own result (or error) and status. A batch gets
+    every result with its own status, and success_status if all succeeded,
+    the shared error status if all failed the same way, 207 otherwise.
+    """
+    success, message, results = outcome
+    if not results:
+        return jsonify({'error': message}), _error_status(message)
+    
+    for result in results:
+        result['status'] = success_status if result['success'] else _error_status(result['message'])
+    statuses = {result['status'] for result in results}
+    status = statuses.pop() if len(statuses) == 1 else 207
+    
+    if single:
+        result = results[0]
+        if not result['success']:
+            return jsonify({'error': result['message'], 'book_id': result['book_id']}), status
+        return jsonify({'patron_id': patron_id, **result}), status
+    
+    return jsonify({'patron_id': patron_id, 'success': success, 'message': message, 'results': results}), status
+
+@api_bp.route('/borrow', methods=['POST'])
+def borrow_api():
+    """
+    Borrow one book, or several in one transaction.
+    JSON interface for R3: Book Borrowing
+    
+    Body: {"patron_id": "123456", "book_id": 3} or {"patron_id": "123456", "book_ids": [1, 2]}
+    Status: 201 borrowed, 404 unknown book, 409 unavailable or at the
+    5-book limit, 207 mixed batch outcome.
+    """
+    patron_id, book_ids, single = _loan_request_args()
+    return _loan_response(patron_id, single, 201, borrow_books_by_patron(patron_id, book_ids))
+
+@api_bp.route('/return', methods=['POST'])
+def return_api():
+    """
+    Return one book, or several in one transaction, with their late fees.
+    JSON interface for R4: Book Return Processing
+    
+    Body: {"patron_id": "123456", "book_id": 3} or {"patron_id": "123456", "book_ids": [1, 2]}
+    Status: 200 returned, 404 unknown book, 409 not on loan to the patron,
+    207 mixed batch outcome.
+    """
+    patron_id, book_ids, single = _loan_request_args()
+    return _loan_response(patron_id, single, 200, return_books_by_patron(patron_id, book_ids))
+
+@api_bp.route('/patrons/<patron_id>/report')
+def patron_report_api(patron_id):
+    """
+    Patron status report (loans, late fees, count, history).
+    JSON interface for R7: Patron Status Report
+    
+    Served from the per-patron report cache (see report_cache_service).
+    
+    Query: fields (subset of the report sections)
+    """
+    if not patron_id.isdigit() or len(patron_id) != 6:
+        return jsonify({'error': 'Invalid patron ID. Must be exactly 6 digits.'}), 400
+    try:
+        fields = _requested_fields(REPORT_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(report_cache.get(patron_id, fields))
+
+@api_bp.route('/report_cache')
+def report_cache_api():
+    """Report cache hit ratio, invalidations, entries and approximate memory use."""
+    return jsonify(report_cache.stats())
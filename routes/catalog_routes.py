@@ -3,7 +3,8 @@ Catalog Routes - Book catalog related endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
+from rendering import stream_page
+from repository import unit_of_work
 from services.library_service import add_book_to_catalog
 
 catalog_bp = Blueprint('catalog', __name__)
@@ -19,8 +20,12 @@ def catalog():
     Display all books in the catalog.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    return stream_page('catalog.html', books=_iter_catalog())
+
+def _iter_catalog():
+    """Books in title order, read page by page while the catalog streams."""
+    with unit_of_work(read_only=True) as uow:
+        yield from uow.books.iter_by_title()
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
@@ -3,6 +3,7 @@ Search Routes - Book search functionality
 """
 
 from flask import Blueprint, render_template, request, flash
+from rendering import stream_page
 from services.library_service import search_books_in_catalog
 
 search_bp = Blueprint('search', __name__)
@@ -25,4 +26,4 @@ def search_books():
     if not books:
         flash('Search functionality is not yet implemented.', 'error')
     
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    return stream_page('search.html', books=books, search_term=search_term, search_type=search_type)
@@ -0,0 +1,171 @@
+"""
+Search Index Module - Trigram index for typo-tolerant title/author search
+
+Titles and authors are normalized (lowercase, accents and punctuation removed)
+and split into words. Each word is padded and cut into trigrams, which are
+stored in book_trigrams clustered by (field, trigram), so a posting list is
+one contiguous range read.
+
+Fuzzy search runs in two steps:
+  1. Candidate generation - read the posting list of each query trigram,
+     skipping lists too common to be selective, and keep the books sharing
+     the most trigrams with the query.
+  2. Ranking - compute a bounded edit distance between each query word and the
+     candidate's words and drop candidates outside the typo budget.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
+FIELDS = {'title': 't', 'author': 'a'}
+
+# Posting lists longer than this are treated as stop-grams (e.g. " th")
+MAX_POSTINGS_PER_TRIGRAM = 2000
+
+# Candidates passed from trigram matching to edit-distance ranking
+MAX_CANDIDATES = 100
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+@lru_cache(maxsize=65536)
+def _normalize_cached(text: str) -> Tuple[str, ...]:
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return tuple(word for word in _NON_WORD.split(text) if word)
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercase, strip accents and punctuation, and split into words."""
+    return list(_normalize_cached(text))
+
+
+def word_trigrams(word: str) -> Set[str]:
+    """Trigrams of a word padded with spaces, so short words still index."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def text_trigrams(text: str) -> Set[str]:
+    trigrams = set()
+    for word in normalize(text):
+        trigrams |= word_trigrams(word)
+    return trigrams
+
+
+def max_typos(word: str) -> int:
+    """Edit budget per query word: none for short words, up to 2 for long ones."""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 6:
+        return 1
+    return 2
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Levenshtein distance between a and b, or limit + 1 once it must exceed limit.
+    
+    Only a diagonal band of width 2 * limit + 1 is computed.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        current = [limit + 1] * (len(b) + 1)
+        current[0] = i
+        for j in range(low, high + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current[low - 1:high + 1]) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[len(b)], limit + 1)
+
+
+def index_book(conn, book_id: int, title: str, author: str):
+    """Add a book's trigrams to book_trigrams on the caller's transaction."""
+    conn.executemany(
+        'INSERT OR IGNORE INTO book_trigrams (field, trigram, book_id) VALUES (?, ?, ?)',
+        [(FIELDS['title'], trigram, book_id) for trigram in text_trigrams(title)] +
+        [(FIELDS['author'], trigram, book_id) for trigram in text_trigrams(author)]
+    )
+
+
+def _match_score(query_words: List[str], field_words: List[str]):
+    """Total edit distance if every query word is within budget, else None."""
+    total = 0
+    for query_word in query_words:
+        limit = max_typos(query_word)
+        best = min((bounded_edit_distance(query_word, word, limit) for word in field_words),
+                   default=limit + 1)
+        if best > limit:
+            return None
+        total += best
+    return total
+
+
+def fuzzy_search(conn, search_term: str, search_type: str, limit: int = 50) -> List[Dict]:
+    """
+    Typo-tolerant search over titles or authors.
+    
+    Args:
+        conn: Open connection with book_trigrams and books
+        search_term: What the patron typed
+        search_type: 'title' or 'author'
+        limit: Maximum results
+        
+    Returns:
+        list: Book dicts ordered by edit distance, then title
+    """
+    field = FIELDS.get(search_type)
+    query_words = normalize(search_term)
+    if not field or not query_words:
+        return []
+
+    trigrams = set()
+    for word in query_words:
+        trigrams |= word_trigrams(word)
+
+    # A probe at offset MAX_POSTINGS_PER_TRIGRAM tells whether a posting list
+    # is too long to be selective without reading it into Python
+    selective = [trigram for trigram in trigrams if conn.execute('''
+        SELECT 1 FROM book_trigrams WHERE field = ? AND trigram = ?
+        LIMIT 1 OFFSET ?
+    ''', (field, trigram, MAX_POSTINGS_PER_TRIGRAM)).fetchone() is None]
+    if not selective:
+        return []
+
+    # Each edit changes at most 3 trigrams, so a match within the typo budget
+    # must share at least this many of the selective trigrams
+    min_shared = max(1, len(selective) - 3 * sum(max_typos(word) for word in query_words))
+
+    placeholders = ','.join('?' * len(selective))
+    candidates = [row[0] for row in conn.execute(f'''
+        SELECT book_id FROM book_trigrams
+        WHERE field = ? AND trigram IN ({placeholders})
+        GROUP BY book_id
+        HAVING COUNT(*) >= ?
+        ORDER BY COUNT(*) DESC
+        LIMIT ?
+    ''', [field] + selective + [min_shared, MAX_CANDIDATES])]
+    if not candidates:
+        return []
+
+    placeholders = ','.join('?' * len(candidates))
+    books = conn.execute(f'SELECT * FROM books WHERE id IN ({placeholders})', candidates).fetchall()
+
+    ranked = []
+    for book in books:
+        score = _match_score(query_words, _normalize_cached(book[search_type]))
+        if score is not None:
+            ranked.append((score, book['title'], dict(book)))
+    ranked.sort(key=lambda entry: entry[:2])
+    return [book for _, _, book in ranked[:limit]]
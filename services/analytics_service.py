@@ -0,0 +1,280 @@
+"""
+Analytics Service Module - Circulation statistics from daily rollups
+
+daily_book_stats holds one row per (day, book) with borrow, return, loan-day
+and overdue-return counts. Triggers on borrow_records keep it current as loans
+are borrowed and returned, so the reports below read a few rows per day in the
+range instead of scanning every loan. Days are epoch day numbers (UTC).
+
+rebuild_rollup_days() recomputes whole days from borrow_records and the archive.
+Each chunk deletes and rewrites its days inside one write transaction, so a
+backfill can run while the triggers are live and is safe to repeat.
+
+Usage:
+    python -m services.analytics_service [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+
+import argparse
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from database import DAY_SQL, attach_archive, get_db_connection, get_read_connection
+
+# Days recomputed per backfill transaction
+BACKFILL_DAYS_PER_CHUNK = 30
+
+DEFAULT_REPORT_LIMIT = 10
+
+EPOCH_DATE = date(1970, 1, 1)
+
+
+def to_day(value: date) -> int:
+    """Convert a date to its epoch day number."""
+    return (value - EPOCH_DATE).days
+
+
+def from_day(day: int) -> date:
+    """Convert an epoch day number back to a date."""
+    return EPOCH_DATE + timedelta(days=day)
+
+
+def _day_filter(start: Optional[date], end: Optional[date]) -> Tuple[str, List]:
+    """WHERE clause restricting daily_book_stats.day to an inclusive date range."""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append('s.day >= ?')
+        params.append(to_day(start))
+    if end is not None:
+        clauses.append('s.day <= ?')
+        params.append(to_day(end))
+    return ('WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def _loan_sources(archive_table: Optional[str]) -> List[str]:
+    return ['borrow_records'] + ([archive_table] if archive_table else [])
+
+
+def loan_day_range(conn, archive_table: Optional[str] = 'borrow_records_archive') -> Tuple[Optional[int], Optional[int]]:
+    """
+    Get the first and last day with any borrow or return.
+
+    Returns:
+        tuple: (first_day, last_day) epoch day numbers, or (None, None) with no loans
+    """
+    first, last = [], []
+    for table in _loan_sources(archive_table):
+        row = conn.execute(f'SELECT MIN(borrow_date), MAX(borrow_date) FROM {table}').fetchone()
+        first.append(row[0])
+        last.append(row[1])
+        last.append(conn.execute(f'SELECT MAX(return_date) FROM {table}').fetchone()[0])
+    first = [value for value in first if value]
+    last = [value for value in last if value]
+    if not first:
+        return None, None
+    return (to_day(datetime.fromisoformat(min(first)).date()),
+            to_day(datetime.fromisoformat(max(last)).date()))
+
+
+def rebuild_rollup_days(conn, first_day: int, last_day: int,
+                        archive_table: Optional[str] = 'borrow_records_archive') -> int:
+    """
+    Recompute daily_book_stats for an inclusive range of days.
+
+    The caller owns the transaction; it should hold the write lock so trigger
+    updates for these days cannot interleave with the rewrite.
+
+    Args:
+        conn: Connection inside a write transaction
+        first_day: First epoch day to rebuild
+        last_day: Last epoch day to rebuild
+        archive_table: Archive table to include, or None for borrow_records only
+
+    Returns:
+        int: Rollup rows written
+    """
+    start_text = from_day(first_day).isoformat()
+    end_text = from_day(last_day + 1).isoformat()
+    conn.execute('DELETE FROM daily_book_stats WHERE day BETWEEN ? AND ?', (first_day, last_day))
+
+    borrowed = ' UNION ALL '.join(
+        f'SELECT book_id, borrow_date FROM {table} WHERE borrow_date >= ? AND borrow_date < ?'
+        for table in _loan_sources(archive_table))
+    returned = ' UNION ALL '.join(
+        f'SELECT book_id, borrow_date, due_date, return_date FROM {table} '
+        f'WHERE return_date >= ? AND return_date < ?'
+        for table in _loan_sources(archive_table))
+    params = [start_text, end_text] * len(_loan_sources(archive_table))
+
+    rows = conn.execute(f'''
+        INSERT INTO daily_book_stats (day, book_id, borrows)
+        SELECT {DAY_SQL.format(column='borrow_date')} AS day, book_id, COUNT(*)
+        FROM ({borrowed})
+        GROUP BY day, book_id
+    ''', params).rowcount
+    rows += conn.execute(f'''
+        INSERT INTO daily_book_stats (day, book_id, returns, loan_days, overdue_returns)
+        SELECT {DAY_SQL.format(column='return_date')} AS day, book_id, COUNT(*),
+               SUM({DAY_SQL.format(column='return_date')} - {DAY_SQL.format(column='borrow_date')}),
+               SUM(date(return_date) > date(due_date))
+        FROM ({returned})
+        WHERE true
+        GROUP BY day, book_id
+        ON CONFLICT (day, book_id) DO UPDATE SET
+            returns = excluded.returns,
+            loan_days = excluded.loan_days,
+            overdue_returns = excluded.overdue_returns
+    ''', params).rowcount
+    return rows
+
+
+def backfill_rollups(start: Optional[date] = None, end: Optional[date] = None,
+                     days_per_chunk: int = BACKFILL_DAYS_PER_CHUNK) -> Dict:
+    """
+    Rebuild the daily rollups from the loan tables, one chunk of days at a time.
+
+    Args:
+        start: First day to rebuild (defaults to the earliest loan)
+        end: Last day to rebuild (defaults to the latest borrow or return)
+        days_per_chunk: Days recomputed per write transaction
+
+    Returns:
+        dict: days rebuilt, rollup rows written, chunks committed and elapsed seconds
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None
+    # ATTACH is not allowed inside a transaction, so resolve the archive first
+    archive_table = attach_archive(conn)
+
+    started = time.perf_counter()
+    rows = 0
+    chunks = 0
+    try:
+        first_day, last_day = loan_day_range(conn, archive_table)
+        if start is not None:
+            first_day = to_day(start)
+        if end is not None:
+            last_day = to_day(end)
+
+        day = first_day
+        while day is not None and last_day is not None and day <= last_day:
+            chunk_end = min(day + days_per_chunk - 1, last_day)
+            conn.execute('BEGIN IMMEDIATE')
+            rows += rebuild_rollup_days(conn, day, chunk_end, archive_table)
+            conn.execute('COMMIT')
+            chunks += 1
+            day = chunk_end + 1
+    finally:
+        conn.close()
+
+    return {
+        'days': 0 if first_day is None or last_day is None else max(last_day - first_day + 1, 0),
+        'rows': rows,
+        'chunks': chunks,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def get_most_borrowed_books(start: Optional[date] = None, end: Optional[date] = None,
+                            limit: int = DEFAULT_REPORT_LIMIT) -> List[Dict]:
+    """
+    Get the books borrowed most often in a date range.
+
+    Returns:
+        list: {'book_id', 'title', 'author', 'borrows'} ordered by borrows
+    """
+    where, params = _day_filter(start, end)
+    conn = get_read_connection()
+    try:
+        rows = conn.execute(f'''
+            SELECT s.book_id, b.title, b.author, SUM(s.borrows) AS borrows
+            FROM daily_book_stats s
+            JOIN books b ON b.id = s.book_id
+            {where}
+            GROUP BY s.book_id
+            HAVING SUM(s.borrows) > 0
+            ORDER BY borrows DESC, s.book_id
+            LIMIT ?
+        ''', params + [limit]).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def get_average_loan_length(start: Optional[date] = None, end: Optional[date] = None,
+                            book_id: Optional[int] = None) -> Dict:
+    """
+    Get the average loan length, in days, of loans returned in a date range.
+
+    Args:
+        start: First return day to include
+        end: Last return day to include
+        book_id: Restrict to one book
+
+    Returns:
+        dict: {'returns', 'loan_days', 'average_days'}; average_days is None
+        when nothing was returned
+    """
+    where, params = _day_filter(start, end)
+    if book_id is not None:
+        where += (' AND ' if where else 'WHERE ') + 's.book_id = ?'
+        params.append(book_id)
+    conn = get_read_connection()
+    try:
+        row = conn.execute(f'''
+            SELECT COALESCE(SUM(s.returns), 0), COALESCE(SUM(s.loan_days), 0)
+            FROM daily_book_stats s
+            {where}
+        ''', params).fetchone()
+    finally:
+        conn.close()
+    returns, loan_days = row[0], row[1]
+    return {
+        'returns': returns,
+        'loan_days': loan_days,
+        'average_days': round(loan_days / returns, 2) if returns else None,
+    }
+
+
+def get_overdue_rate_by_author(start: Optional[date] = None, end: Optional[date] = None,
+                               limit: Optional[int] = None) -> List[Dict]:
+    """
+    Get the share of returns that came back late, per author.
+
+    Returns:
+        list: {'author', 'returns', 'overdue_returns', 'overdue_rate'} ordered by
+        overdue_rate, highest first
+    """
+    where, params = _day_filter(start, end)
+    conn = get_read_connection()
+    try:
+        rows = conn.execute(f'''
+            SELECT b.author, SUM(s.returns) AS returns, SUM(s.overdue_returns) AS overdue_returns,
+                   ROUND(CAST(SUM(s.overdue_returns) AS REAL) / SUM(s.returns), 4) AS overdue_rate
+            FROM daily_book_stats s
+            JOIN books b ON b.id = s.book_id
+            {where}
+            GROUP BY b.author
+            HAVING SUM(s.returns) > 0
+            ORDER BY overdue_rate DESC, returns DESC, b.author
+            LIMIT ?
+        ''', params + [-1 if limit is None else limit]).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the daily circulation rollups.')
+    parser.add_argument('--start', type=date.fromisoformat, default=None)
+    parser.add_argument('--end', type=date.fromisoformat, default=None)
+    parser.add_argument('--days-per-chunk', type=int, default=BACKFILL_DAYS_PER_CHUNK)
+    args = parser.parse_args()
+
+    result = backfill_rollups(args.start, args.end, args.days_per_chunk)
+    print(f"Rebuilt {result['days']} days ({result['rows']} rollup rows) in "
+          f"{result['chunks']} chunks ({result['seconds']}s).")
+
+
+if __name__ == '__main__':
+    main()
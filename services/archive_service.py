@@ -0,0 +1,99 @@
+"""
+Archive Service Module - Moves old returned loans out of borrow_records
+
+Active-loan queries and patron reports only need recent rows in the hot table.
+Returned loans older than the horizon are moved, in small batches, into
+borrow_records_archive (or a separate attached file, see
+database.ARCHIVE_DATABASE). get_patron_borrow_history() unions both tables so
+reports still see the full history.
+
+Usage:
+    python -m services.archive_service [--days N] [--batch-size N]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import clock
+from database import attach_archive, get_db_connection
+
+# Returned loans older than this many days are archived
+ARCHIVE_HORIZON_DAYS = 365
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_returned_loans(horizon_days: int = ARCHIVE_HORIZON_DAYS,
+                           batch_size: int = ARCHIVE_BATCH_SIZE,
+                           now: Optional[datetime] = None) -> Dict:
+    """
+    Move returned loans older than the horizon into the archive.
+    
+    Each batch is copied and deleted in its own short write transaction, so
+    borrows and returns are never blocked for longer than one batch.
+    
+    Args:
+        horizon_days: Minimum age of the return date, in days
+        batch_size: Rows moved per transaction
+        now: Reference time (defaults to the current time)
+        
+    Returns:
+        dict: rows archived, batches committed and elapsed seconds
+    """
+    cutoff = ((now or clock.now()) - timedelta(days=horizon_days)).isoformat()
+    conn = get_db_connection()
+    conn.isolation_level = None
+    archive_table = attach_archive(conn)
+
+    start = time.perf_counter()
+    archived = 0
+    batches = 0
+    try:
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            ids = [row['id'] for row in conn.execute('''
+                SELECT id FROM borrow_records
+                WHERE return_date IS NOT NULL AND return_date < ?
+                ORDER BY return_date
+                LIMIT ?
+            ''', (cutoff, batch_size))]
+            if not ids:
+                conn.execute('COMMIT')
+                break
+
+            placeholders = ','.join('?' * len(ids))
+            conn.execute(f'''
+                INSERT INTO {archive_table} (id, patron_id, book_id, borrow_date, due_date, return_date)
+                SELECT id, patron_id, book_id, borrow_date, due_date, return_date
+                FROM borrow_records WHERE id IN ({placeholders})
+            ''', ids)
+            conn.execute(f'DELETE FROM borrow_records WHERE id IN ({placeholders})', ids)
+            conn.execute('COMMIT')
+
+            archived += len(ids)
+            batches += 1
+    finally:
+        conn.close()
+
+    return {
+        'archived': archived,
+        'batches': batches,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive returned loans older than a horizon.')
+    parser.add_argument('--days', type=int, default=ARCHIVE_HORIZON_DAYS)
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    result = archive_returned_loans(args.days, args.batch_size)
+    print(f"Archived {result['archived']} loans in {result['batches']} batches "
+          f"({result['seconds']}s).")
+
+
+if __name__ == '__main__':
+    main()
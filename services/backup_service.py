@@ -0,0 +1,208 @@
+"""
+Backup Service Module - Online snapshots of the library database
+
+Snapshots are taken with database.copy_database, which copies a few pages at
+a time and lets other connections read and write between steps. A pause after
+each step throttles the copy so live traffic is not starved of I/O. Writes
+restart a paged copy; after BACKUP_MAX_RESTARTS restarts the snapshot is
+abandoned (database.CopyAbandoned) and should be retried when it is quieter.
+
+Each snapshot gets a .sha256 sidecar file, old snapshots are rotated out, and
+restore_backup() verifies a snapshot before copying it back online.
+
+Usage:
+    python -m services.backup_service backup [--dir DIR] [--keep N]
+    python -m services.backup_service list [--dir DIR]
+    python -m services.backup_service restore PATH
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import database
+
+BACKUP_DIR = 'backups'
+
+# Number of snapshots kept by rotation
+BACKUP_RETENTION = 7
+
+# Pages copied per step, and pause between steps (seconds)
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.005
+
+# Restarts caused by concurrent writes before a snapshot is abandoned
+BACKUP_MAX_RESTARTS = 5
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as snapshot:
+        for block in iter(lambda: snapshot.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_backups(backup_dir: Optional[str] = None) -> List[Dict]:
+    """List snapshots in a directory (default BACKUP_DIR), newest first."""
+    backup_dir = backup_dir or BACKUP_DIR
+    backups = []
+    for path in sorted(glob.glob(os.path.join(backup_dir, 'library-*.db')), reverse=True):
+        backups.append({
+            'path': path,
+            'bytes': os.path.getsize(path),
+            'verified': os.path.exists(path + '.sha256'),
+        })
+    return backups
+
+
+def _rotate(backup_dir: str, keep: int) -> List[str]:
+    removed = []
+    for backup in list_backups(backup_dir)[keep:]:
+        for path in (backup['path'], backup['path'] + '.sha256'):
+            if os.path.exists(path):
+                os.remove(path)
+        removed.append(backup['path'])
+    return removed
+
+
+def _copy_online(source, target, pages_per_step: int, pause: float) -> int:
+    """
+    Page-wise backup from source to target. Returns total pages copied.
+    
+    Only used for restores: the snapshot being read is never written, so
+    the copy cannot be restarted by concurrent writes.
+    """
+    progress = {'pages': 0}
+
+    def throttle(status, remaining, total):
+        progress['pages'] = total
+        if remaining and pause:
+            time.sleep(pause)
+
+    source.backup(target, pages=pages_per_step, progress=throttle)
+    return progress['pages']
+
+
+def create_backup(backup_dir: Optional[str] = None, keep: int = BACKUP_RETENTION,
+                  pages_per_step: int = BACKUP_PAGES_PER_STEP,
+                  pause: float = BACKUP_STEP_PAUSE, max_restarts: int = BACKUP_MAX_RESTARTS) -> Dict:
+    """
+    Take a checksummed snapshot of the live database.
+    
+    The copy is written under a temporary name and renamed only after the
+    checksum is recorded, so a listed snapshot is always complete.
+    
+    Returns:
+        dict: path, sha256, bytes, pages, seconds, mb_per_second and rotated paths
+        
+    Raises:
+        database.CopyAbandoned: If concurrent writes restarted the copy more
+            than `max_restarts` times; nothing is left behind
+    """
+    backup_dir = backup_dir or BACKUP_DIR
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"library-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db"
+    path = os.path.join(backup_dir, name)
+    tmp_path = path + '.tmp'
+
+    start = time.perf_counter()
+    source = database.get_db_connection()
+    try:
+        pages = database.copy_database(source, tmp_path, pages_per_step, pause, max_restarts)
+    finally:
+        source.close()
+    elapsed = time.perf_counter() - start
+
+    checksum = _sha256(tmp_path)
+    with open(path + '.sha256', 'w') as sidecar:
+        sidecar.write(f"{checksum}  {name}\n")
+    os.replace(tmp_path, path)
+
+    size = os.path.getsize(path)
+    return {
+        'path': path,
+        'sha256': checksum,
+        'bytes': size,
+        'pages': pages,
+        'seconds': round(elapsed, 3),
+        'mb_per_second': round(size / (1024 * 1024) / elapsed, 2) if elapsed else None,
+        'rotated': _rotate(backup_dir, keep),
+    }
+
+
+def verify_backup(path: str) -> Optional[str]:
+    """Return an error message if a snapshot fails its checksum or integrity check."""
+    try:
+        with open(path + '.sha256') as sidecar:
+            expected = sidecar.read().split()[0]
+    except OSError:
+        return "Checksum file is missing."
+    if _sha256(path) != expected:
+        return "Checksum mismatch."
+
+    conn = database.open_read_only(path)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        conn.close()
+    return None if result == 'ok' else f"Integrity check failed: {result}"
+
+
+def restore_backup(path: str, pages_per_step: int = BACKUP_PAGES_PER_STEP,
+                   pause: float = BACKUP_STEP_PAUSE) -> Dict:
+    """
+    Verify a snapshot and copy it over the live database.
+    
+    Raises:
+        ValueError: If the snapshot fails verification
+    """
+    error = verify_backup(path)
+    if error:
+        raise ValueError(error)
+
+    start = time.perf_counter()
+    source = sqlite3.connect(path)
+    target = database.get_db_connection()
+    try:
+        pages = _copy_online(source, target, pages_per_step, pause)
+    finally:
+        target.close()
+        source.close()
+    return {'path': path, 'pages': pages, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Back up or restore the library database.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    backup = commands.add_parser('backup')
+    backup.add_argument('--dir', default=BACKUP_DIR)
+    backup.add_argument('--keep', type=int, default=BACKUP_RETENTION)
+    listing = commands.add_parser('list')
+    listing.add_argument('--dir', default=BACKUP_DIR)
+    restore = commands.add_parser('restore')
+    restore.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'backup':
+        try:
+            result = create_backup(args.dir, args.keep)
+        except database.CopyAbandoned as error:
+            parser.exit(1, f"Backup abandoned: {error} Retry when the database is quieter.\n")
+        print(f"{result['path']}: {result['bytes']} bytes, {result['pages']} pages "
+              f"in {result['seconds']}s ({result['mb_per_second']} MB/s)")
+    elif args.command == 'list':
+        for backup in list_backups(args.dir):
+            print(f"{backup['path']}  {backup['bytes']} bytes")
+    else:
+        result = restore_backup(args.path)
+        print(f"Restored {result['pages']} pages from {result['path']} in {result['seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Event Service Module - In-process pub/sub for live availability updates
+
+Availability changes are published once and fanned out to every subscriber's
+bounded buffer. A slow subscriber never blocks publishers: when its buffer is
+full the oldest event is dropped and the subscriber is told to resync.
+
+Note: each Server-Sent Events client holds one worker thread for the life of
+its connection, so large numbers of displays need a threaded or async server.
+"""
+
+import json
+import threading
+from collections import deque
+from itertools import count
+from typing import Dict, Iterator, List, Optional
+
+import database
+
+# Events kept per subscriber before the oldest are dropped
+SUBSCRIBER_BUFFER_SIZE = 256
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+
+class Subscription:
+    """A subscriber's bounded event buffer."""
+
+    def __init__(self, bus: 'EventBus', maxlen: int):
+        self._bus = bus
+        self._events = deque(maxlen=maxlen)
+        self._ready = threading.Condition()
+        self.dropped = 0
+
+    def _push(self, event: Dict):
+        with self._ready:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout: Optional[float] = None) -> List[Dict]:
+        """Wait up to `timeout` seconds and return all buffered events."""
+        with self._ready:
+            if not self._events:
+                self._ready.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """Fan-out of published events to all current subscriptions."""
+
+    def __init__(self, buffer_size: int = SUBSCRIBER_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._ids = count(1)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self, self.buffer_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event_type: str, data) -> Dict:
+        """Buffer one event for every subscriber."""
+        event = {'id': next(self._ids), 'type': event_type, 'data': data}
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription._push(event)
+        return event
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+
+availability_bus = EventBus()
+
+
+def _publish_availability(changes: List[Dict]):
+    availability_bus.publish('availability', changes)
+
+
+def register_availability_events():
+    """Publish every committed availability change on availability_bus."""
+    if _publish_availability not in database.availability_listeners:
+        database.availability_listeners.append(_publish_availability)
+
+
+def format_sse(event: Dict) -> str:
+    """Encode an event in text/event-stream format."""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def stream_events(subscription: Subscription, heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+    """
+    Yield Server-Sent Events for a subscription until the client disconnects.
+    
+    A 'resync' event is sent if the subscriber fell behind and lost events,
+    telling the display to fetch the catalog once before applying deltas again.
+    """
+    reported_drops = 0
+    try:
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        while True:
+            events = subscription.get(timeout=heartbeat)
+            if subscription.dropped > reported_drops:
+                reported_drops = subscription.dropped
+                yield format_sse({'id': events[0]['id'] if events else 0, 'type': 'resync',
+                                  'data': {'dropped': reported_drops}})
+            if not events:
+                yield ": keep-alive\n\n"
+            for event in events:
+                yield format_sse(event)
+    finally:
+        subscription.close()
@@ -0,0 +1,144 @@
+"""
+Fee Service Module - Late-fee policies compiled into lookup tables
+
+A FeePolicy describes how a patron class is charged: daily rate tiers, a grace
+period, an optional per-book cap and days the library is closed (not charged).
+compile() turns it into
+  - a fee table indexed by chargeable days, filled until the cap is reached
+    (or, uncapped, for FEE_TABLE_DAYS with the last rate extrapolated), and
+  - a running count of closed days indexed by date ordinal,
+so assessing a loan is two subtractions and two list lookups.
+
+The default 'standard' policy is the R5 rule: $0.50/day for the first 7 days,
+$1.00/day after that, at most $15.00 per book. Fee assessment for returns,
+reports, notices, payments and refunds all go through get_policy().
+"""
+
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Uncapped policies are tabulated this far, then extrapolated at the last rate
+FEE_TABLE_DAYS = 366
+
+DEFAULT_PATRON_CLASS = 'standard'
+
+
+class FeePolicy:
+    """
+    Late-fee rules for one patron class.
+
+    Args:
+        name: Patron class the policy applies to
+        tiers: (days, daily_rate) pairs applied in order; days=None means
+            "every remaining day" and must come last
+        grace_days: Chargeable days forgiven before the first tier starts
+        max_fee: Cap per book, or None for no cap
+        closed_days: Dates the library is closed; they are not charged
+    """
+
+    def __init__(self, name: str, tiers: Sequence[Tuple[Optional[int], float]],
+                 grace_days: int = 0, max_fee: Optional[float] = None,
+                 closed_days: Iterable[date] = ()):
+        self.name = name
+        self.tiers = list(tiers)
+        self.grace_days = grace_days
+        self.max_fee = max_fee
+        self.closed_days = sorted(set(closed_days))
+
+    def compile(self) -> 'CompiledFeePolicy':
+        """Precompute the fee and closed-day tables."""
+        fees = [0.0]
+        fee = 0.0
+        day = 0
+        last_rate = 0.0
+        for tier_days, rate in [(self.grace_days, 0.0)] + self.tiers:
+            last_rate = rate
+            remaining = FEE_TABLE_DAYS - day if tier_days is None else tier_days
+            for _ in range(remaining):
+                if self.max_fee is not None and fee >= self.max_fee:
+                    break
+                fee += rate
+                if self.max_fee is not None:
+                    fee = min(fee, self.max_fee)
+                fees.append(round(fee, 2))
+                day += 1
+        capped = self.max_fee is not None and fee >= self.max_fee
+        return CompiledFeePolicy(self, fees, 0.0 if capped else last_rate)
+
+
+class CompiledFeePolicy:
+    """Table-driven fee assessment for one FeePolicy."""
+
+    def __init__(self, policy: FeePolicy, fees: List[float], overflow_rate: float):
+        self.policy = policy
+        self.name = policy.name
+        self.max_fee = policy.max_fee
+        self._fees = fees
+        self._last_day = len(fees) - 1
+        self._overflow_rate = overflow_rate
+
+        # _closed_before[i] = closed days with ordinal < _first_ordinal + i
+        self._closed_before = [0]
+        self._first_ordinal = 0
+        if policy.closed_days:
+            self._first_ordinal = policy.closed_days[0].toordinal()
+            closed = {d.toordinal() for d in policy.closed_days}
+            for ordinal in range(self._first_ordinal, policy.closed_days[-1].toordinal() + 1):
+                self._closed_before.append(self._closed_before[-1] + (ordinal in closed))
+
+    def fee_for_days(self, chargeable_days: int) -> float:
+        """Fee for a number of chargeable (open, overdue) days."""
+        if chargeable_days <= 0:
+            return 0.0
+        if chargeable_days <= self._last_day:
+            return self._fees[chargeable_days]
+        fee = self._fees[-1] + (chargeable_days - self._last_day) * self._overflow_rate
+        return round(fee if self.max_fee is None else min(fee, self.max_fee), 2)
+
+    def _closed_until(self, ordinal: int) -> int:
+        index = ordinal - self._first_ordinal
+        if index <= 0:
+            return 0
+        return self._closed_before[min(index, len(self._closed_before) - 1)]
+
+    def assess(self, due_date: datetime, now: datetime) -> Tuple[float, int]:
+        """
+        Fee for a loan due on due_date, assessed at now.
+
+        Returns:
+            tuple: (fee, days_overdue); days_overdue counts calendar days,
+            the fee skips closed days
+        """
+        due, today = due_date.toordinal(), now.toordinal()
+        days_overdue = today - due
+        if days_overdue <= 0:
+            return 0.0, 0
+        closed = self._closed_until(today + 1) - self._closed_until(due + 1)
+        return self.fee_for_days(days_overdue - closed), days_overdue
+
+
+# Patron class -> policy. Deployments add classes or closed days here.
+POLICIES: Dict[str, FeePolicy] = {
+    DEFAULT_PATRON_CLASS: FeePolicy(DEFAULT_PATRON_CLASS, [(7, 0.50), (None, 1.00)], max_fee=15.00),
+}
+
+# Patron ID -> class for patrons not on the default policy
+PATRON_CLASSES: Dict[str, str] = {}
+
+_compiled: Dict[str, CompiledFeePolicy] = {}
+
+
+def get_policy(patron_id: Optional[str] = None) -> CompiledFeePolicy:
+    """Get the compiled policy for a patron (the default policy when None or unknown)."""
+    name = PATRON_CLASSES.get(patron_id, DEFAULT_PATRON_CLASS) if patron_id else DEFAULT_PATRON_CLASS
+    policy = POLICIES.get(name) or POLICIES[DEFAULT_PATRON_CLASS]
+    compiled = _compiled.get(policy.name)
+    if compiled is None or compiled.policy is not policy:
+        compiled = _compiled[policy.name] = policy.compile()
+    return compiled
+
+
+def max_refundable_fee() -> float:
+    """Largest per-book fee any policy can charge (inf if any policy is uncapped)."""
+    caps = [policy.max_fee for policy in POLICIES.values()]
+    return float('inf') if None in caps else max(caps)
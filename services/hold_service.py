@@ -0,0 +1,145 @@
+"""
+Hold Service Module - Reservation queue for unavailable books
+
+Each book has a FIFO queue of holds. A hold is 'waiting' until a returned copy
+is assigned to it (database.assign_copies_to_holds, run inside the return
+transaction), then 'ready' until the patron borrows the book ('fulfilled') or
+cancels it ('cancelled').
+"""
+
+from typing import Dict, Tuple
+
+import clock
+from database import assign_copies_to_holds, get_db_connection, notify_availability_change
+
+
+def _valid_patron_id(patron_id: str) -> bool:
+    return bool(patron_id) and patron_id.isdigit() and len(patron_id) == 6
+
+
+def place_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Join the hold queue for a book that has no copies available.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to reserve
+        
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not _valid_patron_id(patron_id):
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+    
+    conn = get_db_connection()
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+        if not book:
+            conn.execute('ROLLBACK')
+            return False, "Book not found."
+        if book['available_copies'] > 0:
+            conn.execute('ROLLBACK')
+            return False, "This book is available now. Borrow it instead of placing a hold."
+        
+        existing = conn.execute('''
+            SELECT 1 FROM holds
+            WHERE patron_id = ? AND book_id = ? AND status IN ('waiting', 'ready')
+        ''', (patron_id, book_id)).fetchone()
+        if existing:
+            conn.execute('ROLLBACK')
+            return False, "You already have a hold on this book."
+        
+        # Positions only ever grow, so MAX() is a single index seek
+        position = conn.execute('''
+            SELECT COALESCE(MAX(position), 0) + 1 FROM holds WHERE book_id = ?
+        ''', (book_id,)).fetchone()[0]
+        conn.execute('''
+            INSERT INTO holds (patron_id, book_id, position, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', (patron_id, book_id, position, clock.now().isoformat()))
+        ahead = conn.execute('''
+            SELECT COUNT(*) FROM holds
+            WHERE book_id = ? AND status = 'waiting' AND position < ?
+        ''', (book_id, position)).fetchone()[0]
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+    
+    return True, f'Hold placed on "{book["title"]}". Queue position: {ahead + 1}.'
+
+
+def get_hold_status(patron_id: str, book_id: int) -> Dict:
+    """
+    Get a patron's place in a book's hold queue.
+    
+    Both counts are range scans over idx_holds_queue, so the cost depends on
+    the queue length for this one book, never on the size of the holds table.
+    
+    Returns:
+        dict: status ('waiting', 'ready' or 'none'), position and queue_length
+    """
+    conn = get_db_connection()
+    hold = conn.execute('''
+        SELECT * FROM holds
+        WHERE patron_id = ? AND book_id = ? AND status IN ('waiting', 'ready')
+    ''', (patron_id, book_id)).fetchone()
+    queue_length = conn.execute('''
+        SELECT COUNT(*) FROM holds WHERE book_id = ? AND status = 'waiting'
+    ''', (book_id,)).fetchone()[0]
+    
+    position = None
+    if hold and hold['status'] == 'waiting':
+        position = conn.execute('''
+            SELECT COUNT(*) FROM holds
+            WHERE book_id = ? AND status = 'waiting' AND position <= ?
+        ''', (book_id, hold['position'])).fetchone()[0]
+    conn.close()
+    
+    return {
+        'patron_id': patron_id,
+        'book_id': book_id,
+        'status': hold['status'] if hold else 'none',
+        'position': position,
+        'queue_length': queue_length
+    }
+
+
+def cancel_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Leave a book's hold queue.
+    
+    Cancelling a ready hold passes the set-aside copy to the next waiting
+    hold, or back to the shelf if nobody is waiting.
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not _valid_patron_id(patron_id):
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+    
+    conn = get_db_connection()
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        hold = conn.execute('''
+            SELECT * FROM holds
+            WHERE patron_id = ? AND book_id = ? AND status IN ('waiting', 'ready')
+        ''', (patron_id, book_id)).fetchone()
+        if not hold:
+            conn.execute('ROLLBACK')
+            return False, "No active hold found for this book."
+        
+        conn.execute("UPDATE holds SET status = 'cancelled' WHERE id = ?", (hold['id'],))
+        if hold['status'] == 'ready':
+            leftover = assign_copies_to_holds(conn, {book_id: 1})[book_id]
+            conn.execute('UPDATE books SET available_copies = available_copies + ? WHERE id = ?',
+                         (leftover, book_id))
+        conn.execute('COMMIT')
+        if hold['status'] == 'ready' and leftover:
+            notify_availability_change(conn, [book_id])
+    finally:
+        conn.close()
+    
+    return True, "Hold cancelled."
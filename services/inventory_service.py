@@ -0,0 +1,109 @@
+"""
+Inventory Service Module - Physical copies and branches
+
+Every book has one copies row per physical item (barcode, branch, status).
+Triggers on borrow_records and holds move copies between 'available',
+'on_loan' and 'held', so title-level borrows and returns keep them in step;
+the functions here work on a specific copy or branch. The books counters
+(total_copies/available_copies) remain the fast title-level summary.
+"""
+
+import sqlite3
+from typing import List, Tuple
+
+import clock
+from database import (
+    DEFAULT_BRANCH, create_copies, get_copy_by_barcode, get_db_connection,
+    notify_availability_change
+)
+from repository import unit_of_work
+from services.fee_service import get_policy
+from services.library_service import borrow_book_by_patron
+
+# Largest number of copies added in one call
+MAX_COPIES_PER_REQUEST = 100
+
+
+def add_copies_to_book(book_id: int, count: int, branch: str = DEFAULT_BRANCH) -> Tuple[bool, str, List[str]]:
+    """
+    Shelve new copies of an existing book at a branch.
+
+    Args:
+        book_id: ID of the book
+        count: Number of copies to add
+        branch: Branch the copies are shelved at
+
+    Returns:
+        tuple: (success: bool, message: str, barcodes: list)
+    """
+    if not isinstance(count, int) or isinstance(count, bool) or not 0 < count <= MAX_COPIES_PER_REQUEST:
+        return False, f"Count must be between 1 and {MAX_COPIES_PER_REQUEST}.", []
+    if not branch or not branch.strip():
+        return False, "Branch is required.", []
+
+    conn = get_db_connection()
+    try:
+        if not conn.execute('SELECT 1 FROM books WHERE id = ?', (book_id,)).fetchone():
+            return False, "Book not found.", []
+        copy_ids = create_copies(conn, book_id, ['available'] * count, branch.strip())
+        conn.execute('''
+            UPDATE books SET total_copies = total_copies + ?, available_copies = available_copies + ?
+            WHERE id = ?
+        ''', (count, count, book_id))
+        placeholders = ','.join('?' * len(copy_ids))
+        barcodes = [row['barcode'] for row in conn.execute(
+            f'SELECT barcode FROM copies WHERE id IN ({placeholders}) ORDER BY id', copy_ids)]
+        conn.commit()
+        notify_availability_change(conn, [book_id])
+    finally:
+        conn.close()
+
+    return True, f"Added {count} copies at {branch.strip()}.", barcodes
+
+
+def borrow_copy_by_patron(patron_id: str, barcode: str) -> Tuple[bool, str]:
+    """
+    Check out the physical copy with this barcode.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    copy = get_copy_by_barcode(barcode)
+    if not copy:
+        return False, "Copy not found."
+    if copy['status'] != 'available':
+        return False, "This copy is not available."
+    return borrow_book_by_patron(patron_id, copy['book_id'], copy_id=copy['id'])
+
+
+def return_copy_by_patron(patron_id: str, barcode: str) -> Tuple[bool, str]:
+    """
+    Check in the physical copy with this barcode.
+
+    Only the loan of this copy is closed, even if the patron has other
+    copies of the same title. The copy goes to the first waiting hold or
+    back on the shelf in the same transaction.
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    copy = get_copy_by_barcode(barcode)
+    if not copy:
+        return False, "Copy not found."
+    try:
+        with unit_of_work() as uow:
+            loan = uow.loans.open_loan_for_copy(patron_id, copy['id'])
+            if not loan:
+                return False, "This copy is not borrowed by this patron."
+            return_date = clock.now()
+            uow.loans.mark_returned(patron_id, [loan['id']], return_date)
+            uow.books.adjust_available(uow.holds.assign_returned({loan['book_id']: 1}))
+            book = uow.books.get(loan['book_id'])
+    except sqlite3.Error:
+        return False, "Database error occurred while processing the return."
+
+    fee, days_overdue = get_policy(patron_id).assess(loan['due_date'], return_date)
+    if days_overdue > 0 and fee > 0:
+        return True, (f'Book: "{book["title"]}" returned successfully. '
+                      f'Late by: {days_overdue} day(s). Fee: ${fee:.2f}.')
+    return True, f'Book: "{book["title"]}" returned successfully. No late fees.'
@@ -3,51 +3,82 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+from __future__ import annotations
+
+import sqlite3
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import clock
 from database import (
     get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
     insert_book, insert_borrow_record, update_book_availability,
     update_borrow_record_return_date, get_all_books,
-    get_patron_borrowed_books, get_db_connection  # added two imports for a2
+    get_patron_borrowed_books, get_db_connection,  # added two imports for a2
+    get_patron_borrow_history, get_ready_hold, fulfill_hold, get_read_connection,
+    get_available_copy
 )
-from services.payment_service import PaymentGateway
+from repository import unit_of_work
+from services.fee_service import get_policy, max_refundable_fee
+from search_index import fuzzy_search
 
-def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+if TYPE_CHECKING:
+    # The payment stack (and its HTTP client) is imported lazily so workers
+    # that never take payments don't pay for it at start-up.
+    from services.payment_service import PaymentGateway
+
+MAX_BOOKS_PER_PATRON = 5
+
+# Largest list of book IDs accepted by the batch borrow/return functions
+MAX_BATCH_SIZE = 50
+
+def validate_book_fields(title: str, author: str, isbn: str, total_copies: int) -> Optional[str]:
     """
-    Add a new book to the catalog.
-    Implements R1: Book Catalog Management
+    Check a book's fields against the R1 rules (not including ISBN uniqueness).
     
-    Args:
-        title: Book title (max 200 chars)
-        author: Book author (max 100 chars)
-        isbn: 13-digit ISBN
-        total_copies: Number of copies (positive integer)
-        
     Returns:
-        tuple: (success: bool, message: str)
+        str: The first error message, or None if the fields are valid
     """
-    # Input validation
     if not title or not title.strip():
-        return False, "Title is required."
+        return "Title is required."
     
     if len(title.strip()) > 200:
-        return False, "Title must be less than 200 characters."
+        return "Title must be less than 200 characters."
     
     if not author or not author.strip():
-        return False, "Author is required."
+        return "Author is required."
     
     if len(author.strip()) > 100:
-        return False, "Author must be less than 100 characters."
+        return "Author must be less than 100 characters."
     
     if len(isbn) != 13:
-        return False, "ISBN must be exactly 13 digits."
+        return "ISBN must be exactly 13 digits."
     
     if not isbn.isdigit(): # added in a2
-        return False, "ISBN must include only digits."
+        return "ISBN must include only digits."
     
     if not isinstance(total_copies, int) or total_copies <= 0:
-        return False, "Total copies must be a positive integer."
+        return "Total copies must be a positive integer."
+    
+    return None
+
+def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+    """
+    Add a new book to the catalog.
+    Implements R1: Book Catalog Management
+    
+    Args:
+        title: Book title (max 200 chars)
+        author: Book author (max 100 chars)
+        isbn: 13-digit ISBN
+        total_copies: Number of copies (positive integer)
+        
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    error = validate_book_fields(title, author, isbn, total_copies)
+    if error:
+        return False, error
     
     # Check for duplicate ISBN
     existing = get_book_by_isbn(isbn)
@@ -61,7 +92,8 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     else:
         return False, "Database error occurred while adding the book."
 
-def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
+def borrow_book_by_patron(patron_id: str, book_id: int, branch: Optional[str] = None,
+                          copy_id: Optional[int] = None) -> Tuple[bool, str]:
     """
     Allow a patron to borrow a book.
     Implements R3 as per requirements  
@@ -69,6 +101,8 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     Args:
         patron_id: 6-digit library card ID
         book_id: ID of the book to borrow
+        branch: Only check out a copy shelved at this branch
+        copy_id: Check out this specific copy (see inventory_service)
         
     Returns:
         tuple: (success: bool, message: str)
@@ -82,25 +116,42 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not book:
         return False, "Book not found."
     
-    if book['available_copies'] <= 0:
+    # A copy set aside for this patron's hold can be borrowed even at 0 available
+    hold = get_ready_hold(patron_id, book_id)
+    
+    if book['available_copies'] <= 0 and not hold:
         return False, "This book is currently not available."
     
     # Check patron's current borrowed books count
     current_borrowed = get_patron_borrow_count(patron_id)
     
-    if current_borrowed >= 5: # fixed in a2
+    if current_borrowed >= MAX_BOOKS_PER_PATRON: # fixed in a2
         return False, "You have reached the maximum borrowing limit of 5 books."
     
+    # A held copy is already set aside, wherever it is shelved
+    if branch and not hold and copy_id is None:
+        copy = get_available_copy(book_id, branch)
+        if not copy:
+            return False, f"No copies of this book are available at {branch}."
+        copy_id = copy['id']
+    
     # Create borrow record
-    borrow_date = datetime.now()
+    borrow_date = clock.now()
     due_date = borrow_date + timedelta(days=14)
     
     # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
+    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date, copy_id=copy_id)
     if not borrow_success:
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
+    if hold and copy_id is not None:
+        # A different copy was scanned: it leaves the shelf and the held one returns to it
+        availability_success = fulfill_hold(hold['id'], release_held_copy=True)
+    elif hold:
+        # The held copy was never put back on the shelf
+        availability_success = fulfill_hold(hold['id'])
+    else:
+        availability_success = update_book_availability(book_id, -1)
     if not availability_success:
         return False, "Database error occurred while updating book availability."
     
@@ -126,7 +177,7 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not borrowed_book:
         return False, "This book is not borrowed by this patron."
     
-    return_date = datetime.now()
+    return_date = clock.now()
     update_success = update_borrow_record_return_date(patron_id, book_id, return_date)
     if not update_success:
         return False, "Database error occurred while updating return record."
@@ -153,6 +204,151 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     
     return True, message
 
+def _validate_batch(patron_id: str, book_ids: List[int]) -> Optional[str]:
+    """Return an error message if a batch request is malformed."""
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return "Invalid patron ID. Must be exactly 6 digits."
+    if not book_ids:
+        return "At least one book ID is required."
+    if len(book_ids) > MAX_BATCH_SIZE:
+        return f"A batch may contain at most {MAX_BATCH_SIZE} books."
+    if not all(isinstance(book_id, int) and not isinstance(book_id, bool) for book_id in book_ids):
+        return "Book IDs must be integers."
+    return None
+
+def borrow_books_by_patron(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Borrow several books for one patron in a single transaction.
+    
+    Applies the R3 rules to each book in order, with the 5-book limit counted
+    across the whole batch. Uses a fixed number of queries regardless of batch size.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books to borrow, in scan order
+        
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-book dicts
+        with book_id, success, message and due_date)
+    """
+    error = _validate_batch(patron_id, book_ids)
+    if error:
+        return False, error, []
+    
+    try:
+        with unit_of_work() as uow:
+            books = uow.books.get_many(book_ids)
+            current_borrowed = uow.loans.count_active(patron_id)
+            ready_holds = uow.holds.ready_for_patron(patron_id, book_ids)
+            
+            borrow_date = clock.now()
+            due_date = borrow_date + timedelta(days=14)
+            results = []
+            borrowed = []
+            from_shelf = {}
+            fulfilled = []
+            for book_id in book_ids:
+                book = books.get(book_id)
+                if not book:
+                    success, message = False, "Book not found."
+                elif book['available_copies'] <= 0 and book_id not in ready_holds:
+                    success, message = False, "This book is currently not available."
+                elif current_borrowed >= MAX_BOOKS_PER_PATRON:
+                    success, message = False, "You have reached the maximum borrowing limit of 5 books."
+                else:
+                    if book_id in ready_holds:
+                        fulfilled.append(ready_holds.pop(book_id))
+                    else:
+                        book['available_copies'] -= 1
+                        from_shelf[book_id] = from_shelf.get(book_id, 0) - 1
+                    current_borrowed += 1
+                    borrowed.append(book_id)
+                    success, message = True, f'Successfully borrowed "{book["title"]}".'
+                results.append({
+                    'book_id': book_id,
+                    'success': success,
+                    'message': message,
+                    'due_date': due_date.strftime("%Y-%m-%d") if success else None
+                })
+            
+            uow.loans.add_many(patron_id, borrowed, borrow_date, due_date)
+            uow.books.adjust_available(from_shelf)
+            uow.holds.fulfill(fulfilled)
+    except sqlite3.Error:
+        return False, "Database error occurred while processing the batch.", []
+    
+    return bool(borrowed), f"Borrowed {len(borrowed)} of {len(book_ids)} books.", results
+
+def return_books_by_patron(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Return several books for one patron in a single transaction.
+    
+    Applies the R4 rules to each book and computes the R5 late fee from the
+    loan's due date. Uses a fixed number of queries regardless of batch size.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books being returned
+        
+    Returns:
+        tuple: (success: bool, message: str, results: list of per-book dicts
+        with book_id, success, message, fee_amount and days_overdue)
+    """
+    error = _validate_batch(patron_id, book_ids)
+    if error:
+        return False, error, []
+    
+    try:
+        with unit_of_work() as uow:
+            books = uow.books.get_many(book_ids)
+            open_loans = uow.loans.open_loans(patron_id, book_ids)
+            
+            return_date = clock.now()
+            results = []
+            returned = []
+            for book_id in book_ids:
+                book = books.get(book_id)
+                loans = open_loans.get(book_id)
+                fee, days_overdue = 0.0, 0
+                if not book:
+                    success, message = False, "Book not found."
+                elif not loans:
+                    success, message = False, "This book is not borrowed by this patron."
+                else:
+                    loan = loans.pop(0)
+                    returned.append((loan['id'], book_id))
+                    fee, days_overdue = _late_fee_for_due_date(loan['due_date'], return_date, patron_id)
+                    success, message = True, f'Book: "{book["title"]}" returned successfully.'
+                results.append({
+                    'book_id': book_id,
+                    'success': success,
+                    'message': message,
+                    'fee_amount': round(fee, 2),
+                    'days_overdue': days_overdue
+                })
+            
+            uow.loans.mark_returned(patron_id, [loan_id for loan_id, _ in returned], return_date)
+            returned_copies = {}
+            for _, book_id in returned:
+                returned_copies[book_id] = returned_copies.get(book_id, 0) + 1
+            uow.books.adjust_available(uow.holds.assign_returned(returned_copies))
+    except sqlite3.Error:
+        return False, "Database error occurred while processing the batch.", []
+    
+    total_fees = sum(result['fee_amount'] for result in results)
+    return (bool(returned),
+            f"Returned {len(returned)} of {len(book_ids)} books. Total late fees: ${total_fees:.2f}.",
+            results)
+
+def compute_late_fee(days_overdue: int, patron_id: Optional[str] = None) -> float:
+    """Apply the patron's fee policy (R5 by default) to a number of days overdue."""
+    return get_policy(patron_id).fee_for_days(days_overdue)
+
+def _late_fee_for_due_date(due_date: datetime, now: datetime,
+                           patron_id: Optional[str] = None) -> Tuple[float, int]:
+    """Apply the patron's fee policy. Returns (fee, days_overdue)."""
+    return get_policy(patron_id).assess(due_date, now)
+
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     """
     Calculate late fees for a specific book.
@@ -184,9 +380,7 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
             'status': 'No active borrow record found (or book already returned)'
         }
 
-    now = datetime.now()
-    due_date = borrowed_book['due_date']
-    days_overdue = (now.date() - due_date.date()).days
+    fee, days_overdue = _late_fee_for_due_date(borrowed_book['due_date'], clock.now(), patron_id)
 
     if days_overdue <= 0:
         return {
@@ -195,24 +389,20 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
             'status': 'Book not overdue'
         }
 
-    if days_overdue <= 7:
-        fee = days_overdue * 0.50
-    else:
-        fee = (7 * 0.50) + ((days_overdue - 7) * 1.00)
-
-    fee = min(fee, 15.00)
-
     return {
         'fee_amount': round(fee, 2),
         'days_overdue': days_overdue,
         'status': 'Late fee calculated successfully'
     }
 
-def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+def search_books_in_catalog(search_term: str, search_type: str, fuzzy: bool = False) -> List[Dict]:
     """
     Search for books in the catalog.
     
     TODO: Implement R6 as per requirements
+    
+    With fuzzy=True, title and author searches tolerate typos
+    (see search_index.fuzzy_search); ISBN search is always exact.
     """
     
     if not search_term or not search_term.strip():
@@ -225,7 +415,13 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     if search_type not in valid_types:
         return []
     
-    conn = get_db_connection()
+    conn = get_read_connection()
+    
+    if fuzzy and search_type != 'isbn':
+        try:
+            return fuzzy_search(conn, search_term, search_type)
+        finally:
+            conn.close()
     
     try:
         if search_type == 'isbn':
@@ -247,54 +443,78 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
         conn.close()
         return []
 
-def get_patron_status_report(patron_id: str) -> Dict:
+# Sections of get_patron_status_report(), in response order
+REPORT_FIELDS = ('patron_id', 'currently_borrowed', 'total_late_fees', 'borrowed_count', 'borrowing_history')
+
+def get_patron_status_report(patron_id: str, fields: Optional[Iterable[str]] = None) -> Dict:
     """
     Get status report for a patron.
     
     TODO: Implement R7 as per requirements
-    """
-    conn = get_db_connection()
-    
-    borrowed_books = get_patron_borrowed_books(patron_id)
     
-    total_fees = 0.0
-    for book in borrowed_books:
-        late_fee_info = calculate_late_fee_for_book(patron_id, book['book_id'])
-        total_fees += late_fee_info['fee_amount']
-    
-    borrowed_count = get_patron_borrow_count(patron_id)
-    
-    history_rows = conn.execute('''
-        SELECT br.*, b.title, b.author
-        FROM borrow_records br
-        JOIN books b ON br.book_id = b.id
-        WHERE br.patron_id = ?
-        ORDER BY br.borrow_date DESC
-    ''', (patron_id,)).fetchall()
-    
-    history = []
-    for record in history_rows:
-        history.append({
-            'book_id': record['book_id'],
-            'title': record['title'],
-            'author': record['author'],
-            'borrow_date': record['borrow_date'],
-            'due_date': record['due_date'],
-            'return_date': record['return_date']
-        })
-    
-    conn.close()
+    Only the sections in `fields` (default: all of REPORT_FIELDS) are
+    computed, so API clients asking for a count don't pay for the history.
+    """
+    fields = set(REPORT_FIELDS if fields is None else fields)
+    report = {'patron_id': patron_id}
     
-    return {
-        'patron_id': patron_id,
-        'currently_borrowed': borrowed_books,
-        'total_late_fees': round(total_fees, 2),
-        'borrowed_count': borrowed_count,
-        'borrowing_history': history
-    }
+    if fields & {'currently_borrowed', 'total_late_fees'}:
+        borrowed_books = get_patron_borrowed_books(patron_id)
+        report['currently_borrowed'] = borrowed_books
+        
+        # Same policy as calculate_late_fee_for_book, without re-reading each loan
+        policy = get_policy(patron_id)
+        now = clock.now()
+        total_fees = 0.0
+        for book in borrowed_books:
+            total_fees += policy.assess(book['due_date'], now)[0]
+        report['total_late_fees'] = round(total_fees, 2)
+    
+    if 'borrowed_count' in fields:
+        report['borrowed_count'] = get_patron_borrow_count(patron_id)
+    
+    if 'borrowing_history' in fields:
+        # Includes loans moved to the archive table
+        report['borrowing_history'] = get_patron_borrow_history(patron_id)
+    
+    return {field: report[field] for field in REPORT_FIELDS if field in fields}
 
 # a3
 
+def _record_payment(patron_id: Optional[str], book_id: Optional[int], amount: float,
+                    transaction_id: str, kind: str):
+    """
+    Add a completed gateway transaction to the payments ledger.
+    
+    Refunds take the patron and book from the original payment; refunds of
+    payments made before the ledger existed are not recorded. The gateway
+    keeps the authoritative record, so a ledger write failure never turns a
+    completed payment into an error for the patron.
+    """
+    try:
+        with unit_of_work() as uow:
+            if kind == 'refund':
+                original = uow.payments.for_transaction(transaction_id)
+                if not original:
+                    return
+                patron_id, book_id = original[0]['patron_id'], original[0]['book_id']
+            uow.payments.add(patron_id, book_id, amount, transaction_id, kind)
+    except sqlite3.Error:
+        pass
+
+def _refundable_amount(transaction_id: str) -> Optional[float]:
+    """Amount paid minus amount refunded for a ledger transaction (None if not in the ledger)."""
+    try:
+        # Read on the primary: a lagging replica could allow a double refund
+        with unit_of_work() as uow:
+            entries = uow.payments.for_transaction(transaction_id)
+    except sqlite3.Error:
+        return None
+    if not any(entry['kind'] == 'payment' for entry in entries):
+        return None
+    return round(sum(entry['amount'] if entry['kind'] == 'payment' else -entry['amount']
+                     for entry in entries), 2)
+
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
     """
     Process payment for late fees using external payment gateway.
@@ -339,6 +559,7 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
     
     # Use provided gateway or create new one
     if payment_gateway is None:
+        from services.payment_service import PaymentGateway
         payment_gateway = PaymentGateway()
     
     # Process payment through external gateway
@@ -351,6 +572,7 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         )
         
         if success:
+            _record_payment(patron_id, book_id, fee_amount, transaction_id, 'payment')
             return True, f"Payment successful! {message}", transaction_id
         else:
             return False, f"Payment failed: {message}", None
@@ -380,11 +602,17 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     if amount <= 0:
         return False, "Refund amount must be greater than 0."
     
-    if amount > 15.00:  # Maximum late fee per book
+    if amount > max_refundable_fee():
         return False, "Refund amount exceeds maximum late fee."
     
+    # Payments recorded in the ledger can't be refunded beyond what was paid
+    refundable = _refundable_amount(transaction_id)
+    if refundable is not None and amount > refundable + 1e-9:
+        return False, f"Refund amount exceeds the ${refundable:.2f} still refundable on this payment."
+    
     # Use provided gateway or create new one
     if payment_gateway is None:
+        from services.payment_service import PaymentGateway
         payment_gateway = PaymentGateway()
     
     # Process refund through external gateway
@@ -393,6 +621,7 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
         success, message = payment_gateway.refund_payment(transaction_id, amount)
         
         if success:
+            _record_payment(None, None, amount, transaction_id, 'refund')
             return True, message
         else:
             return False, f"Refund failed: {message}"
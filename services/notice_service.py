@@ -0,0 +1,161 @@
+"""
+Notice Service Module - Daily overdue notice generation
+
+Walks every active overdue loan in one index-ordered pass (patron, due date),
+groups consecutive rows by patron, applies the R5 fee rules and writes one
+notice per patron to the spool directory. Only one patron's loans are held in
+memory at a time.
+
+Usage:
+    python -m services.notice_service [--format jsonl|csv|email] [--spool DIR]
+"""
+
+import argparse
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, Optional
+
+import clock
+from database import from_epoch, iter_overdue_loans
+from services.fee_service import get_policy
+
+NOTICE_SPOOL_DIR = os.path.join('spool', 'notices')
+
+NOTICE_FORMATS = ('jsonl', 'csv', 'email')
+
+EMAIL_TEMPLATE = """To: patron {patron_id}
+Subject: Overdue library books - ${total_fee:.2f} in late fees
+
+Dear patron {patron_id},
+
+As of {as_of}, the following books are overdue:
+
+{lines}
+
+Total late fees: ${total_fee:.2f}
+Please return these books as soon as possible.{cap_note}
+"""
+
+EMAIL_LINE = '  - "{title}" by {author}, due {due_date}, {days_overdue} day(s) late, fee ${fee_amount:.2f}'
+
+
+def generate_overdue_notices(now: Optional[datetime] = None) -> Iterator[Dict]:
+    """
+    Yield one notice dict per patron with overdue books.
+    
+    Args:
+        now: Reference time for overdue calculation (defaults to the current time)
+        
+    Yields:
+        dict: patron_id, as_of, books (title, due date, days overdue, fee) and total_fee
+    """
+    now = now or clock.now()
+    for patron_id, loans in groupby(iter_overdue_loans(now), key=itemgetter('patron_id')):
+        policy = get_policy(patron_id)
+        books = []
+        for loan in loans:
+            books.append({
+                'book_id': loan['book_id'],
+                'title': loan['title'],
+                'author': loan['author'],
+                'due_date': from_epoch(loan['due_ts']).strftime('%Y-%m-%d'),
+                'days_overdue': loan['days_overdue'],
+                'fee_amount': round(policy.assess(from_epoch(loan['due_ts']), now)[0], 2)
+            })
+        yield {
+            'patron_id': patron_id,
+            'as_of': now.strftime('%Y-%m-%d'),
+            'books': books,
+            'total_fee': round(sum(book['fee_amount'] for book in books), 2)
+        }
+
+
+def _write_jsonl(notices: Iterable[Dict], path: str) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8') as out:
+        for notice in notices:
+            out.write(json.dumps(notice) + '\n')
+            count += 1
+    return count
+
+
+def _write_csv(notices: Iterable[Dict], path: str) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(['patron_id', 'book_id', 'title', 'due_date', 'days_overdue', 'fee_amount'])
+        for notice in notices:
+            for book in notice['books']:
+                writer.writerow([notice['patron_id'], book['book_id'], book['title'],
+                                 book['due_date'], book['days_overdue'], f"{book['fee_amount']:.2f}"])
+            count += 1
+    return count
+
+
+def _write_email(notices: Iterable[Dict], path: str) -> int:
+    count = 0
+    os.makedirs(path, exist_ok=True)
+    for notice in notices:
+        lines = '\n'.join(EMAIL_LINE.format(**book) for book in notice['books'])
+        max_fee = get_policy(notice['patron_id']).max_fee
+        cap_note = f" Fees stop growing at ${max_fee:.2f} per book." if max_fee is not None else ""
+        body = EMAIL_TEMPLATE.format(lines=lines, cap_note=cap_note, **notice)
+        with open(os.path.join(path, f"{notice['patron_id']}.txt"), 'w', encoding='utf-8') as out:
+            out.write(body)
+        count += 1
+    return count
+
+
+WRITERS = {'jsonl': _write_jsonl, 'csv': _write_csv, 'email': _write_email}
+
+
+def spool_overdue_notices(fmt: str = 'jsonl', spool_dir: str = NOTICE_SPOOL_DIR,
+                          now: Optional[datetime] = None) -> Dict:
+    """
+    Generate today's overdue notices and write them to the spool directory.
+    
+    File formats are written under a temporary name and renamed when complete,
+    so a consumer never picks up a half-written spool file.
+    
+    Args:
+        fmt: One of 'jsonl', 'csv' or 'email' (one text file per patron)
+        spool_dir: Output directory
+        now: Reference time (defaults to the current time)
+        
+    Returns:
+        dict: path written and number of notices
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown notice format: {fmt}")
+
+    now = now or clock.now()
+    os.makedirs(spool_dir, exist_ok=True)
+    extension = '' if fmt == 'email' else f'.{fmt}'
+    path = os.path.join(spool_dir, f"overdue-{now.strftime('%Y-%m-%d')}{extension}")
+
+    if fmt == 'email':
+        count = _write_email(generate_overdue_notices(now), path)
+    else:
+        tmp_path = path + '.tmp'
+        count = WRITERS[fmt](generate_overdue_notices(now), tmp_path)
+        os.replace(tmp_path, path)
+
+    return {'path': path, 'notices': count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write overdue notices to the spool directory.')
+    parser.add_argument('--format', choices=NOTICE_FORMATS, default='jsonl')
+    parser.add_argument('--spool', default=NOTICE_SPOOL_DIR)
+    args = parser.parse_args()
+
+    result = spool_overdue_notices(args.format, args.spool)
+    print(f"Wrote {result['notices']} notices to {result['path']}")
+
+
+if __name__ == '__main__':
+    main()
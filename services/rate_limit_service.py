@@ -0,0 +1,324 @@
+"""
+Rate Limit Service Module - Admission control for HTTP routes
+
+Every request is mapped to a route group (search, fees, circulation, ...).
+Each (group, client) pair has a token bucket, where the client is the remote
+address. Kiosks and integrations sharing an address may send X-Client-ID: each
+ID then gets its own bucket under that address, and all IDs behind the address
+together draw from a shared bucket CLIENTS_PER_ADDRESS times larger, so a
+self-declared header can't mint fresh limits. Requests naming a patron also
+draw from that patron's bucket. A
+request that finds a bucket empty is rejected at once with 429 and Retry-After,
+before any database work. A per-process cap on in-flight requests rejects the
+overflow with 503, so a burst on one route cannot tie up every worker thread.
+
+Buckets and rejection counts live in memory by default. Set
+RATE_LIMIT_STORE to a file path to share them between worker processes
+through a small SQLite file (kept separate from the library database so
+admission checks never wait on its write lock).
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, jsonify, request
+
+# Route groups as (path prefix, group); the first matching prefix wins
+ROUTE_GROUPS = [
+    ('/api/search', 'search'),
+    ('/api/suggest', 'search'),
+    ('/search', 'search'),
+    ('/api/late_fee', 'fees'),
+    ('/api/borrow', 'circulation'),
+    ('/api/return', 'circulation'),
+    ('/api/copies', 'circulation'),
+    ('/api/holds', 'circulation'),
+    ('/borrow', 'circulation'),
+    ('/return', 'circulation'),
+    ('/api/analytics', 'reports'),
+    ('/api/patrons', 'reports'),
+    ('/api/report_cache', 'reports'),
+    ('/api/changes', 'reports'),
+    ('/api/backups', 'reports'),
+    ('/api/sql_profile', 'reports'),
+]
+
+# (tokens per second, burst) per route group
+RATE_LIMITS = {
+    'search': (10.0, 20),
+    'fees': (5.0, 10),
+    'circulation': (10.0, 20),
+    'reports': (2.0, 5),
+    'default': (20.0, 40),
+}
+
+# In-flight requests allowed per worker process
+MAX_CONCURRENT_REQUESTS = 64
+
+# Never limited (the stats endpoint must stay reachable while shedding load)
+EXEMPT_PREFIXES = ('/static', '/api/rate_limits')
+
+# Long-lived streams are rate limited on connect but don't hold a concurrency slot
+UNCAPPED_PREFIXES = ('/api/availability/stream',)
+
+# None keeps buckets in process memory; a path shares them via SQLite
+RATE_LIMIT_STORE = None
+
+# Limit multiplier of the bucket shared by all X-Client-IDs behind one address
+CLIENTS_PER_ADDRESS = 8
+
+# Buckets idle this long are full again and are dropped from the store
+IDLE_BUCKET_SECONDS = 300
+
+# Idle buckets are swept from the SQLite store once every this many token checks
+SWEEP_INTERVAL = 1000
+
+# Most buckets the in-memory store keeps; the least recently used go first
+MAX_MEMORY_BUCKETS = 100000
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: int) -> float:
+    return min(float(burst), tokens + (now - updated) * rate)
+
+
+def _retry_after(tokens: float, rate: float) -> int:
+    return max(1, math.ceil((1 - tokens) / rate))
+
+
+class MemoryBucketStore:
+    """
+    Token buckets and rejection counts for a single process.
+
+    Buckets are kept in least recently used order, so idle ones are dropped
+    from the front on every check and the store never holds more than
+    `max_buckets`. Dropping a bucket only refills it, so eviction under a
+    flood of new keys errs on the side of admitting.
+    """
+
+    def __init__(self, max_buckets: int = MAX_MEMORY_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._rejections: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int, now: float) -> Tuple[bool, int]:
+        """Take one token; returns (allowed, retry_after_seconds)."""
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(burst), now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._evict(now)
+            self._buckets[key] = (tokens, now)
+        return allowed, 0 if allowed else _retry_after(tokens, rate)
+
+    def _evict(self, now: float):
+        # Caller holds the lock and is about to add one bucket
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if len(self._buckets) < self.max_buckets and now - oldest[1] < IDLE_BUCKET_SECONDS:
+                break
+            self._buckets.popitem(last=False)
+
+    def bucket_count(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+    def record_rejection(self, name: str):
+        with self._lock:
+            self._rejections[name] = self._rejections.get(name, 0) + 1
+
+    def rejection_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._rejections)
+
+
+class SQLiteBucketStore:
+    """Token buckets and rejection counts shared by every process using `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._checks = 0
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rejections (
+                name TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reused across requests
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            # Bucket state is disposable, so skip fsyncs
+            conn.execute('PRAGMA synchronous = OFF')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: int, now: float) -> Tuple[bool, int]:
+        """Take one token; returns (allowed, retry_after_seconds)."""
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, rate, burst) if row else float(burst)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute('''
+                INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated
+            ''', (key, tokens, now))
+            self._checks += 1
+            if self._checks % SWEEP_INTERVAL == 0:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - IDLE_BUCKET_SECONDS,))
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            # Fail open: a busy limiter store must not take the site down
+            return True, 0
+        return allowed, 0 if allowed else _retry_after(tokens, rate)
+
+    def record_rejection(self, name: str):
+        try:
+            self._connection().execute('''
+                INSERT INTO rejections (name, count) VALUES (?, 1)
+                ON CONFLICT (name) DO UPDATE SET count = count + 1
+            ''', (name,))
+        except sqlite3.Error:
+            pass
+
+    def rejection_counts(self) -> Dict[str, int]:
+        return {row[0]: row[1] for row in self._connection().execute('SELECT name, count FROM rejections')}
+
+
+class RateLimiter:
+    """Token-bucket limits per (route group, client) plus a concurrency cap."""
+
+    def __init__(self, store=None, limits: Dict[str, Tuple[float, int]] = None,
+                 max_concurrent: int = MAX_CONCURRENT_REQUESTS):
+        self.store = store or MemoryBucketStore()
+        self.limits = limits or RATE_LIMITS
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def route_group(path: str) -> str:
+        for prefix, group in ROUTE_GROUPS:
+            if path.startswith(prefix):
+                return group
+        return 'default'
+
+    def check(self, group: str, client: str, now: Optional[float] = None,
+              scale: int = 1) -> Tuple[bool, int]:
+        """
+        Take a token for this client in this group; returns (allowed, retry_after).
+        `scale` multiplies the group's rate and burst (for shared buckets).
+        """
+        rate, burst = self.limits.get(group, self.limits['default'])
+        allowed, retry_after = self.store.take(f'{group}:{client}', rate * scale, burst * scale,
+                                               time.time() if now is None else now)
+        if not allowed:
+            self.store.record_rejection(f'{group}:429')
+        return allowed, retry_after
+
+    def acquire(self, group: str) -> bool:
+        """Claim an in-flight slot without waiting."""
+        if not self._slots.acquire(blocking=False):
+            self.store.record_rejection(f'{group}:503')
+            return False
+        with self._lock:
+            self._in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict:
+        return {
+            'rejections': self.store.rejection_counts(),
+            'in_flight': self._in_flight,
+            'max_concurrent': self.max_concurrent,
+            'limits': {group: {'rate': rate, 'burst': burst} for group, (rate, burst) in self.limits.items()},
+        }
+
+
+def _client_keys() -> List[Tuple[str, int]]:
+    """(bucket key, limit scale) pairs the request draws from, all of which must admit it."""
+    address = request.remote_addr or 'unknown'
+    client_id = request.headers.get('X-Client-ID')
+    if client_id:
+        keys = [(f'{address}/*', CLIENTS_PER_ADDRESS), (f'{address}/{client_id}', 1)]
+    else:
+        keys = [(address, 1)]
+    patron_id = (request.view_args or {}).get('patron_id') or request.args.get('patron_id')
+    if patron_id:
+        keys.append((f'patron:{patron_id}', 1))
+    return keys
+
+
+def register_rate_limits(app: Flask, limiter: Optional[RateLimiter] = None) -> RateLimiter:
+    """
+    Install admission control on an app.
+
+    Returns:
+        RateLimiter: The limiter, also available as app.extensions['rate_limiter']
+    """
+    if limiter is None:
+        store = SQLiteBucketStore(RATE_LIMIT_STORE) if RATE_LIMIT_STORE else MemoryBucketStore()
+        limiter = RateLimiter(store)
+    app.extensions['rate_limiter'] = limiter
+
+    @app.before_request
+    def admit():
+        path = request.path
+        if path.startswith(EXEMPT_PREFIXES):
+            return None
+        group = limiter.route_group(path)
+
+        for client, scale in _client_keys():
+            allowed, retry_after = limiter.check(group, client, scale=scale)
+            if not allowed:
+                break
+        if not allowed:
+            response = jsonify({'error': 'Too many requests. Please slow down.', 'group': group})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+
+        if not path.startswith(UNCAPPED_PREFIXES):
+            if not limiter.acquire(group):
+                response = jsonify({'error': 'Server busy. Please retry shortly.', 'group': group})
+                response.status_code = 503
+                response.headers['Retry-After'] = '1'
+                return response
+            request.environ['library.rate_limit_slot'] = True
+        return None
+
+    @app.teardown_request
+    def release_slot(exc):
+        if request.environ.pop('library.rate_limit_slot', False):
+            limiter.release()
+
+    return limiter
@@ -0,0 +1,209 @@
+"""
+Report Cache Service Module - Per-patron cache of patron status reports
+
+Staff dashboards ask for the same patrons' reports all day. Each report is
+computed once and then served from memory until one of these happens:
+
+  - a borrow, return or payment for that patron commits in this process
+    (database.patron_listeners), which drops the entry;
+  - the day changes, since late fees accrue per day; the entry is recomputed;
+  - it is older than FRESH_SECONDS. Until STALE_SECONDS it is still served,
+    and a background thread recomputes it (stale-while-revalidate). After
+    that it is recomputed on the request.
+
+The age limits cover writes this process never hears about (other worker
+processes, archive runs). Entries are kept in LRU order up to MAX_ENTRIES.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+import clock
+import database
+from services.library_service import REPORT_FIELDS, get_patron_status_report
+
+# Seconds a report is served without a background refresh
+FRESH_SECONDS = 60
+
+# Seconds a report may still be served while it is refreshed in the background
+STALE_SECONDS = 300
+
+MAX_ENTRIES = 10000
+
+# Threads recomputing stale reports
+REFRESH_WORKERS = 2
+
+
+def _deep_size(value) -> int:
+    """Approximate memory held by a report (containers plus contents)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(key) + _deep_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(item) for item in value)
+    return size
+
+
+class _Entry:
+    __slots__ = ('report', 'database', 'day', 'computed_at', 'size')
+
+    def __init__(self, report: Dict, day, computed_at: float):
+        self.report = report
+        self.database = database.DATABASE
+        self.day = day
+        self.computed_at = computed_at
+        self.size = _deep_size(report)
+
+
+class PatronReportCache:
+    """
+    Full patron reports keyed by patron ID.
+
+    Args:
+        fresh_seconds: Age below which an entry is served as is
+        stale_seconds: Age below which an entry is served while it is refreshed
+        max_entries: Least recently used entries beyond this are evicted
+    """
+
+    def __init__(self, fresh_seconds: float = FRESH_SECONDS, stale_seconds: float = STALE_SECONDS,
+                 max_entries: int = MAX_ENTRIES):
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        # Bumped on every invalidation, so a computation that raced with a
+        # write is not stored
+        self._generations: Dict[str, int] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(REFRESH_WORKERS, thread_name_prefix='report-cache')
+        self._memory = 0
+        self._counts = dict.fromkeys(('hits', 'stale_hits', 'misses', 'invalidations',
+                                      'day_rollovers', 'refreshes', 'evictions'), 0)
+
+    def get(self, patron_id: str, fields: Optional[Iterable[str]] = None) -> Dict:
+        """
+        The patron's report, trimmed to `fields` (default: all of REPORT_FIELDS).
+
+        The full report is shared with the cache; callers must not modify it.
+        """
+        now = clock.now()
+        today = now.date()
+        with self._lock:
+            entry = self._entries.get(patron_id)
+            if entry is not None and entry.database != database.DATABASE:
+                entry = None
+            age = time.monotonic() - entry.computed_at if entry else None
+            if entry is not None and entry.day != today:
+                self._counts['day_rollovers'] += 1
+                entry = None
+            if entry is not None and age < self.stale_seconds:
+                self._entries.move_to_end(patron_id)
+                if age < self.fresh_seconds:
+                    self._counts['hits'] += 1
+                else:
+                    self._counts['stale_hits'] += 1
+                    self._schedule_refresh(patron_id, now)
+                report = entry.report
+            else:
+                self._counts['misses'] += 1
+                report = None
+        if report is None:
+            report = self._compute(patron_id)
+        if fields is None:
+            return report
+        fields = set(fields)
+        return {field: report[field] for field in REPORT_FIELDS if field in fields}
+
+    def _compute(self, patron_id: str) -> Dict:
+        with self._lock:
+            generation = self._generations.get(patron_id, 0)
+        report = get_patron_status_report(patron_id)
+        entry = _Entry(report, clock.now().date(), time.monotonic())
+        with self._lock:
+            if self._generations.get(patron_id, 0) == generation:
+                self._store(patron_id, entry)
+        return report
+
+    def _store(self, patron_id: str, entry: _Entry):
+        old = self._entries.pop(patron_id, None)
+        if old is not None:
+            self._memory -= old.size
+        self._entries[patron_id] = entry
+        self._memory += entry.size
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._memory -= evicted.size
+            self._counts['evictions'] += 1
+
+    def _schedule_refresh(self, patron_id: str, now):
+        # Called with the lock held; one refresh per patron at a time
+        if patron_id in self._refreshing:
+            return
+        self._refreshing.add(patron_id)
+        self._executor.submit(self._refresh, patron_id, now)
+
+    def _refresh(self, patron_id: str, now):
+        try:
+            # Judged at the requesting request's time, not the worker thread's
+            with clock.frozen(now):
+                self._compute(patron_id)
+            with self._lock:
+                self._counts['refreshes'] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(patron_id)
+
+    def invalidate(self, patron_id: str):
+        """Drop a patron's report after their loans or payments changed."""
+        with self._lock:
+            self._generations[patron_id] = self._generations.get(patron_id, 0) + 1
+            entry = self._entries.pop(patron_id, None)
+            if entry is not None:
+                self._memory -= entry.size
+                self._counts['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            for patron_id in self._entries:
+                self._generations[patron_id] = self._generations.get(patron_id, 0) + 1
+            self._entries.clear()
+            self._memory = 0
+
+    def wait_for_refreshes(self, timeout: float = 5.0):
+        """Block until no background refresh is running (tests, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._refreshing:
+                    return
+            time.sleep(0.005)
+
+    def stats(self) -> Dict:
+        """Hit ratio, counters, entry count and approximate memory use."""
+        with self._lock:
+            counts = dict(self._counts)
+            entries, memory = len(self._entries), self._memory
+        lookups = counts['hits'] + counts['stale_hits'] + counts['misses']
+        return {
+            **counts,
+            'hit_ratio': round((counts['hits'] + counts['stale_hits']) / lookups, 4) if lookups else 0.0,
+            'entries': entries,
+            'memory_bytes': memory,
+            'fresh_seconds': self.fresh_seconds,
+            'stale_seconds': self.stale_seconds,
+            'max_entries': self.max_entries,
+        }
+
+
+report_cache = PatronReportCache()
+
+
+def register_report_cache():
+    """Drop cached reports when this process commits a patron's borrow, return or payment."""
+    if report_cache.invalidate not in database.patron_listeners:
+        database.patron_listeners.append(report_cache.invalidate)
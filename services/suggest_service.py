@@ -0,0 +1,147 @@
+"""
+Suggest Service Module - Prefix index for search-box autocomplete
+
+Every word-start of each normalized title and author ("the great gatsby",
+"great gatsby", "gatsby") is kept in one sorted list, so the entries for a
+prefix are a contiguous slice found with bisect. Results are the top-k books
+in that slice by popularity (number of loans).
+
+The index is built on first use, extended in place when insert_book() runs in
+this process, and picks up books inserted by other workers (and fresh
+popularity counts) every REFRESH_SECONDS.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+import database
+from search_index import normalize
+
+# How often popularity and other workers' inserts are reloaded
+REFRESH_SECONDS = 300
+
+# Slices larger than this use the per-prefix top-k cache instead of a scan
+SCAN_LIMIT = 500
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+
+def _keys(text: str) -> List[str]:
+    words = normalize(text)
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class SuggestIndex:
+    """Sorted (key, field, book_id) entries plus book details and popularity."""
+
+    def __init__(self):
+        self._entries: List[Tuple[str, str, int]] = []
+        self._books: Dict[int, Dict] = {}
+        self._popularity: Dict[int, int] = {}
+        self._top_cache: Dict[Tuple[str, int], List[Tuple[str, str, int]]] = {}
+        self._max_book_id = 0
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self.built = False
+
+    def _add(self, book: Dict):
+        if book['id'] in self._books:
+            return
+        self._books[book['id']] = {'title': book['title'], 'author': book['author']}
+        for field in ('title', 'author'):
+            for key in _keys(book[field]):
+                insort(self._entries, (key, field, book['id']))
+        self._max_book_id = max(self._max_book_id, book['id'])
+
+    def _load_popularity(self, conn):
+        # The daily rollups already include archived loans
+        self._popularity = {row[0]: row[1] for row in conn.execute(
+            'SELECT book_id, SUM(borrows) FROM daily_book_stats GROUP BY book_id')}
+
+    def refresh(self, force: bool = False):
+        """Load books newer than the last seen id and reload popularity."""
+        with self._lock:
+            if not force and self.built and time.time() - self._refreshed_at < REFRESH_SECONDS:
+                return
+            conn = database.get_read_connection()
+            try:
+                new_books = conn.execute('SELECT id, title, author FROM books WHERE id > ?',
+                                         (self._max_book_id,)).fetchall()
+                if not self.built:
+                    # Bulk build: one sort instead of an insort per entry
+                    for book in new_books:
+                        self._books[book['id']] = {'title': book['title'], 'author': book['author']}
+                        for field in ('title', 'author'):
+                            self._entries.extend((key, field, book['id']) for key in _keys(book[field]))
+                        self._max_book_id = max(self._max_book_id, book['id'])
+                    self._entries.sort()
+                else:
+                    for book in new_books:
+                        self._add(dict(book))
+                self._load_popularity(conn)
+            finally:
+                conn.close()
+            self._top_cache.clear()
+            self._refreshed_at = time.time()
+            self.built = True
+
+    def add_book(self, book: Dict):
+        """Insert a newly added book (no-op until the index is first built)."""
+        with self._lock:
+            if not self.built:
+                return
+            self._add(book)
+            self._top_cache.clear()
+
+    def _top(self, start: int, end: int, limit: int) -> List[Tuple[str, str, int]]:
+        # Over-fetch so that books matching on several keys still fill `limit`
+        return heapq.nlargest(limit * 3, self._entries[start:end],
+                              key=lambda entry: self._popularity.get(entry[2], 0))
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_SUGGESTIONS) -> List[Dict]:
+        """Top `limit` books whose title or author has a word starting with `prefix`."""
+        self.refresh()
+        key = ' '.join(normalize(prefix))
+        if not key:
+            return []
+
+        with self._lock:
+            start = bisect_left(self._entries, (key,))
+            end = bisect_left(self._entries, (key + '\uffff',))
+            if end - start <= SCAN_LIMIT:
+                top = self._top(start, end, limit)
+            else:
+                top = self._top_cache.get((key, limit))
+                if top is None:
+                    top = self._top_cache[(key, limit)] = self._top(start, end, limit)
+
+            results = []
+            seen = set()
+            for _, field, book_id in top:
+                if book_id in seen:
+                    continue
+                seen.add(book_id)
+                book = self._books[book_id]
+                results.append({
+                    'book_id': book_id,
+                    'title': book['title'],
+                    'author': book['author'],
+                    'matched': field,
+                    'popularity': self._popularity.get(book_id, 0)
+                })
+                if len(results) == limit:
+                    break
+            return results
+
+
+suggest_index = SuggestIndex()
+
+
+def register_suggest_updates():
+    """Keep suggest_index in step with insert_book() in this process."""
+    if suggest_index.add_book not in database.book_insert_listeners:
+        database.book_insert_listeners.append(suggest_index.add_book)
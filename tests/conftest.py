@@ -0,0 +1,11 @@
+import pytest
+import database
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point the database module at a fresh, initialized SQLite file."""
+    db_path = str(tmp_path / "library.db")
+    monkeypatch.setattr(database, "DATABASE", db_path)
+    database.init_database()
+    return db_path
@@ -0,0 +1,99 @@
+import pytest
+from datetime import date, datetime, timedelta
+
+from app import create_app
+from database import get_db_connection, insert_book, update_borrow_record_return_date
+from services.analytics_service import (
+    backfill_rollups, get_average_loan_length, get_most_borrowed_books,
+    get_overdue_rate_by_author
+)
+from services.archive_service import archive_returned_loans
+
+START = datetime(2026, 3, 1, 10, 0)
+
+
+def _add_loan(conn, book_id, borrow_date, returned_after=None, patron_id="123456"):
+    return_date = borrow_date + timedelta(days=returned_after) if returned_after is not None else None
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (patron_id, book_id, borrow_date.isoformat(),
+          (borrow_date + timedelta(days=14)).isoformat(),
+          return_date.isoformat() if return_date else None))
+
+
+def _rollups():
+    conn = get_db_connection()
+    rows = conn.execute('SELECT * FROM daily_book_stats ORDER BY day, book_id').fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+@pytest.fixture
+def loans_db(temp_db):
+    insert_book("Popular", "Author A", "1111111111111", 5, 5)
+    insert_book("Quiet", "Author B", "2222222222222", 5, 5)
+    conn = get_db_connection()
+    for offset in range(3):
+        _add_loan(conn, 1, START + timedelta(days=offset), returned_after=10)
+    _add_loan(conn, 2, START, returned_after=20)               # 6 days late
+    _add_loan(conn, 2, START + timedelta(days=40))             # still out
+    conn.commit()
+    conn.close()
+    return temp_db
+
+
+def test_triggers_count_borrows_and_returns(loans_db):
+    """Inserting and returning loans updates the rollup rows."""
+    assert sum(row['borrows'] for row in _rollups()) == 5
+    assert sum(row['returns'] for row in _rollups()) == 4
+
+    update_borrow_record_return_date("123456", 2, START + timedelta(days=45))
+    day = (START + timedelta(days=45)).date()
+    assert get_average_loan_length(day, day, book_id=2) == {
+        'returns': 1, 'loan_days': 5, 'average_days': 5.0}
+
+
+def test_reports_filter_by_date_range(loans_db):
+    """Most-borrowed, loan length and overdue rate respect start/end."""
+    books = get_most_borrowed_books(date(2026, 3, 1), date(2026, 3, 31))
+    assert [(b['title'], b['borrows']) for b in books] == [("Popular", 3), ("Quiet", 1)]
+    assert get_most_borrowed_books(date(2026, 4, 1), date(2026, 4, 30))[0]['title'] == "Quiet"
+
+    assert get_average_loan_length() == {'returns': 4, 'loan_days': 50, 'average_days': 12.5}
+
+    rates = get_overdue_rate_by_author()
+    assert rates[0] == {'author': "Author B", 'returns': 1, 'overdue_returns': 1, 'overdue_rate': 1.0}
+    assert rates[1]['overdue_rate'] == 0.0
+
+
+def test_backfill_rebuilds_from_loans_and_archive(loans_db):
+    """A rebuild matches the trigger-maintained rollups, including archived loans."""
+    before = _rollups()
+    archive_returned_loans(horizon_days=30, now=START + timedelta(days=60))
+
+    conn = get_db_connection()
+    conn.execute('DELETE FROM daily_book_stats')
+    conn.commit()
+    conn.close()
+
+    result = backfill_rollups(days_per_chunk=7)
+    assert result['chunks'] == 6    # 41 days, Mar 1 - Apr 10
+    assert _rollups() == before
+
+    # Rebuilding again is a no-op
+    backfill_rollups()
+    assert _rollups() == before
+
+
+def test_analytics_api(loans_db):
+    """Endpoints return JSON and reject malformed dates."""
+    client = create_app(dev_mode=False).test_client()
+
+    response = client.get('/api/analytics/most-borrowed?start=2026-03-01&end=2026-03-31&limit=1')
+    assert response.status_code == 200
+    assert response.get_json()['books'][0]['title'] == "Popular"
+
+    assert client.get('/api/analytics/loan-length?book_id=1').get_json()['average_days'] == 10.0
+    assert client.get('/api/analytics/overdue-by-author').get_json()['authors'][0]['author'] == "Author B"
+    assert client.get('/api/analytics/most-borrowed?start=March').status_code == 400
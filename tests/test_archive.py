@@ -0,0 +1,77 @@
+import pytest
+from datetime import datetime, timedelta
+
+import database
+from database import get_db_connection, insert_book, get_patron_borrow_history
+from services.archive_service import archive_returned_loans
+from services.library_service import get_patron_status_report
+
+NOW = datetime(2026, 6, 1)
+
+
+def _add_loan(conn, patron_id, book_id, borrowed_days_ago, returned_days_ago=None):
+    borrow_date = NOW - timedelta(days=borrowed_days_ago)
+    return_date = NOW - timedelta(days=returned_days_ago) if returned_days_ago is not None else None
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (patron_id, book_id, borrow_date.isoformat(),
+          (borrow_date + timedelta(days=14)).isoformat(),
+          return_date.isoformat() if return_date else None))
+
+
+@pytest.fixture
+def loans_db(temp_db):
+    insert_book("Old Book", "Author", "1111111111111", 5, 5)
+    conn = get_db_connection()
+    for days in (800, 700, 600, 500):
+        _add_loan(conn, "123456", 1, days, days - 10)
+    _add_loan(conn, "123456", 1, 30, 20)    # recent return, stays hot
+    _add_loan(conn, "123456", 1, 5)         # active loan, stays hot
+    conn.commit()
+    conn.close()
+    return temp_db
+
+
+def _count(table):
+    conn = get_db_connection()
+    count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_archive_moves_only_old_returned_loans(loans_db):
+    """Loans returned before the horizon move; recent and active loans stay."""
+    result = archive_returned_loans(horizon_days=365, batch_size=3, now=NOW)
+
+    assert result['archived'] == 4
+    assert result['batches'] == 2
+    assert _count('borrow_records') == 2
+    assert _count('borrow_records_archive') == 4
+
+
+def test_history_includes_archived_loans(loans_db):
+    """Patron history should be unchanged by archival."""
+    before = get_patron_borrow_history("123456")
+    archive_returned_loans(horizon_days=365, now=NOW)
+    after = get_patron_borrow_history("123456")
+
+    assert after == before
+    assert len(after) == 6
+    assert after[0]['borrow_date'] > after[-1]['borrow_date']
+
+
+def test_report_history_includes_archived_loans(loans_db):
+    """R7 report history should come from both tables."""
+    archive_returned_loans(horizon_days=365, now=NOW)
+    report = get_patron_status_report("123456")
+    assert len(report['borrowing_history']) == 6
+
+
+def test_archive_to_attached_file(loans_db, tmp_path, monkeypatch):
+    """A separate archive file keeps the main file small."""
+    monkeypatch.setattr(database, "ARCHIVE_DATABASE", str(tmp_path / "archive.db"))
+    archive_returned_loans(horizon_days=365, now=NOW)
+
+    assert _count('borrow_records_archive') == 0
+    assert len(get_patron_borrow_history("123456")) == 6
@@ -0,0 +1,90 @@
+import json
+import pytest
+
+from app import create_app
+from database import insert_book
+from services.event_service import EventBus, availability_bus, stream_events
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def test_bus_fans_out_to_all_subscribers():
+    bus = EventBus()
+    first, second = bus.subscribe(), bus.subscribe()
+
+    bus.publish('availability', [{'book_id': 1}])
+
+    assert first.get(timeout=0)[0]['data'] == [{'book_id': 1}]
+    assert second.get(timeout=0)[0]['data'] == [{'book_id': 1}]
+
+
+def test_bus_buffer_is_bounded():
+    """A slow subscriber loses the oldest events and counts the drops."""
+    bus = EventBus(buffer_size=3)
+    subscription = bus.subscribe()
+    for i in range(5):
+        bus.publish('availability', i)
+
+    assert [e['data'] for e in subscription.get(timeout=0)] == [2, 3, 4]
+    assert subscription.dropped == 2
+
+
+def test_unsubscribe_stops_delivery():
+    bus = EventBus()
+    subscription = bus.subscribe()
+    subscription.close()
+    bus.publish('availability', 1)
+    assert bus.subscriber_count == 0
+    assert subscription.get(timeout=0) == []
+
+
+def test_stream_reports_resync_after_drops():
+    bus = EventBus(buffer_size=1)
+    subscription = bus.subscribe()
+    stream = stream_events(subscription, heartbeat=0.01)
+    next(stream)  # retry hint
+    bus.publish('availability', 1)
+    bus.publish('availability', 2)
+
+    assert next(stream).startswith('id: 2\nevent: resync')
+    assert 'data: 2' in next(stream)
+    stream.close()
+    assert bus.subscriber_count == 0
+
+
+@pytest.fixture
+def client(temp_db):
+    app = create_app()
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    return app.test_client()
+
+
+def test_borrow_and_return_publish_deltas(client):
+    subscription = availability_bus.subscribe()
+    try:
+        borrow_book_by_patron("123456", 1)
+        return_book_by_patron("123456", 1)
+        events = subscription.get(timeout=0)
+    finally:
+        subscription.close()
+
+    assert [e['data'] for e in events] == [
+        [{'book_id': 1, 'available_copies': 1, 'total_copies': 2}],
+        [{'book_id': 1, 'available_copies': 2, 'total_copies': 2}],
+    ]
+
+
+def test_sse_endpoint_streams_changes(client):
+    response = client.get('/api/availability/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+
+    borrow_book_by_patron("123456", 1)
+    event = next(chunks).decode()
+
+    assert event.startswith('id: ')
+    assert 'event: availability' in event
+    payload = json.loads(event.split('data: ')[1])
+    assert payload == [{'book_id': 1, 'available_copies': 1, 'total_copies': 2}]
+    response.close()
+    assert availability_bus.subscriber_count == 0
@@ -0,0 +1,99 @@
+import os
+import pytest
+
+import database
+from app import create_app
+from database import get_all_books, insert_book
+from services.backup_service import create_backup, list_backups, restore_backup, verify_backup
+
+
+@pytest.fixture
+def library(temp_db):
+    insert_book("Kept", "Author", "1111111111111", 1, 1)
+    return temp_db
+
+
+def test_backup_creates_checksummed_snapshot(library, tmp_path):
+    result = create_backup(str(tmp_path / "b"), pages_per_step=1)
+
+    assert os.path.exists(result['path'])
+    assert os.path.exists(result['path'] + '.sha256')
+    assert result['pages'] > 1
+    assert verify_backup(result['path']) is None
+    assert not os.path.exists(result['path'] + '.tmp')
+
+
+def test_backup_rotation(library, tmp_path):
+    backup_dir = str(tmp_path / "b")
+    paths = [create_backup(backup_dir, keep=2)['path'] for _ in range(3)]
+
+    remaining = [b['path'] for b in list_backups(backup_dir)]
+    assert remaining == [paths[2], paths[1]]
+    assert not os.path.exists(paths[0] + '.sha256')
+
+
+def test_verify_detects_corruption(library, tmp_path):
+    path = create_backup(str(tmp_path / "b"))['path']
+    with open(path, 'r+b') as snapshot:
+        snapshot.seek(200)
+        snapshot.write(b'\xff\xff\xff')
+    assert verify_backup(path) == "Checksum mismatch."
+
+
+def test_restore_round_trip(library, tmp_path):
+    path = create_backup(str(tmp_path / "b"))['path']
+    insert_book("Lost", "Author", "2222222222222", 1, 1)
+
+    restore_backup(path)
+
+    assert [b['title'] for b in get_all_books()] == ["Kept"]
+
+
+def test_restore_refuses_bad_snapshot(library, tmp_path):
+    path = create_backup(str(tmp_path / "b"))['path']
+    os.remove(path + '.sha256')
+    with pytest.raises(ValueError):
+        restore_backup(path)
+
+
+def test_backup_endpoint(library, tmp_path, monkeypatch):
+    import services.backup_service as backup_service
+    monkeypatch.setattr(backup_service, "BACKUP_DIR", str(tmp_path / "b"))
+    client = create_app().test_client()
+
+    response = client.post('/api/backups')
+    assert response.status_code == 201
+    assert 'sha256' in response.get_json()
+
+
+def test_backup_abandoned_under_writes_leaves_nothing(library, tmp_path, monkeypatch):
+    """Past the restart cap the snapshot is given up instead of blocking writers."""
+    writer = database.get_db_connection()
+    restarts = []
+
+    def write_between_steps(seconds):
+        restarts.append(seconds)
+        writer.execute("UPDATE books SET available_copies = ?", (len(restarts),))
+        writer.commit()
+
+    monkeypatch.setattr(database.time, "sleep", write_between_steps)
+    backup_dir = tmp_path / "b"
+    with pytest.raises(database.CopyAbandoned):
+        create_backup(str(backup_dir), pages_per_step=1, max_restarts=1)
+    writer.close()
+
+    assert len(restarts) == 2
+    assert os.listdir(backup_dir) == []
+
+
+def test_backup_endpoint_reports_busy_database(library, tmp_path, monkeypatch):
+    import services.backup_service as backup_service
+    monkeypatch.setattr(backup_service, "BACKUP_DIR", str(tmp_path / "b"))
+
+    def abandon(*args, **kwargs):
+        raise database.CopyAbandoned("Copy restarted 6 times by concurrent writes.")
+
+    monkeypatch.setattr(database, "copy_database", abandon)
+    response = create_app().test_client().post('/api/backups')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '60'
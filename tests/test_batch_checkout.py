@@ -0,0 +1,96 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app import create_app
+from database import get_book_by_id, get_db_connection, insert_book, get_patron_borrow_count
+from services.library_service import borrow_books_by_patron, return_books_by_patron
+
+
+@pytest.fixture
+def catalog(temp_db):
+    for i in range(1, 8):
+        insert_book(f"Book {i}", "Author", f"{i:013d}", 2, 2)
+    insert_book("Unavailable", "Author", "9999999999999", 1, 0)
+    return temp_db
+
+
+@pytest.fixture
+def client(catalog):
+    return create_app().test_client()
+
+
+def test_batch_borrow_success(catalog):
+    """All books in a valid batch are borrowed."""
+    success, message, results = borrow_books_by_patron("123456", [1, 2, 3])
+
+    assert success is True
+    assert [r['success'] for r in results] == [True, True, True]
+    assert get_patron_borrow_count("123456") == 3
+    assert get_book_by_id(1)['available_copies'] == 1
+
+
+def test_batch_borrow_enforces_limit_across_batch(catalog):
+    """The 5-book limit counts earlier loans and earlier items in the batch."""
+    borrow_books_by_patron("123456", [1, 2])
+    success, message, results = borrow_books_by_patron("123456", [3, 4, 5, 6])
+
+    assert [r['success'] for r in results] == [True, True, True, False]
+    assert "maximum borrowing limit" in results[-1]['message']
+    assert get_patron_borrow_count("123456") == 5
+
+
+def test_batch_borrow_per_item_failures(catalog):
+    """Missing and unavailable books fail without affecting the rest."""
+    success, message, results = borrow_books_by_patron("123456", [1, 99, 8])
+
+    assert success is True
+    assert results[1]['message'] == "Book not found."
+    assert results[2]['message'] == "This book is currently not available."
+    assert get_patron_borrow_count("123456") == 1
+
+
+def test_batch_borrow_tracks_availability_within_batch(catalog):
+    """Scanning the same title more times than copies exist fails the extras."""
+    success, message, results = borrow_books_by_patron("123456", [1, 1, 1])
+    assert [r['success'] for r in results] == [True, True, False]
+    assert get_book_by_id(1)['available_copies'] == 0
+
+
+def test_batch_invalid_patron(catalog):
+    """Invalid patron ID rejects the whole batch."""
+    success, message, results = borrow_books_by_patron("12", [1])
+    assert success is False
+    assert "invalid patron id" in message.lower()
+    assert results == []
+
+
+def test_batch_return_with_fees(catalog):
+    """Returned books get R5 fees computed from their due dates."""
+    borrow_books_by_patron("123456", [1, 2])
+    conn = get_db_connection()
+    conn.execute('UPDATE borrow_records SET due_date = ? WHERE book_id = 1',
+                 ((datetime.now() - timedelta(days=3)).isoformat(),))
+    conn.commit()
+    conn.close()
+
+    success, message, results = return_books_by_patron("123456", [1, 2, 3])
+
+    assert [r['success'] for r in results] == [True, True, False]
+    assert results[0]['days_overdue'] == 3
+    assert results[0]['fee_amount'] == 1.50
+    assert results[2]['message'] == "This book is not borrowed by this patron."
+    assert get_patron_borrow_count("123456") == 0
+    assert get_book_by_id(1)['available_copies'] == 2
+
+
+def test_batch_borrow_endpoint(client):
+    """POST /api/borrow/batch returns per-item results."""
+    response = client.post('/api/borrow/batch', json={'patron_id': '123456', 'book_ids': [1, 2]})
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 2
+
+
+def test_batch_endpoint_rejects_bad_body(client):
+    """Missing book list is a 400."""
+    response = client.post('/api/return/batch', json={'patron_id': '123456'})
+    assert response.status_code == 400
@@ -0,0 +1,140 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import clock
+from batch_jobs import BatchJob, FeeAssessmentJob, ImportValidationJob, id_partitions, run_job, stage_book_imports
+from database import get_db_connection, insert_book
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+NOW = datetime(2026, 5, 1, 12, 0)
+
+
+def _fees():
+    conn = get_db_connection()
+    rows = conn.execute('SELECT loan_id, days_overdue, fee_amount FROM fee_assessments ORDER BY loan_id').fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+
+def test_jobs_must_implement_partition_and_write():
+    """A job without run_partition/write fails at construction, not in a worker."""
+    class NoWrite(BatchJob):
+        def run_partition(self, conn, first_id, last_id):
+            return []
+
+    with pytest.raises(TypeError):
+        NoWrite()
+
+
+def test_id_partitions_cover_range(temp_db):
+    """Partitions are contiguous inclusive ranges from MIN(id) to MAX(id)."""
+    stage_book_imports({'isbn': str(i)} for i in range(11))
+    conn = get_db_connection()
+    assert id_partitions(conn, 'book_imports', 4) == [(1, 4), (5, 8), (9, 11)]
+    assert id_partitions(conn, 'payments', 4) == []
+    conn.close()
+
+
+def test_fee_job_matches_policy_and_reruns_cleanly(temp_db):
+    """Fees are written per overdue loan in batches; a re-run drops returned loans."""
+    for i in range(6):
+        insert_book(f"Book {i}", "Author", f"{i:013d}", 1, 1)
+    with clock.frozen(NOW - timedelta(days=30)):
+        for book_id in range(1, 5):
+            borrow_book_by_patron("123456", book_id)
+    with clock.frozen(NOW - timedelta(days=15)):
+        borrow_book_by_patron("654321", 5)
+    with clock.frozen(NOW):
+        borrow_book_by_patron("654321", 6)
+        report = run_job(FeeAssessmentJob(), workers=2, partition_size=2, write_batch_rows=3)
+    assert report['partitions'] == report['partitions_written'] == 3
+    assert report['rows'] == 5 and report['commits'] == 2
+    assert _fees() == [(1, 16, 12.5), (2, 16, 12.5), (3, 16, 12.5), (4, 16, 12.5), (5, 1, 0.5)]
+
+    with clock.frozen(NOW):
+        return_book_by_patron("123456", 2)
+        run_job(FeeAssessmentJob(), workers=2, partition_size=2)
+    assert [row[0] for row in _fees()] == [1, 3, 4, 5]
+
+
+def test_import_validation_applies_r1_rules(temp_db):
+    """Every staged row gets a status, including ISBN clashes across partitions."""
+    insert_book("Existing", "Author", "1111111111111", 1, 1)
+    stage_book_imports([
+        {'title': 'Good', 'author': 'A', 'isbn': '2222222222222', 'total_copies': '3'},
+        {'title': '', 'author': 'A', 'isbn': '3333333333333', 'total_copies': '1'},
+        {'title': 'Dup', 'author': 'A', 'isbn': '1111111111111', 'total_copies': '1'},
+        {'title': 'Bad copies', 'author': 'A', 'isbn': '4444444444444', 'total_copies': 'two'},
+        {'title': 'Again', 'author': 'A', 'isbn': '2222222222222', 'total_copies': '1'},
+    ])
+    run_job(ImportValidationJob(), workers=2, partition_size=2)
+
+    conn = get_db_connection()
+    rows = conn.execute('SELECT status, error FROM book_imports ORDER BY id').fetchall()
+    conn.close()
+    assert [tuple(row) for row in rows] == [
+        ('valid', None),
+        ('invalid', 'Title is required.'),
+        ('invalid', 'A book with this ISBN already exists.'),
+        ('invalid', 'Total copies must be a positive integer.'),
+        ('invalid', 'ISBN appears earlier in this import.'),
+    ]
+
+
+def test_cancel_stops_handing_out_partitions(temp_db):
+    """A cancelled run reports it and leaves unstarted partitions unwritten."""
+    stage_book_imports({'title': 'T', 'author': 'A', 'isbn': f'{i:013d}', 'total_copies': '1'}
+                       for i in range(200))
+    cancel = threading.Event()
+    progress = []
+
+    def on_progress(state):
+        progress.append(state['partitions_done'])
+        cancel.set()
+
+    report = run_job(ImportValidationJob(), workers=1, partition_size=2, progress=on_progress, cancel=cancel)
+    assert report['cancelled'] is True
+    assert 0 < report['partitions_written'] < report['partitions'] == 100
+    assert progress == list(range(1, len(progress) + 1))
+
+
+def test_cancelled_fee_run_clears_ranges_it_never_reached(temp_db):
+    """Fees from an earlier run don't survive in partitions a cancelled run skipped."""
+    for i in range(20):
+        insert_book(f"Book {i}", "Author", f"{i:013d}", 1, 1)
+    with clock.frozen(NOW - timedelta(days=30)):
+        for book_id in range(1, 21):
+            borrow_book_by_patron(f"{book_id:06d}", book_id)
+    with clock.frozen(NOW):
+        run_job(FeeAssessmentJob(), workers=1, partition_size=1)
+    assert len(_fees()) == 20
+
+    cancel = threading.Event()
+    with clock.frozen(NOW + timedelta(days=1)):
+        report = run_job(FeeAssessmentJob(), workers=1, partition_size=1,
+                         progress=lambda state: cancel.set(), cancel=cancel)
+    assert report['cancelled'] is True
+    assert report['partitions_written'] + report['partitions_cleared'] == 20
+    assert report['partitions_cleared'] > 0
+    assert [row[1] for row in _fees()] == [17] * report['partitions_written']
+
+
+def test_repeated_isbn_check_is_limited_to_the_current_import(temp_db):
+    """An ISBN from an earlier, already validated import doesn't count as repeated."""
+    stage_book_imports([{'title': 'First', 'author': 'A', 'isbn': '2222222222222', 'total_copies': '1'}])
+    run_job(ImportValidationJob(), workers=1)
+    stage_book_imports([
+        {'title': 'Again', 'author': 'A', 'isbn': '2222222222222', 'total_copies': '1'},
+        {'title': 'Twice', 'author': 'A', 'isbn': '2222222222222', 'total_copies': '1'},
+    ])
+    run_job(ImportValidationJob(), workers=1)
+
+    conn = get_db_connection()
+    rows = conn.execute('SELECT title, status, error FROM book_imports ORDER BY id').fetchall()
+    conn.close()
+    assert [tuple(row) for row in rows] == [
+        ('Again', 'valid', None),
+        ('Twice', 'invalid', 'ISBN appears earlier in this import.'),
+    ]
@@ -0,0 +1,138 @@
+import json
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+
+import database
+import migrations
+
+from app import create_app
+from database import insert_book, iter_changes, get_latest_change_seq, prune_change_log
+from services.archive_service import archive_returned_loans
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+@pytest.fixture
+def client(temp_db):
+    return create_app().test_client()
+
+
+def _changes(since=0):
+    return list(iter_changes(since, 1000))
+
+
+def test_writes_are_logged_in_order(temp_db):
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    borrow_book_by_patron("123456", 1)
+
+    changes = _changes()
+
+    assert [(c['table_name'], c['op']) for c in changes] == [
+        ('books', 'insert'), ('borrow_records', 'insert'), ('books', 'update')
+    ]
+    assert [c['seq'] for c in changes] == sorted(c['seq'] for c in changes)
+    assert json.loads(changes[2]['row'])['available_copies'] == 1
+
+
+def test_derived_column_updates_not_logged(temp_db):
+    """The epoch-column trigger should not produce extra update entries."""
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    borrow_book_by_patron("123456", 1)
+    return_book_by_patron("123456", 1)
+
+    loan_ops = [c['op'] for c in _changes() if c['table_name'] == 'borrow_records']
+    assert loan_ops == ['insert', 'update']
+
+
+def test_since_returns_only_newer(temp_db):
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    seq = get_latest_change_seq()
+    insert_book("Other", "Author", "2222222222222", 1, 1)
+
+    changes = _changes(seq)
+    assert len(changes) == 1
+    assert json.loads(changes[0]['row'])['title'] == "Other"
+
+
+def test_archival_logged_as_delete(temp_db):
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    borrow_book_by_patron("123456", 1)
+    return_book_by_patron("123456", 1)
+    seq = get_latest_change_seq()
+
+    archive_returned_loans(horizon_days=0, now=datetime.now() + timedelta(days=1))
+
+    assert [(c['table_name'], c['op'], c['row']) for c in _changes(seq)] == [('borrow_records', 'delete', None)]
+
+
+def test_prune(temp_db):
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    insert_book("Other", "Author", "2222222222222", 1, 1)
+    assert prune_change_log(1) == 1
+    assert len(_changes()) == 1
+
+
+def test_changes_endpoint_streams_ndjson(client):
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    insert_book("Other", "Author", "2222222222222", 1, 1)
+
+    response = client.get('/api/changes?since=0&limit=1')
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Latest-Seq'] == '2'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(lines) == 1
+    assert lines[0]['row']['isbn'] == "1111111111111"
+
+    rest = client.get(f"/api/changes?since={lines[0]['seq']}").get_data(as_text=True).splitlines()
+    assert len(rest) == 1
+
+
+def test_changes_endpoint_validates_params(client):
+    assert client.get('/api/changes?since=abc').status_code == 400
+    assert client.get('/api/changes?limit=0').status_code == 400
+
+
+def test_prune_endpoint_takes_last_consumed_seq(client):
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    insert_book("Other", "Author", "2222222222222", 1, 1)
+
+    assert client.delete('/api/changes').status_code == 400
+    assert client.delete('/api/changes?through=3').status_code == 400
+    response = client.delete('/api/changes?through=1')
+    assert response.get_json() == {'deleted': 1, 'latest_seq': 2}
+    assert [c['seq'] for c in _changes()] == [2]
+
+
+@pytest.fixture
+def toronto_time(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/Toronto')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_changed_at_is_local_time(toronto_time, temp_db):
+    """changed_at uses the same naive local time as the rest of the app."""
+    before = datetime.now() - timedelta(seconds=1)
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    after = datetime.now() + timedelta(seconds=1)
+
+    assert before <= datetime.fromisoformat(_changes()[0]['changed_at']) <= after
+
+
+def test_migration_converts_utc_entries_to_local_time(toronto_time, tmp_path, monkeypatch):
+    """Entries logged by the old UTC triggers are rewritten to local time once."""
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    migrations.migrate(target=13)
+    insert_book("Book", "Author", "1111111111111", 2, 2)
+    utc = datetime.fromisoformat(_changes()[0]['changed_at'])
+
+    migrations.migrate()
+    insert_book("Other", "Author", "2222222222222", 1, 1)
+
+    first, second = [datetime.fromisoformat(c['changed_at']) for c in _changes()]
+    assert first == utc.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert first != utc
+    assert abs(second - datetime.now()) < timedelta(seconds=5)
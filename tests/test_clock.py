@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+import clock
+from app import create_app
+from database import insert_book
+from services.library_service import borrow_book_by_patron, calculate_late_fee_for_book
+
+T0 = datetime(2026, 3, 2, 12, 0)
+
+
+def test_frozen_clock_is_stable_and_nests(monkeypatch):
+    """now() is fixed inside frozen() and restored on exit."""
+    monkeypatch.setattr(clock, 'source', lambda: T0)
+    with clock.frozen(T0 + timedelta(days=1)) as at:
+        assert clock.now() == at
+        with clock.frozen(T0 + timedelta(days=2)):
+            assert clock.now() == T0 + timedelta(days=2)
+        assert clock.now() == at
+    assert clock.now() == T0
+
+
+def test_time_travel_late_fee(temp_db):
+    """A loan made in a frozen past is assessed at a later frozen time."""
+    insert_book("Gatsby", "Fitzgerald", "1111111111111", 1, 1)
+    with clock.frozen(T0):
+        assert borrow_book_by_patron("123456", 1)[0]
+    with clock.frozen(T0 + timedelta(days=24)):
+        fee = calculate_late_fee_for_book("123456", 1)
+    assert fee['days_overdue'] == 10
+    assert fee['fee_amount'] == 6.50
+
+
+def test_clock_header_only_when_enabled(temp_db, monkeypatch):
+    """The request clock honours the configured header and nothing else."""
+    insert_book("Gatsby", "Fitzgerald", "1111111111111", 1, 1)
+    with clock.frozen(T0):
+        borrow_book_by_patron("123456", 1)
+    later = {'X-Clock-Now': (T0 + timedelta(days=24)).isoformat()}
+
+    app = create_app(dev_mode=False)
+    client = app.test_client()
+    monkeypatch.setattr(clock, 'source', lambda: T0 + timedelta(days=1))
+    assert client.get('/api/late_fee/123456/1', headers=later).get_json()['days_overdue'] == 0
+
+    app.config['CLOCK_HEADER'] = 'X-Clock-Now'
+    assert client.get('/api/late_fee/123456/1', headers=later).get_json()['days_overdue'] == 10
+    assert clock.now() == T0 + timedelta(days=1)
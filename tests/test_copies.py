@@ -0,0 +1,149 @@
+import pytest
+
+import migrations
+from database import add_sample_data, get_book_by_id, get_branch_availability, get_db_connection, insert_book
+from services.hold_service import cancel_hold, place_hold
+from services.inventory_service import add_copies_to_book, borrow_copy_by_patron, return_copy_by_patron
+from services.library_service import (
+    borrow_book_by_patron, borrow_books_by_patron, return_book_by_patron
+)
+
+
+def _copies(book_id):
+    conn = get_db_connection()
+    rows = conn.execute('SELECT barcode, branch, status FROM copies WHERE book_id = ? ORDER BY id',
+                        (book_id,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+@pytest.fixture
+def branch_db(temp_db):
+    insert_book("Gatsby", "Fitzgerald", "1111111111111", 2, 2)
+    add_copies_to_book(1, 1, "East")
+    return temp_db
+
+
+def test_insert_book_creates_copies(branch_db):
+    """Each copy gets a barcode; copies beyond available_copies are 'missing'."""
+    insert_book("Lost", "Author", "2222222222222", 2, 1)
+
+    assert [c['status'] for c in _copies(2)] == ['available', 'missing']
+    assert [c['barcode'] for c in _copies(1)] == ['B000001-001', 'B000001-002', 'B000001-003']
+    assert get_book_by_id(1)['total_copies'] == 3
+
+
+def test_borrow_and_return_move_copy_status(branch_db):
+    """Title-level and batch borrows check out a copy; returns put it back."""
+    assert borrow_book_by_patron("123456", 1)[0]
+    assert borrow_books_by_patron("654321", [1])[0]
+    assert [c['status'] for c in _copies(1)] == ['on_loan', 'on_loan', 'available']
+
+    assert return_book_by_patron("123456", 1)[0]
+    assert [c['status'] for c in _copies(1)] == ['available', 'on_loan', 'available']
+
+
+def test_branch_filtered_borrow_and_availability(branch_db):
+    """A branch borrow takes a copy shelved at that branch."""
+    assert get_branch_availability("East") == [{'book_id': 1, 'branch': 'East', 'available_copies': 1}]
+
+    assert borrow_book_by_patron("123456", 1, branch="East")[0]
+    assert get_branch_availability("East") == []
+    assert borrow_book_by_patron("654321", 1, branch="East") == (
+        False, "No copies of this book are available at East.")
+    assert get_branch_availability(book_id=1) == [{'book_id': 1, 'branch': 'Main', 'available_copies': 2}]
+
+
+def test_borrow_and_return_by_barcode(branch_db):
+    """Barcode checkout uses exactly that copy and only its borrower can return it."""
+    assert borrow_copy_by_patron("123456", "B000001-002")[0]
+    assert _copies(1)[1]['status'] == 'on_loan'
+    assert borrow_copy_by_patron("654321", "B000001-002") == (False, "This copy is not available.")
+
+    assert return_copy_by_patron("654321", "B000001-002") == (
+        False, "This copy is not borrowed by this patron.")
+    assert return_copy_by_patron("123456", "B000001-002")[0]
+    assert _copies(1)[1]['status'] == 'available'
+    assert get_book_by_id(1)['available_copies'] == 3
+
+
+def test_return_one_of_two_copies_of_a_title(branch_db):
+    """Returning one barcode closes only that loan and keeps the counter in step with copies."""
+    assert borrow_copy_by_patron("111111", "B000001-001")[0]
+    assert borrow_copy_by_patron("111111", "B000001-003")[0]
+
+    assert return_copy_by_patron("111111", "B000001-003")[0]
+    assert [c['status'] for c in _copies(1)] == ['on_loan', 'available', 'available']
+    assert get_book_by_id(1)['available_copies'] == 2
+    conn = get_db_connection()
+    open_loans = conn.execute('SELECT copy_id FROM borrow_records WHERE return_date IS NULL').fetchall()
+    conn.close()
+    assert [row[0] for row in open_loans] == [1]
+
+
+def test_held_copy_is_set_aside_for_hold(temp_db):
+    """A ready hold keeps a copy off the shelf until picked up or cancelled."""
+    insert_book("Only", "Author", "3333333333333", 1, 1)
+    borrow_book_by_patron("111111", 1)
+    place_hold("222222", 1)
+    place_hold("333333", 1)
+
+    return_book_by_patron("111111", 1)
+    assert _copies(1)[0]['status'] == 'held'
+
+    cancel_hold("222222", 1)
+    assert _copies(1)[0]['status'] == 'held'
+
+    assert borrow_book_by_patron("333333", 1)[0]
+    assert _copies(1)[0]['status'] == 'on_loan'
+
+
+def test_hold_patron_scanning_a_shelf_copy_releases_the_held_one(temp_db):
+    """Borrowing another copy by barcode fulfils the hold and puts the held copy back on the shelf."""
+    insert_book("Pair", "Author", "3333333333333", 2, 2)
+    borrow_book_by_patron("111111", 1)
+    borrow_book_by_patron("444444", 1)
+    place_hold("222222", 1)
+    return_book_by_patron("111111", 1)
+    return_book_by_patron("444444", 1)
+    assert [c['status'] for c in _copies(1)] == ['held', 'available']
+    assert get_book_by_id(1)['available_copies'] == 1
+
+    assert borrow_copy_by_patron("222222", "B000001-002")[0]
+    assert [c['status'] for c in _copies(1)] == ['available', 'on_loan']
+    assert get_book_by_id(1)['available_copies'] == 1
+    conn = get_db_connection()
+    assert conn.execute("SELECT status FROM holds").fetchone()[0] == 'fulfilled'
+    conn.close()
+
+
+def test_backfill_splits_existing_counters(temp_db):
+    """Migrating a pre-copies book links active loans to on-loan copies."""
+    conn = get_db_connection()
+    conn.execute('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES ('Old', 'Author', '4444444444444', 3, 1)
+    ''')
+    conn.execute('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+        VALUES ('123456', 1, '2026-01-01T10:00:00', '2026-01-15T10:00:00')
+    ''')
+    conn.execute('DELETE FROM copies')
+    conn.execute('UPDATE borrow_records SET copy_id = NULL')
+    conn.commit()
+
+    assert migrations._backfill_copies(conn, 0, 10) == (1, 3)
+    conn.commit()
+    loan_copy = conn.execute('SELECT copy_id FROM borrow_records').fetchone()[0]
+    conn.close()
+
+    assert [c['status'] for c in _copies(1)] == ['available', 'on_loan', 'missing']
+    assert loan_copy == 2
+
+
+def test_sample_data_has_copies(temp_db):
+    """Seeded books get shelf copies and the seeded 1984 loan holds one of them."""
+    add_sample_data()
+    assert get_branch_availability(book_id=1) == [{'book_id': 1, 'branch': 'Main', 'available_copies': 3}]
+    assert [c['status'] for c in _copies(3)] == ['on_loan']
+    assert borrow_book_by_patron("111111", 1, branch="Main")[0]
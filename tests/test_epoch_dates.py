@@ -0,0 +1,80 @@
+import pytest
+from datetime import datetime, timedelta
+
+from database import (
+    get_db_connection, insert_book, insert_borrow_record, get_patron_borrowed_books,
+    get_overdue_loans, to_epoch, from_epoch
+)
+from migrations import migrate
+
+NOW = datetime(2026, 6, 1, 12, 0, 0)
+
+
+def test_epoch_round_trip():
+    """Conversion helpers should be exact to the second."""
+    assert from_epoch(to_epoch(NOW)) == NOW
+
+
+def test_insert_populates_integer_columns(temp_db):
+    """The insert trigger fills *_ts from the TEXT dates."""
+    insert_book("Book", "Author", "1111111111111", 1, 1)
+    insert_borrow_record("123456", 1, NOW, NOW + timedelta(days=14))
+
+    conn = get_db_connection()
+    row = conn.execute('SELECT borrow_ts, due_ts, return_ts FROM borrow_records').fetchone()
+    conn.close()
+    assert row['borrow_ts'] == to_epoch(NOW)
+    assert row['due_ts'] == to_epoch(NOW + timedelta(days=14))
+    assert row['return_ts'] is None
+
+
+def test_migration_backfills_existing_rows(tmp_path, monkeypatch):
+    """Rows written before the integer columns existed get converted."""
+    import database
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "old.db"))
+    migrate(target=3)
+    conn = get_db_connection()
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES ('B', 'A', '1111111111111', 1, 1)")
+    for i in range(5):
+        conn.execute('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+            VALUES ('123456', 1, ?, ?, ?)
+        ''', (NOW.isoformat(), (NOW + timedelta(days=i)).isoformat(), NOW.isoformat() if i else None))
+    conn.commit()
+    conn.close()
+
+    report = migrate(batch_size=2)
+
+    assert report[0]['rows'] == 5
+    conn = get_db_connection()
+    rows = conn.execute('SELECT * FROM borrow_records ORDER BY id').fetchall()
+    conn.close()
+    assert [r['due_ts'] for r in rows] == [to_epoch(NOW + timedelta(days=i)) for i in range(5)]
+    assert rows[0]['return_ts'] is None
+    assert rows[1]['return_ts'] == to_epoch(NOW)
+
+
+def test_overdue_loans_computed_in_sql(temp_db):
+    """Days overdue follow calendar days; loans due today are not overdue."""
+    insert_book("Book", "Author", "1111111111111", 5, 5)
+    insert_borrow_record("222222", 1, NOW - timedelta(days=20), NOW - timedelta(days=6, hours=13))
+    insert_borrow_record("111111", 1, NOW - timedelta(days=20), NOW - timedelta(days=2))
+    insert_borrow_record("111111", 1, NOW - timedelta(days=14), NOW - timedelta(hours=1))
+    insert_borrow_record("111111", 1, NOW, NOW + timedelta(days=14))
+
+    loans = get_overdue_loans(NOW)
+
+    assert [(l['patron_id'], l['days_overdue']) for l in loans] == [("111111", 2), ("222222", 7)]
+
+
+def test_borrowed_books_overdue_flag(temp_db):
+    """is_overdue is evaluated in SQL against the current time."""
+    insert_book("Book", "Author", "1111111111111", 5, 5)
+    now = datetime.now()
+    insert_borrow_record("123456", 1, now - timedelta(days=20), now - timedelta(days=6))
+    insert_borrow_record("123456", 1, now, now + timedelta(days=14))
+
+    books = get_patron_borrowed_books("123456")
+
+    assert [b['is_overdue'] for b in books] == [True, False]
+    assert isinstance(books[0]['due_date'], datetime)
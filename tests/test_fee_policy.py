@@ -0,0 +1,63 @@
+import pytest
+from datetime import date, datetime, timedelta
+from unittest.mock import Mock
+
+from services import fee_service
+from services.fee_service import FeePolicy, get_policy
+from services.library_service import compute_late_fee, pay_late_fees, refund_late_fee_payment
+
+DUE = datetime(2026, 3, 2, 12, 0)
+
+
+def _original_r5(days):
+    if days <= 0:
+        return 0.0
+    fee = days * 0.50 if days <= 7 else 7 * 0.50 + (days - 7) * 1.00
+    return min(fee, 15.00)
+
+
+def test_standard_policy_matches_r5():
+    """The compiled default table reproduces the R5 arithmetic for every day."""
+    for days in range(-3, 400):
+        assert compute_late_fee(days) == _original_r5(days)
+
+
+def test_grace_closed_days_and_uncapped_policy():
+    """Grace days and closed days are not charged; uncapped fees keep growing."""
+    policy = FeePolicy('staff', [(None, 0.25)], grace_days=2,
+                       closed_days=[date(2026, 3, 4), date(2026, 3, 5), date(2026, 4, 1)]).compile()
+
+    # 5 calendar days late, 2 closed, 2 of grace -> 1 chargeable day
+    assert policy.assess(DUE, DUE + timedelta(days=5)) == (0.25, 5)
+    assert policy.assess(DUE, DUE) == (0.0, 0)
+    assert policy.max_fee is None
+    assert policy.fee_for_days(1000) == 249.5
+
+
+def test_patron_class_selects_policy(monkeypatch):
+    """Patrons mapped to a class are charged by that class's policy."""
+    monkeypatch.setitem(fee_service.POLICIES, 'child', FeePolicy('child', [(None, 0.10)], max_fee=2.00))
+    monkeypatch.setitem(fee_service.PATRON_CLASSES, '222222', 'child')
+
+    assert get_policy('222222').assess(DUE, DUE + timedelta(days=30)) == (2.00, 30)
+    assert get_policy('111111').assess(DUE, DUE + timedelta(days=30)) == (15.00, 30)
+
+
+def test_refund_limited_to_amount_paid(temp_db, mocker):
+    """A ledger payment can only be refunded up to what is left of it."""
+    mocker.patch('services.library_service.calculate_late_fee_for_book',
+                 return_value={'fee_amount': 4.0, 'days_overdue': 8})
+    mocker.patch('services.library_service.get_book_by_id', return_value={'id': 1, 'title': 'Gatsby'})
+    gateway = Mock()
+    gateway.process_payment.return_value = (True, "txn_7", "Success")
+    gateway.refund_payment.return_value = (True, "Refunded")
+    pay_late_fees("123456", 1, gateway)
+
+    assert refund_late_fee_payment("txn_7", 3.0, gateway)[0]
+    success, message = refund_late_fee_payment("txn_7", 2.0, gateway)
+    assert not success
+    assert "$1.00 still refundable" in message
+    # Transactions unknown to the ledger fall back to the policy cap
+    assert refund_late_fee_payment("txn_other", 15.0, gateway)[0]
+    assert refund_late_fee_payment("txn_other", 15.5, gateway) == (
+        False, "Refund amount exceeds maximum late fee.")
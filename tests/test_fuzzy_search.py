@@ -0,0 +1,84 @@
+import pytest
+
+import search_index
+from app import create_app
+from database import add_sample_data, get_db_connection, insert_book
+from migrations import migrate
+from search_index import bounded_edit_distance, normalize, fuzzy_search
+from services.library_service import search_books_in_catalog
+
+
+@pytest.fixture
+def catalog(temp_db):
+    add_sample_data()
+    insert_book("The Old Man and the Sea", "Ernest Hemingway", "1111111111111", 1, 1)
+    return temp_db
+
+
+def test_normalize_strips_case_accents_and_punctuation():
+    assert normalize("F. Scott Fitzgérald") == ["f", "scott", "fitzgerald"]
+
+
+@pytest.mark.parametrize("a, b, limit, expected", [
+    ("fitzgerlad", "fitzgerald", 2, 2),
+    ("orwel", "orwell", 1, 1),
+    ("kitten", "sitting", 2, 3),
+    ("same", "same", 0, 0),
+    ("short", "muchlongerword", 2, 3),
+])
+def test_bounded_edit_distance(a, b, limit, expected):
+    assert bounded_edit_distance(a, b, limit) == expected
+
+
+def test_fuzzy_author_search_tolerates_typos(catalog):
+    results = search_books_in_catalog("Fitzgerlad", "author", fuzzy=True)
+    assert [b['title'] for b in results] == ["The Great Gatsby"]
+
+
+def test_fuzzy_title_search(catalog):
+    results = search_books_in_catalog("mockingbrid", "title", fuzzy=True)
+    assert [b['title'] for b in results] == ["To Kill a Mockingbird"]
+
+
+def test_exact_search_unchanged(catalog):
+    assert search_books_in_catalog("Fitzgerlad", "author") == []
+
+
+def test_fuzzy_rejects_distant_words(catalog):
+    assert search_books_in_catalog("Tolstoy", "author", fuzzy=True) == []
+
+
+def test_fuzzy_ranks_closer_match_first(catalog):
+    insert_book("Old Mon", "Someone", "2222222222222", 1, 1)
+    results = search_books_in_catalog("old man", "title", fuzzy=True)
+    assert results[0]['title'] == "The Old Man and the Sea"
+
+
+def test_common_trigrams_are_skipped(catalog, monkeypatch):
+    """Posting lists over the cap don't contribute candidates."""
+    monkeypatch.setattr(search_index, "MAX_POSTINGS_PER_TRIGRAM", 0)
+    conn = get_db_connection()
+    assert fuzzy_search(conn, "Orwell", "author") == []
+    conn.close()
+
+
+def test_migration_indexes_existing_books(tmp_path, monkeypatch):
+    import database
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "old.db"))
+    migrate(target=7)
+    conn = get_db_connection()
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Brave New World', 'Aldous Huxley', '1111111111111', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    migrate()
+
+    assert [b['title'] for b in search_books_in_catalog("Huxly", "author", fuzzy=True)] == ["Brave New World"]
+
+
+def test_api_fuzzy_flag(catalog):
+    client = create_app().test_client()
+    data = client.get('/api/search?q=Orwel&type=author&fuzzy=1').get_json()
+    assert data['fuzzy'] is True
+    assert data['count'] == 1
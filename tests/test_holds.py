@@ -0,0 +1,101 @@
+import pytest
+
+from app import create_app
+from database import get_book_by_id, insert_book
+from services.hold_service import place_hold, get_hold_status, cancel_hold
+from services.library_service import (
+    borrow_book_by_patron, return_book_by_patron, borrow_books_by_patron, return_books_by_patron
+)
+
+
+@pytest.fixture
+def single_copy(temp_db):
+    """One book with its only copy on loan to 111111."""
+    insert_book("Popular", "Author", "1111111111111", 1, 1)
+    borrow_book_by_patron("111111", 1)
+    return temp_db
+
+
+def test_place_hold_when_unavailable(single_copy):
+    """Holds queue up in FIFO order."""
+    assert place_hold("222222", 1)[0] is True
+    success, message = place_hold("333333", 1)
+
+    assert success is True
+    assert "position: 2" in message.lower()
+    assert get_hold_status("333333", 1)['position'] == 2
+    assert get_hold_status("333333", 1)['queue_length'] == 2
+
+
+def test_place_hold_rejected_when_available(temp_db):
+    insert_book("Shelf", "Author", "1111111111111", 1, 1)
+    success, message = place_hold("222222", 1)
+    assert success is False
+    assert "available now" in message
+
+
+def test_duplicate_hold_rejected(single_copy):
+    place_hold("222222", 1)
+    success, message = place_hold("222222", 1)
+    assert success is False
+    assert "already have a hold" in message
+
+
+def test_return_assigns_copy_to_next_hold(single_copy):
+    """A returned copy goes to the queue head, not the shelf."""
+    place_hold("222222", 1)
+    place_hold("333333", 1)
+
+    return_book_by_patron("111111", 1)
+
+    assert get_book_by_id(1)['available_copies'] == 0
+    assert get_hold_status("222222", 1)['status'] == 'ready'
+    assert get_hold_status("333333", 1)['position'] == 1
+    assert borrow_book_by_patron("444444", 1)[0] is False
+
+
+def test_ready_hold_can_borrow(single_copy):
+    """The hold owner can borrow the set-aside copy."""
+    place_hold("222222", 1)
+    return_book_by_patron("111111", 1)
+
+    success, message = borrow_book_by_patron("222222", 1)
+
+    assert success is True
+    assert get_book_by_id(1)['available_copies'] == 0
+    assert get_hold_status("222222", 1)['status'] == 'none'
+
+
+def test_cancel_ready_hold_passes_copy_on(single_copy):
+    place_hold("222222", 1)
+    place_hold("333333", 1)
+    return_book_by_patron("111111", 1)
+
+    assert cancel_hold("222222", 1)[0] is True
+    assert get_hold_status("333333", 1)['status'] == 'ready'
+
+    assert cancel_hold("333333", 1)[0] is True
+    assert get_book_by_id(1)['available_copies'] == 1
+
+
+def test_batch_paths_respect_holds(single_copy):
+    """Batch return assigns to holds; batch borrow consumes ready holds."""
+    place_hold("222222", 1)
+    return_books_by_patron("111111", [1])
+    assert get_book_by_id(1)['available_copies'] == 0
+
+    success, message, results = borrow_books_by_patron("222222", [1])
+    assert results[0]['success'] is True
+    assert get_book_by_id(1)['available_copies'] == 0
+
+
+def test_hold_endpoints(single_copy):
+    client = create_app().test_client()
+
+    response = client.post('/api/holds', json={'patron_id': '222222', 'book_id': 1})
+    assert response.status_code == 201
+    assert response.get_json()['position'] == 1
+
+    assert client.get('/api/holds/222222/1').get_json()['status'] == 'waiting'
+    assert client.delete('/api/holds/222222/1').status_code == 200
+    assert client.delete('/api/holds/222222/1').status_code == 404
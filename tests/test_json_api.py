@@ -0,0 +1,67 @@
+import pytest
+
+from app import create_app
+from database import insert_book
+
+
+@pytest.fixture
+def client(temp_db):
+    for i in range(1, 6):
+        insert_book(f"Book {i}", "Author", f"{i:013d}", 2, 2)
+    insert_book("Unavailable", "Author", "9999999999999", 1, 0)
+    return create_app().test_client()
+
+
+def test_books_paged_with_field_selection(client):
+    """The catalog pages by ID and returns only the requested fields."""
+    first = client.get('/api/books?limit=4&fields=id,title').get_json()
+    assert first['books'][0] == {'id': 1, 'title': 'Book 1'}
+    rest = client.get(f"/api/books?limit=4&after={first['next_after']}").get_json()
+    assert [b['id'] for b in first['books'] + rest['books']] == [1, 2, 3, 4, 5, 6]
+    assert rest['next_after'] is None
+
+    assert client.get('/api/books?fields=id,secret').status_code == 400
+    assert client.get('/api/books/99').status_code == 404
+
+
+def test_add_book_status_codes(client):
+    """New books get 201 and a Location; duplicates 409; bad input 400."""
+    body = {'title': 'New', 'author': 'A', 'isbn': '1234567890123', 'total_copies': 2}
+    response = client.post('/api/books', json=body)
+    assert response.status_code == 201
+    assert client.get(response.headers['Location']).get_json()['title'] == 'New'
+
+    assert client.post('/api/books', json=body).status_code == 409
+    assert client.post('/api/books', json={**body, 'isbn': '1'}).status_code == 400
+    assert client.post('/api/books', json={**body, 'total_copies': '2'}).status_code == 400
+
+
+def test_borrow_and_return_single_and_batch(client):
+    """Single and batch loans share one endpoint, with per-item statuses."""
+    response = client.post('/api/borrow', json={'patron_id': '123456', 'book_id': 1})
+    assert response.status_code == 201
+    assert response.get_json()['due_date']
+
+    assert client.post('/api/borrow', json={'patron_id': '123456', 'book_id': 6}).status_code == 409
+    assert client.post('/api/borrow', json={'patron_id': '123456', 'book_id': 99}).status_code == 404
+    assert client.post('/api/borrow', json={'patron_id': '12', 'book_id': 1}).status_code == 400
+
+    response = client.post('/api/borrow', json={'patron_id': '123456', 'book_ids': [2, 99]})
+    assert response.status_code == 207
+    assert [r['status'] for r in response.get_json()['results']] == [201, 404]
+
+    response = client.post('/api/return', json={'patron_id': '123456', 'book_ids': [1, 2]})
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['fee_amount'] == 0.0
+    assert client.post('/api/return', json={'patron_id': '123456', 'book_id': 1}).status_code == 409
+
+
+def test_patron_report_fields(client):
+    """The report returns only the requested sections."""
+    client.post('/api/borrow', json={'patron_id': '123456', 'book_ids': [1, 2]})
+    report = client.get('/api/patrons/123456/report?fields=borrowed_count').get_json()
+    assert report == {'borrowed_count': 2}
+
+    full = client.get('/api/patrons/123456/report').get_json()
+    assert len(full['currently_borrowed']) == 2 and 'borrowing_history' in full
+    assert client.get('/api/patrons/abc/report').status_code == 400
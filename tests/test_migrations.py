@@ -0,0 +1,177 @@
+import multiprocessing
+
+import pytest
+import migrations
+from migrations import Migration, migrate, get_migration_states, latest_version
+from database import get_db_connection, get_schema_version
+
+
+def _add_flag_column_backfill(conn, after_id, limit):
+    """Test backfill: set flag = 1 on up to `limit` rows after `after_id`."""
+    rows = conn.execute('SELECT id FROM books WHERE id > ? ORDER BY id LIMIT ?',
+                        (after_id, limit)).fetchall()
+    if not rows:
+        return None
+    last_id = rows[-1]['id']
+    cur = conn.execute('UPDATE books SET flag = 1 WHERE id > ? AND id <= ?', (after_id, last_id))
+    return last_id, cur.rowcount
+
+
+@pytest.fixture
+def books_db(temp_db):
+    conn = get_db_connection()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, total_copies, available_copies)
+        VALUES (?, ?, ?, 1, 1)
+    ''', [(f'Book {i}', 'Author', f'{i:013d}') for i in range(25)])
+    conn.commit()
+    conn.close()
+    return temp_db
+
+
+@pytest.fixture
+def flag_migration(monkeypatch):
+    migration = Migration(latest_version() + 1, 'Add flag column',
+                          ['ALTER TABLE books ADD COLUMN flag INTEGER NOT NULL DEFAULT 0'],
+                          backfill=_add_flag_column_backfill, table='books')
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + [migration])
+    return migration
+
+
+def test_init_records_all_versions(temp_db):
+    """Every built-in migration should be recorded as applied."""
+    conn = get_db_connection()
+    states = get_migration_states(conn)
+    conn.close()
+    assert sorted(states) == [m.version for m in migrations.MIGRATIONS]
+    assert all(s['state'] == 'applied' for s in states.values())
+
+
+def test_migrate_is_noop_when_current(temp_db):
+    """Running again should report nothing."""
+    assert migrate() == []
+
+
+def test_backfill_runs_in_chunks(books_db, flag_migration):
+    """Backfill should touch every row in batch_size chunks."""
+    calls = []
+    report = migrate(batch_size=10, progress=lambda v, rows: calls.append(rows))
+
+    assert report[0]['rows'] == 25
+    assert calls == [10, 20, 25]
+    conn = get_db_connection()
+    assert conn.execute('SELECT COUNT(*) FROM books WHERE flag = 0').fetchone()[0] == 0
+    assert get_schema_version(conn) == flag_migration.version
+    conn.close()
+
+
+def test_backfill_resumes_after_interruption(books_db, flag_migration, monkeypatch):
+    """A failed chunk should leave the committed cursor in place."""
+    calls = {'n': 0}
+
+    def flaky(conn, after_id, limit):
+        calls['n'] += 1
+        if calls['n'] == 2:
+            raise RuntimeError('interrupted')
+        return _add_flag_column_backfill(conn, after_id, limit)
+
+    monkeypatch.setattr(flag_migration, 'backfill', flaky)
+    with pytest.raises(RuntimeError):
+        migrate(batch_size=10)
+
+    conn = get_db_connection()
+    state = get_migration_states(conn)[flag_migration.version]
+    assert state['state'] == 'backfilling'
+    assert state['backfill_cursor'] == 10
+    conn.close()
+
+    monkeypatch.setattr(flag_migration, 'backfill', _add_flag_column_backfill)
+    report = migrate(batch_size=10)
+    assert report[0]['rows'] == 15
+
+
+def test_dry_run_changes_nothing(books_db, flag_migration):
+    """Dry run should estimate rows and time but leave the schema alone."""
+    report = migrate(dry_run=True, batch_size=10)
+
+    assert report[0]['estimated_rows'] == 25
+    assert report[0]['estimated_seconds'] >= 0
+    conn = get_db_connection()
+    columns = [row['name'] for row in conn.execute('PRAGMA table_info(books)')]
+    assert 'flag' not in columns
+    assert flag_migration.version not in get_migration_states(conn)
+    conn.close()
+
+
+@pytest.mark.parametrize('applied', [0, 5])
+def test_dry_run_across_several_pending_migrations(tmp_path, monkeypatch, applied):
+    """Dry run should estimate every pending migration, including tables created by earlier ones."""
+    monkeypatch.setattr(migrations.database, 'DATABASE', str(tmp_path / 'library.db'))
+    if applied:
+        migrate(target=applied)
+        conn = get_db_connection()
+        conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                     "VALUES ('Book', 'Author', '0000000000001', 2, 2)")
+        conn.commit()
+        conn.close()
+
+    report = migrate(dry_run=True)
+
+    assert [row['version'] for row in report] == list(range(applied + 1, latest_version() + 1))
+    conn = get_db_connection()
+    assert get_schema_version(conn) == applied
+    assert sorted(get_migration_states(conn)) == list(range(1, applied + 1))
+    tables = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+    assert 'holds' not in tables
+    assert ('borrow_records' in tables) == bool(applied)
+
+
+def _init_after(db_path, barrier):
+    migrations.database.DATABASE = db_path
+    barrier.wait(10)
+    migrations.database.init_database()
+
+
+def test_concurrent_workers_migrate_a_fresh_database_once(tmp_path, monkeypatch):
+    """Workers starting together each decide under the write lock, so none re-applies a migration."""
+    context = multiprocessing.get_context('fork')
+    db_path = str(tmp_path / 'library.db')
+    barrier = context.Barrier(4)
+    workers = [context.Process(target=_init_after, args=(db_path, barrier)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    monkeypatch.setattr(migrations.database, 'DATABASE', db_path)
+    conn = get_db_connection()
+    states = get_migration_states(conn)
+    assert get_schema_version(conn) == latest_version()
+    conn.close()
+    assert sorted(states) == [m.version for m in migrations.MIGRATIONS]
+    assert all(s['state'] == 'applied' for s in states.values())
+
+
+def test_dry_run_estimates_rollup_backfill_from_loan_days(tmp_path, monkeypatch):
+    """The daily rollup backfill (cursor is a day, not an id) gets a real row and time estimate."""
+    monkeypatch.setattr(migrations.database, 'DATABASE', str(tmp_path / 'library.db'))
+    migrate(target=8)
+    conn = get_db_connection()
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Book', 'Author', '0000000000001', 1, 1)")
+    conn.executemany('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES ('123456', 1, ?, ?, ?)
+    ''', [(f'2026-0{month}-01T10:00:00', f'2026-0{month}-15T10:00:00', f'2026-0{month}-10T10:00:00')
+          for month in range(1, 7)])
+    conn.commit()
+    conn.close()
+
+    ticks = iter(range(100))
+    monkeypatch.setattr(migrations.time, 'perf_counter', lambda: next(ticks) * 0.5)
+    rollups = next(row for row in migrate(dry_run=True, target=9) if row['version'] == 9)
+
+    assert rollups['estimated_rows'] == 6
+    assert rollups['estimated_seconds'] == 0.5 * 6     # one timed chunk x 6 chunks of 30 days (Jan 1 - Jun 10)
@@ -0,0 +1,88 @@
+import csv
+import json
+import os
+import pytest
+from datetime import datetime, timedelta
+
+from database import insert_book, insert_borrow_record, get_db_connection
+from services.notice_service import generate_overdue_notices, spool_overdue_notices
+
+NOW = datetime(2026, 6, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def overdue_db(temp_db):
+    insert_book("Gatsby", "Fitzgerald", "1111111111111", 5, 5)
+    insert_book("1984", "Orwell", "2222222222222", 5, 5)
+    insert_borrow_record("222222", 1, NOW - timedelta(days=40), NOW - timedelta(days=26))
+    insert_borrow_record("111111", 1, NOW - timedelta(days=17), NOW - timedelta(days=3))
+    insert_borrow_record("111111", 2, NOW - timedelta(days=24), NOW - timedelta(days=10))
+    insert_borrow_record("333333", 2, NOW, NOW + timedelta(days=14))
+    return temp_db
+
+
+def test_notices_grouped_by_patron(overdue_db):
+    """One notice per patron, books ordered by due date."""
+    notices = list(generate_overdue_notices(NOW))
+
+    assert [n['patron_id'] for n in notices] == ["111111", "222222"]
+    assert [b['title'] for b in notices[0]['books']] == ["1984", "Gatsby"]
+
+
+def test_notice_fees_follow_r5(overdue_db):
+    """Fees use the R5 rates and the per-book cap."""
+    notices = {n['patron_id']: n for n in generate_overdue_notices(NOW)}
+
+    assert [b['fee_amount'] for b in notices["111111"]['books']] == [6.50, 1.50]
+    assert notices["111111"]['total_fee'] == 8.00
+    assert notices["222222"]['total_fee'] == 15.00
+
+
+def test_generator_is_lazy(overdue_db):
+    """Nothing is read until the generator is advanced."""
+    notices = generate_overdue_notices(NOW)
+    assert next(notices)['patron_id'] == "111111"
+
+
+def test_spool_jsonl(overdue_db, tmp_path):
+    result = spool_overdue_notices('jsonl', str(tmp_path), NOW)
+
+    assert result['notices'] == 2
+    with open(result['path']) as spool:
+        lines = [json.loads(line) for line in spool]
+    assert lines[1]['patron_id'] == "222222"
+    assert not os.path.exists(result['path'] + '.tmp')
+
+
+def test_spool_csv(overdue_db, tmp_path):
+    result = spool_overdue_notices('csv', str(tmp_path), NOW)
+    with open(result['path']) as spool:
+        rows = list(csv.DictReader(spool))
+    assert len(rows) == 3
+
+
+def test_spool_email(overdue_db, tmp_path):
+    result = spool_overdue_notices('email', str(tmp_path), NOW)
+    with open(os.path.join(result['path'], "111111.txt")) as body:
+        text = body.read()
+    assert "$8.00" in text
+    assert '"Gatsby" by Fitzgerald' in text
+
+
+def test_spool_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        spool_overdue_notices('pdf', str(tmp_path), NOW)
+
+
+def test_overdue_scan_uses_index_order(overdue_db):
+    """The pass should be served by the patron/due index without a sort step."""
+    conn = get_db_connection()
+    plan = ' '.join(row['detail'] for row in conn.execute('''
+        EXPLAIN QUERY PLAN
+        SELECT br.id FROM borrow_records br
+        WHERE br.return_date IS NULL AND br.due_ts < 0
+        ORDER BY br.patron_id, br.due_ts
+    '''))
+    conn.close()
+    assert 'idx_borrow_active_patron_due' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,70 @@
+import json
+import sqlite3
+
+import pytest
+
+import database
+import profiler
+from app import create_app
+from database import get_book_by_id, get_db_connection, insert_book
+from profiler import ProfiledConnection, enable_profiling, normalize_sql
+
+
+@pytest.fixture
+def sql_profiler(temp_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "CONNECTION_FACTORY", None)
+    monkeypatch.setattr(ProfiledConnection, "profiler", None)
+    return enable_profiling(slow_ms={'read': 0.0, 'write': 1000.0},
+                            log_path=str(tmp_path / "slow.jsonl"))
+
+
+def test_normalize_sql():
+    """Literals, whitespace and IN-lists don't split one statement into many."""
+    assert normalize_sql("SELECT *\n  FROM books WHERE id IN (?, ?,?) AND title = 'It''s' AND n > 10") == \
+        "SELECT * FROM books WHERE id IN (?, ...) AND title = ? AND n > ?"
+    assert normalize_sql("SELECT trg_1 FROM t2 LIMIT 5") == "SELECT trg_1 FROM t2 LIMIT ?"
+
+
+def test_profiler_counts_rows_time_and_plans(sql_profiler):
+    """Executions, rows fetched and the query plan are recorded per statement."""
+    insert_book("Gatsby", "Fitzgerald", "1111111111111", 2, 2)
+    sql_profiler.reset()
+    get_book_by_id(1)
+    get_book_by_id(99)
+    conn = get_db_connection()
+    titles = [row['title'] for row in conn.execute("SELECT title FROM books WHERE author LIKE 'F%'")]
+    conn.close()
+    assert titles == ["Gatsby"]
+
+    stats = {row['sql']: row for row in sql_profiler.summary(limit=100)['top']}
+    by_id = stats['SELECT * FROM books WHERE id = ?']
+    assert by_id['count'] == 2 and by_id['rows'] == 1
+    assert by_id['plan'] == ['SEARCH books USING INTEGER PRIMARY KEY (rowid=?)']
+    assert by_id['table_scans'] == []
+    assert stats['SELECT title FROM books WHERE author LIKE ?']['table_scans'] == ['SCAN books']
+    assert stats['SELECT title FROM books WHERE author LIKE ?']['rows'] == 1
+
+
+def test_slow_log_and_endpoint(sql_profiler):
+    """Slow executions and table scans are logged; the endpoint reports and resets."""
+    client = create_app(dev_mode=False).test_client()
+    client.get('/api/late_fee/123456/1')
+    client.get('/api/search?q=gatsby&type=author')
+
+    events = [json.loads(line) for line in open(sql_profiler.log_path)]
+    assert {'slow', 'table_scan'} <= {event['event'] for event in events}
+    assert all(event['ms'] >= 0.0 for event in events if event['event'] == 'slow')
+
+    summary = client.get('/api/sql_profile?sort=count&limit=3').get_json()
+    assert summary['enabled'] and len(summary['top']) == 3
+    assert summary['top'][0]['count'] >= summary['top'][1]['count']
+    assert client.get('/api/sql_profile?sort=bogus').status_code == 400
+    assert client.delete('/api/sql_profile').status_code == 204
+    assert client.get('/api/sql_profile').get_json()['executions'] <= 1
+
+
+def test_profiling_is_off_by_default(temp_db):
+    """Without enable_profiling connections are plain and the endpoint says so."""
+    assert profiler.get_profiler() is None
+    assert type(get_db_connection()) is sqlite3.Connection
+    assert create_app(dev_mode=False).test_client().get('/api/sql_profile').get_json() == {'enabled': False}
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from app import create_app
+from services.rate_limit_service import (
+    CLIENTS_PER_ADDRESS, IDLE_BUCKET_SECONDS, MemoryBucketStore, RateLimiter, SQLiteBucketStore,
+    register_rate_limits
+)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / "limits.db"))
+
+
+def test_bucket_allows_burst_then_refills(store):
+    """A bucket admits `burst` requests at once, then one per 1/rate seconds."""
+    limiter = RateLimiter(store, limits={'default': (2.0, 3)})
+
+    assert [limiter.check('default', 'a', now=100.0)[0] for _ in range(4)] == [True, True, True, False]
+    assert limiter.check('default', 'a', now=100.0) == (False, 1)
+    assert limiter.check('default', 'b', now=100.0)[0]           # other clients unaffected
+    assert limiter.check('default', 'a', now=100.5)[0]           # one token after 0.5s
+    assert store.rejection_counts() == {'default:429': 2}
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    """Two stores on the same file see the same buckets (e.g. two workers)."""
+    path = str(tmp_path / "limits.db")
+    first = RateLimiter(SQLiteBucketStore(path), limits={'default': (1.0, 1)})
+    second = RateLimiter(SQLiteBucketStore(path), limits={'default': (1.0, 1)})
+
+    assert first.check('default', 'a', now=10.0)[0]
+    assert not second.check('default', 'a', now=10.0)[0]
+
+
+def test_search_limit_does_not_block_circulation(temp_db):
+    """Hammering /api/search returns 429 for that group only."""
+    app = create_app(dev_mode=False)
+    limiter = app.extensions['rate_limiter']
+    limiter.limits = {'search': (0.001, 2), 'default': (100.0, 100)}
+    client = app.test_client()
+
+    statuses = [client.get('/api/search?q=x').status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert client.get('/api/search?q=x').headers['Retry-After']
+    assert client.get('/api/late_fee/123456/1').status_code != 429
+
+    stats = client.get('/api/rate_limits').get_json()
+    assert stats['rejections'] == {'search:429': 2}
+
+
+def test_concurrency_cap_returns_503():
+    """Requests beyond the in-flight cap are rejected immediately."""
+    app = Flask(__name__)
+    limiter = register_rate_limits(app, RateLimiter(max_concurrent=1))
+    entered, release = threading.Event(), threading.Event()
+
+    @app.route('/slow')
+    def slow():
+        entered.set()
+        release.wait(5)
+        return 'done'
+
+    client = app.test_client()
+    worker = threading.Thread(target=lambda: client.get('/slow'))
+    worker.start()
+    entered.wait(5)
+    try:
+        assert app.test_client().get('/slow').status_code == 503
+    finally:
+        release.set()
+        worker.join()
+
+    assert limiter.stats()['in_flight'] == 0
+    assert limiter.stats()['rejections'] == {'default:503': 1}
+
+
+def test_client_id_is_a_sub_key_of_the_address():
+    """Rotating X-Client-ID can't exceed the address's shared bucket."""
+    app = Flask(__name__)
+    limiter = register_rate_limits(app, RateLimiter(limits={'default': (0.001, 1)}))
+    app.route('/ping')(lambda: 'pong')
+    client = app.test_client()
+
+    assert client.get('/ping', headers={'X-Client-ID': 'kiosk-1'}).status_code == 200
+    assert client.get('/ping', headers={'X-Client-ID': 'kiosk-1'}).status_code == 429
+    statuses = [client.get('/ping', headers={'X-Client-ID': f'rotated-{i}'}).status_code
+                for i in range(20)]
+    assert statuses.count(200) == CLIENTS_PER_ADDRESS - 2          # kiosk-1's rejected retry used one
+    assert client.get('/ping', environ_base={'REMOTE_ADDR': '10.0.0.2'},
+                      headers={'X-Client-ID': 'kiosk-1'}).status_code == 200
+    assert limiter.stats()['rejections']['default:429'] == 22 - (CLIENTS_PER_ADDRESS - 1)
+
+
+def test_memory_store_is_capped():
+    """The in-memory store drops idle buckets and the least recently used beyond its cap."""
+    store = MemoryBucketStore(max_buckets=3)
+    for i, key in enumerate('abcd'):
+        store.take(key, 1.0, 2, now=float(i))
+    assert store.bucket_count() == 3
+    assert store.take('a', 1.0, 2, now=4.0) == (True, 0)    # evicted, so full again
+    assert store.take('a', 1.0, 2, now=4.0) == (True, 0)
+    assert store.take('a', 1.0, 2, now=4.0)[0] is False
+
+    store.take('e', 1.0, 2, now=3.0 + IDLE_BUCKET_SECONDS)
+    assert store.bucket_count() == 2                                   # only 'a' was recent enough
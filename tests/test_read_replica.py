@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import pytest
+
+import database
+from database import (
+    get_read_connection, get_all_books, insert_book, refresh_read_replica, wait_for_replica_refresh
+)
+from services.library_service import search_books_in_catalog
+
+
+@pytest.fixture
+def replica(temp_db, tmp_path, monkeypatch):
+    path = str(tmp_path / "replica.db")
+    monkeypatch.setattr(database, "READ_REPLICA", path)
+    monkeypatch.setattr(database, "READ_REPLICA_MAX_STALENESS", 60.0)
+    insert_book("First", "Author", "1111111111111", 1, 1)
+    refresh_read_replica(force=True)
+    return path
+
+
+def test_read_connection_rejects_writes(temp_db):
+    conn = get_read_connection()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                     "VALUES ('x', 'y', '1', 1, 1)")
+    conn.close()
+
+
+def test_reads_default_to_primary(temp_db):
+    """Without a replica, a new book is visible immediately."""
+    insert_book("New", "Author", "1111111111111", 1, 1)
+    assert [b['title'] for b in get_all_books()] == ["New"]
+
+
+def test_replica_serves_snapshot_within_staleness(replica):
+    """Within the staleness bound, reads come from the snapshot."""
+    insert_book("Second", "Author", "2222222222222", 1, 1)
+
+    assert [b['title'] for b in get_all_books()] == ["First"]
+    assert search_books_in_catalog("Second", "title") == []
+
+
+def test_replica_refreshes_in_background_when_stale(replica, monkeypatch):
+    """A stale snapshot is still served while a background thread replaces it."""
+    insert_book("Second", "Author", "2222222222222", 1, 1)
+    monkeypatch.setattr(database, "READ_REPLICA_MAX_STALENESS", 0.0)
+
+    assert [b['title'] for b in get_all_books()] == ["First"]
+    wait_for_replica_refresh(5)
+    monkeypatch.setattr(database, "READ_REPLICA_MAX_STALENESS", 60.0)
+    assert [b['title'] for b in get_all_books()] == ["First", "Second"]
+    assert not os.path.exists(replica + ".lock")
+
+
+def test_refresh_skipped_while_another_process_holds_the_lock(replica, monkeypatch):
+    """Only the holder of the lock file refreshes; a lock left by a crash expires."""
+    open(replica + ".lock", "w").close()
+    assert refresh_read_replica(force=True) is False
+
+    monkeypatch.setattr(database, "READ_REPLICA_LOCK_TIMEOUT", -1.0)
+    assert refresh_read_replica(force=True) is True
+    assert not os.path.exists(replica + ".lock")
+
+
+def test_copy_abandoned_after_restarts(temp_db, tmp_path, monkeypatch):
+    """Writes between steps restart a paged copy; past the cap it gives up and removes the file."""
+    writer = database.get_db_connection()
+    steps = []
+
+    def write_between_steps(seconds):
+        steps.append(seconds)
+        writer.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                       "VALUES (?, 'Author', ?, 1, 1)", (f"Book {len(steps)}", f"{len(steps):013d}"))
+        writer.commit()
+
+    monkeypatch.setattr(database.time, "sleep", write_between_steps)
+    source = database.get_db_connection()
+    path = str(tmp_path / "copy.db")
+    with pytest.raises(database.CopyAbandoned):
+        database.copy_database(source, path, pages_per_step=1, pause=0.001, max_restarts=2)
+    source.close()
+    writer.close()
+
+    assert len(steps) == 3
+    assert not os.path.exists(path)
+
+
+def test_refresh_skipped_when_fresh(replica):
+    assert refresh_read_replica() is False
+    assert refresh_read_replica(force=True) is True
+
+
+def test_abandoned_refresh_keeps_snapshot_and_backs_off(replica, monkeypatch):
+    """A refresh starved by writes keeps the old snapshot and isn't retried at once."""
+    calls = []
+
+    def abandon(*args, **kwargs):
+        calls.append(args)
+        raise database.CopyAbandoned("Copy restarted 6 times by concurrent writes.")
+
+    monkeypatch.setattr(database, "copy_database", abandon)
+    monkeypatch.setattr(database, "_replica_retry_at", 0.0)
+    monkeypatch.setattr(database, "READ_REPLICA_MAX_STALENESS", 0.0)
+    insert_book("Second", "Author", "2222222222222", 1, 1)
+
+    assert [b['title'] for b in get_all_books()] == ["First"]
+    wait_for_replica_refresh(5)
+    assert [b['title'] for b in get_all_books()] == ["First"]
+    wait_for_replica_refresh(5)
+    assert len(calls) == 1
+    assert not os.path.exists(replica + ".lock")
@@ -0,0 +1,76 @@
+import gzip
+import zlib
+
+import pytest
+
+import rendering
+from app import create_app
+from database import insert_book
+from repository import unit_of_work
+
+
+@pytest.fixture
+def client(temp_db):
+    for i in range(30):
+        insert_book(f"Book {i % 10}", "Author", f"{i:013d}", 2, 2 if i % 3 else 0)
+    return create_app(dev_mode=False).test_client()
+
+
+def test_catalog_streams_compact_rows(client):
+    """The catalog is streamed and every book gets one row with its own borrow form."""
+    response = client.get('/catalog')
+    assert response.is_streamed
+    html = response.get_data(as_text=True)
+    assert html.count('<tr><td>') == 30
+    assert html.count('name="book_id"') == 20
+    assert html.count('<span class="muted">Unavailable</span>') == 10
+
+
+def test_iter_by_title_pages_through_duplicate_titles(client):
+    """Keyset pages don't skip or repeat books that share a title."""
+    with unit_of_work(read_only=True) as uow:
+        paged = [(b['title'], b['id']) for b in uow.books.iter_by_title(page_size=4)]
+    assert paged == sorted(paged) and len(set(paged)) == 30
+
+
+def test_gzip_negotiated_from_accept_encoding(client):
+    """Clients get gzip when they ask for it, identity otherwise."""
+    plain = client.get('/catalog').get_data()
+    response = client.get('/catalog', headers={'Accept-Encoding': 'br;q=0, gzip;q=0.8'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == plain
+
+    assert 'Content-Encoding' not in client.get('/catalog', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+    # Small bodies aren't worth it
+    assert 'Content-Encoding' not in client.get('/api/holds/123456/1',
+                                                 headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_brotli_preferred_when_installed(client, monkeypatch):
+    """With a brotli module available, br wins over gzip."""
+    class FakeCompressor:
+        def process(self, data):
+            return zlib.compress(data)
+
+        def flush(self):
+            return b''
+
+        def finish(self):
+            return b''
+
+    class FakeBrotli:
+        Compressor = staticmethod(lambda quality: FakeCompressor())
+        compress = staticmethod(lambda data, quality: zlib.compress(data))
+
+    monkeypatch.setattr(rendering, 'brotli', FakeBrotli)
+    response = client.get('/catalog', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.get_data()
+
+
+def test_flash_shown_once_on_streamed_page(client):
+    """A flash rendered by a streamed page is consumed, not repeated."""
+    client.post('/borrow', data={'patron_id': '123456', 'book_id': '2'})
+    assert 'Successfully borrowed' in client.get('/catalog').get_data(as_text=True)
+    assert 'Successfully borrowed' not in client.get('/catalog').get_data(as_text=True)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import clock
+from database import insert_book
+from repository import unit_of_work
+from services.library_service import borrow_book_by_patron, borrow_books_by_patron, return_books_by_patron
+from services.report_cache_service import PatronReportCache, register_report_cache, report_cache
+
+
+@pytest.fixture
+def cache(temp_db):
+    for i in range(1, 4):
+        insert_book(f"Book {i}", "Author", f"{i:013d}", 2, 2)
+    register_report_cache()
+    report_cache.clear()
+    return report_cache
+
+
+def test_repeat_reports_are_cache_hits(cache):
+    """The second report for a patron is served from memory."""
+    first = cache.get("123456")
+    before = cache.stats()
+    assert cache.get("123456") is first
+    assert cache.get("123456", ['borrowed_count']) == {'borrowed_count': 0}
+    stats = cache.stats()
+    assert stats['hits'] == before['hits'] + 2
+    assert stats['entries'] >= 1 and stats['memory_bytes'] > 0
+
+
+def test_borrow_and_return_invalidate_only_that_patron(cache):
+    """Loans and payments for a patron drop their report; other patrons stay cached."""
+    cache.get("123456")
+    other = cache.get("654321")
+
+    borrow_book_by_patron("123456", 1)
+    assert cache.get("123456")['borrowed_count'] == 1
+    borrow_books_by_patron("123456", [2])
+    assert cache.get("123456")['borrowed_count'] == 2
+    return_books_by_patron("123456", [1, 2])
+    report = cache.get("123456")
+    assert report['borrowed_count'] == 0
+
+    with unit_of_work() as uow:
+        uow.payments.add("123456", 1, 1.5, "txn_1")
+    assert cache.get("123456") is not report
+    assert cache.get("654321") is other
+
+
+def test_day_rollover_recomputes_fees(cache):
+    """A report from yesterday is not served today, so fees keep accruing."""
+    start = datetime(2026, 3, 1, 12, 0)
+    with clock.frozen(start - timedelta(days=20)):
+        borrow_book_by_patron("123456", 1)
+    with clock.frozen(start):
+        fee = cache.get("123456")['total_late_fees']
+    with clock.frozen(start + timedelta(days=1)):
+        assert cache.get("123456")['total_late_fees'] > fee
+    assert cache.stats()['day_rollovers'] == 1
+
+
+def test_stale_report_served_while_refreshing(temp_db):
+    """Past its fresh age a report is served once more and refreshed in the background."""
+    cache = PatronReportCache(fresh_seconds=0, stale_seconds=60)
+    stale = cache.get("123456")
+    assert cache.get("123456") is stale
+    cache.wait_for_refreshes()
+    stats = cache.stats()
+    assert stats['stale_hits'] == 1 and stats['refreshes'] == 1
+    assert cache.get("123456") is not stale
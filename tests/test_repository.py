@@ -0,0 +1,87 @@
+import pytest
+from unittest.mock import Mock
+
+import repository
+from database import insert_book
+from repository import MemoryStore, unit_of_work
+from services.library_service import (
+    borrow_books_by_patron, pay_late_fees, refund_late_fee_payment, return_books_by_patron
+)
+
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    store = MemoryStore()
+    store.add_book("Gatsby", "Fitzgerald", "1111111111111", 1)
+    store.add_book("1984", "Orwell", "2222222222222", 2)
+    monkeypatch.setattr(repository, "STORE", store)
+    return store
+
+
+def test_batch_borrow_and_return_in_memory(memory_store):
+    """The batch service functions run unchanged on the in-memory backend."""
+    success, _, results = borrow_books_by_patron("123456", [1, 2, 1])
+
+    assert success
+    assert [r['success'] for r in results] == [True, True, False]
+    assert memory_store.books[1]['available_copies'] == 0
+
+    memory_store.add_hold("654321", 1)
+    success, _, results = return_books_by_patron("123456", [1, 2])
+    assert success
+    # Gatsby's copy went to the waiting hold, 1984 went back on the shelf
+    assert memory_store.books[1]['available_copies'] == 0
+    assert memory_store.books[2]['available_copies'] == 2
+    assert memory_store.holds[1]['status'] == 'ready'
+
+
+def test_memory_rollback_undoes_changes(memory_store):
+    """An exception inside the unit of work restores every row it touched."""
+    with pytest.raises(RuntimeError):
+        with unit_of_work() as uow:
+            uow.books.adjust_available({1: -1})
+            uow.payments.add("123456", 1, 2.5, "txn_1")
+            raise RuntimeError("boom")
+
+    assert memory_store.books[1]['available_copies'] == 1
+    assert memory_store.payments == {}
+
+
+def test_unit_of_work_backends_must_implement_hooks():
+    """A backend missing _commit/_rollback/_notify fails at construction, not at commit."""
+    class Incomplete(repository.UnitOfWork):
+        def _commit(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_sqlite_unit_of_work_commits_once(temp_db):
+    """Repository calls share one transaction that is visible only after commit."""
+    insert_book("Gatsby", "Fitzgerald", "1111111111111", 3, 3)
+
+    with unit_of_work() as uow:
+        uow.books.adjust_available({1: -2})
+        with unit_of_work(read_only=True) as reader:
+            assert reader.books.get(1)['available_copies'] == 3
+    with unit_of_work(read_only=True) as reader:
+        assert reader.books.get(1)['available_copies'] == 1
+
+
+def test_payments_are_recorded_in_ledger(temp_db, mocker):
+    """Successful payments and refunds of them are written to the payments table."""
+    mocker.patch('services.library_service.calculate_late_fee_for_book',
+                 return_value={'fee_amount': 3.5, 'days_overdue': 7})
+    mocker.patch('services.library_service.get_book_by_id', return_value={'id': 1, 'title': 'Gatsby'})
+    gateway = Mock()
+    gateway.process_payment.return_value = (True, "txn_42", "Success")
+    gateway.refund_payment.return_value = (True, "Refunded")
+
+    assert pay_late_fees("123456", 1, gateway)[0]
+    assert refund_late_fee_payment("txn_42", 3.5, gateway)[0]
+
+    with unit_of_work(read_only=True) as uow:
+        ledger = uow.payments.for_patron("123456")
+    assert [(p['kind'], p['amount'], p['book_id']) for p in ledger] == [
+        ('payment', 3.5, 1), ('refund', 3.5, 1)]
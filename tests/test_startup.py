@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+import database
+import migrations
+from app import create_app
+from database import init_database, get_db_connection, get_all_books
+
+
+def test_init_database_creates_schema(temp_db):
+    """First init on an empty file records the schema version."""
+    conn = get_db_connection()
+    assert database.get_schema_version(conn) == migrations.latest_version()
+    conn.close()
+
+
+def test_init_database_skips_when_current(temp_db):
+    """Second init should not redo schema work."""
+    assert init_database() is False
+
+
+def test_create_app_does_not_seed_by_default(temp_db, monkeypatch):
+    """Production start-up must not insert sample books."""
+    monkeypatch.delenv("LIBRARY_DEV_MODE", raising=False)
+    app = create_app()
+    assert app.config["DEV_MODE"] is False
+    assert get_all_books() == []
+
+
+def test_create_app_seeds_in_dev_mode(temp_db):
+    """Explicit dev mode seeds the sample catalog."""
+    create_app(dev_mode=True)
+    assert len(get_all_books()) == 3
+
+
+def test_create_app_dev_mode_from_env(temp_db, monkeypatch):
+    """LIBRARY_DEV_MODE=1 enables seeding."""
+    monkeypatch.setenv("LIBRARY_DEV_MODE", "1")
+    assert create_app().config["DEV_MODE"] is True
+
+
+def test_library_service_does_not_import_payment_stack():
+    """Importing the service layer should not pull in requests."""
+    code = (
+        "import sys, services.library_service; "
+        "print('requests' in sys.modules, 'services.payment_service' in sys.modules)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False", "False"]
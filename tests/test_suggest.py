@@ -0,0 +1,75 @@
+import pytest
+
+import services.suggest_service as suggest_service
+from app import create_app
+from database import add_sample_data, insert_book
+from services.library_service import borrow_book_by_patron
+from services.suggest_service import SuggestIndex, register_suggest_updates
+
+
+@pytest.fixture
+def index(temp_db):
+    add_sample_data()
+    return SuggestIndex()
+
+
+def test_prefix_matches_any_word(index):
+    assert [s['title'] for s in index.suggest("gats")] == ["The Great Gatsby"]
+    assert [s['title'] for s in index.suggest("george o")] == ["1984"]
+
+
+def test_author_match_reported(index):
+    result = index.suggest("harp")
+    assert result[0]['matched'] == 'author'
+    assert result[0]['title'] == "To Kill a Mockingbird"
+
+
+def test_ranked_by_popularity(index):
+    insert_book("The Great Expectations", "Dickens", "1111111111111", 5, 5)
+    for patron in ("111111", "222222"):
+        borrow_book_by_patron(patron, 4)
+
+    assert [s['title'] for s in index.suggest("the great")] == ["The Great Expectations", "The Great Gatsby"]
+
+
+def test_limit_and_empty_prefix(index):
+    assert len(index.suggest("t", limit=1)) == 1
+    assert index.suggest("  ") == []
+
+
+def test_insert_updates_built_index(index, monkeypatch):
+    import database
+    monkeypatch.setattr(database, "book_insert_listeners", [])
+    monkeypatch.setattr(suggest_service, "suggest_index", index)
+    register_suggest_updates()
+    index.suggest("x")  # build
+
+    insert_book("Xenogenesis", "Octavia Butler", "1111111111111", 1, 1)
+
+    assert [s['title'] for s in index.suggest("xeno")] == ["Xenogenesis"]
+
+
+def test_refresh_picks_up_other_writers(index):
+    index.suggest("x")
+    insert_book("Xanadu", "Someone", "1111111111111", 1, 1)  # no listener registered
+    index.refresh(force=True)
+    assert [s['title'] for s in index.suggest("xan")] == ["Xanadu"]
+
+
+def test_large_slices_use_cache(index, monkeypatch):
+    monkeypatch.setattr(suggest_service, "SCAN_LIMIT", 0)
+    first = index.suggest("t")
+    assert index._top_cache
+    assert index.suggest("t") == first
+
+
+def test_suggest_endpoint(temp_db, monkeypatch):
+    add_sample_data()
+    monkeypatch.setattr(suggest_service, "suggest_index", SuggestIndex())
+    import routes.api_routes as api_routes
+    monkeypatch.setattr(api_routes, "suggest_index", suggest_service.suggest_index)
+    client = create_app().test_client()
+
+    data = client.get('/api/suggest?q=orw').get_json()
+    assert data['suggestions'][0]['title'] == "1984"
+    assert client.get('/api/suggest?q=a&limit=x').status_code == 400
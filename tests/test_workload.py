@@ -0,0 +1,45 @@
+import random
+from collections import Counter, defaultdict
+
+from services.library_service import MAX_BOOKS_PER_PATRON
+from workload import ZipfSampler, build_dataset, generate_trace, replay, replay_app
+
+
+def test_zipf_sampler_is_skewed():
+    """The most popular rank is drawn far more often than the median one."""
+    sampler = ZipfSampler(1000, rng=random.Random(1))
+    counts = Counter(sampler.sample() for _ in range(20000))
+    assert counts[0] > 20 * max(counts[500], 1)
+    assert max(counts) < 1000
+
+
+def test_trace_is_seeded_and_respects_limits(temp_db):
+    """The same seed gives the same trace; patrons never exceed 5 books or copies."""
+    catalog = build_dataset(temp_db, 50)
+    trace = list(generate_trace(catalog, 20, 2000, seed=7, days=180))
+    assert trace == list(generate_trace(catalog, 20, 2000, seed=7, days=180))
+
+    copies = {book['id']: book['copies'] for book in catalog}
+    held = defaultdict(set)
+    for entry in trace:
+        if entry['op'] == 'borrow':
+            held[entry['patron_id']].update(entry['json']['book_ids'])
+        elif entry['op'] == 'return':
+            held[entry['patron_id']].difference_update(entry['json']['book_ids'])
+        assert len(held[entry['patron_id']]) <= MAX_BOOKS_PER_PATRON
+        on_loan = Counter(book for books in held.values() for book in books)
+        assert all(on_loan[book] <= copies[book] for book in on_loan)
+    assert {entry['op'] for entry in trace} == {'search', 'borrow', 'return', 'late_fee', 'pay'}
+
+
+def test_replay_reports_latency_without_errors(temp_db):
+    """Replaying a generated trace in-process succeeds and reports percentiles."""
+    catalog = build_dataset(temp_db, 30)
+    trace = list(generate_trace(catalog, 10, 300, seed=3, days=60))
+    app = replay_app(temp_db)
+
+    report = replay(trace, workers=3, app=app)
+    assert report['requests'] == 300
+    assert report['errors'] == 0
+    assert report['latency_ms']['p50'] <= report['latency_ms']['p99'] <= report['latency_ms']['max']
+    assert report['by_op']['pay']['requests'] == app.config['PAYMENT_GATEWAY'].charges
@@ -0,0 +1,512 @@
+"""
+Workload Module - Synthetic datasets and request traces for capacity planning
+
+generate builds a seeded library database (books with Zipf-distributed
+popularity and 1-5 copies each) and a matching JSON-lines request trace:
+searches, batch borrows and returns that respect the 5-book limit and the
+copies on the shelf, late-fee lookups and fee payments for overdue loans.
+Every entry carries the simulated time it happens at, so a trace spanning
+months replays in minutes through the X-Clock-Now header (see clock.py).
+
+replay drives the app with a trace at a target rate and reports throughput,
+error rate and latency percentiles. Requests of one patron always go through
+the same worker, in trace order; latency is measured from the time a request
+was scheduled, so a server falling behind shows up in the percentiles instead
+of silently slowing the sender down.
+
+Usage:
+    python workload.py generate [--books N] [--patrons N] [--requests N] [--days N] [--seed N]
+                                [--db PATH] [--trace PATH]
+    python workload.py replay [--db PATH] [--trace PATH] [--rate N] [--workers N] [--url URL]
+                              [--profile-sql]
+"""
+
+import argparse
+import bisect
+import heapq
+import json
+import queue
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import database
+from profiler import enable_profiling
+from search_index import index_book
+from services.library_service import MAX_BOOKS_PER_PATRON
+
+# Load tests send the simulated time in this header
+CLOCK_HEADER = 'X-Clock-Now'
+
+# Share of each operation in a generated trace
+OPERATION_MIX = (
+    ('search', 0.40),
+    ('borrow', 0.25),
+    ('return', 0.20),
+    ('late_fee', 0.10),
+    ('pay', 0.05),
+)
+
+# Popularity of the k-th most popular book is proportional to 1 / k**ZIPF_EXPONENT
+ZIPF_EXPONENT = 1.1
+
+LOAN_DAYS = 14
+
+# Share of loans returned after the due date (the rest come back early or on time)
+LATE_RETURN_SHARE = 0.2
+
+# A returned copy is not lent out again by the trace for this many requests,
+# so a borrow can't overtake the return that freed its copy during a replay
+RETURN_SETTLE_REQUESTS = 500
+
+DEFAULT_WORKERS = 8
+
+# Entries waiting per replay worker before the sender blocks
+WORKER_QUEUE_SIZE = 100
+
+TITLE_WORDS = [
+    'river', 'shadow', 'garden', 'winter', 'empire', 'silent', 'glass', 'harbor',
+    'machine', 'orchard', 'lantern', 'stone', 'northern', 'kingdom', 'paper', 'secret',
+    'island', 'summer', 'iron', 'forest', 'letters', 'midnight', 'salt', 'city',
+    'daughter', 'storm', 'golden', 'last', 'wild', 'memory', 'ocean', 'crown',
+]
+FIRST_NAMES = ['Ada', 'Ben', 'Chloe', 'Dev', 'Elena', 'Farah', 'Gus', 'Hana', 'Ivan', 'June',
+               'Kofi', 'Lena', 'Mateo', 'Nora', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sam', 'Tariq']
+LAST_NAMES = ['Abbott', 'Brennan', 'Castillo', 'Dubois', 'Eriksen', 'Fujita', 'Gallagher',
+              'Haddad', 'Ivanova', 'Jensen', 'Kowalski', 'Lindqvist', 'Moreau', 'Nakamura',
+              'Okafor', 'Petrov', 'Quintero', 'Rahman', 'Silva', 'Tanaka']
+
+
+class ZipfSampler:
+    """Draw ranks 0..n-1 with probability proportional to 1 / (rank + 1)**exponent."""
+
+    def __init__(self, n: int, exponent: float = ZIPF_EXPONENT, rng: Optional[random.Random] = None):
+        self._cumulative = list(accumulate(1.0 / (k + 1) ** exponent for k in range(n)))
+        self._rng = rng or random.Random()
+
+    def sample(self) -> int:
+        point = self._rng.random() * self._cumulative[-1]
+        return min(bisect.bisect(self._cumulative, point), len(self._cumulative) - 1)
+
+
+class StubPaymentGateway:
+    """Approves every charge, after an optional simulated gateway delay."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.charges = 0
+        self._lock = threading.Lock()
+
+    def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.charges += 1
+            number = self.charges
+        return True, f"txn_stub_{number:08d}", "Approved"
+
+    def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
+        return True, "Refunded"
+
+
+def build_dataset(path: str, books: int, seed: int = 42) -> List[Dict]:
+    """
+    Create a library database with `books` generated titles and their copies.
+
+    Points database.DATABASE at `path`.
+
+    Returns:
+        list: id, title and copies of every book, in ID order
+    """
+    rng = random.Random(seed)
+    database.DATABASE = path
+    database.init_database()
+    catalog = []
+    conn = database.get_db_connection()
+    for i in range(books):
+        title = ' '.join(rng.sample(TITLE_WORDS, rng.randint(2, 4))).title()
+        author = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        copies = rng.choice((1, 1, 2, 2, 3, 5))
+        cursor = conn.execute('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (title, author, f'{9780000000000 + i:013d}', copies, copies))
+        index_book(conn, cursor.lastrowid, title, author)
+        database.create_copies(conn, cursor.lastrowid, ['available'] * copies)
+        catalog.append({'id': cursor.lastrowid, 'title': title, 'copies': copies})
+    conn.commit()
+    conn.close()
+    return catalog
+
+
+class _ActivePatrons:
+    """Patrons with open loans, with O(1) add, remove and random choice."""
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def __bool__(self):
+        return bool(self._ids)
+
+    def add(self, patron_id: str):
+        if patron_id not in self._index:
+            self._index[patron_id] = len(self._ids)
+            self._ids.append(patron_id)
+
+    def remove(self, patron_id: str):
+        index = self._index.pop(patron_id)
+        last = self._ids.pop()
+        if last != patron_id:
+            self._ids[index] = last
+            self._index[last] = index
+
+    def choice(self, rng: random.Random) -> str:
+        return rng.choice(self._ids)
+
+
+def _entry(op: str, method: str, path: str, patron_id: Optional[str], at: datetime,
+           body: Optional[Dict] = None) -> Dict:
+    entry = {'op': op, 'method': method, 'path': path, 'patron_id': patron_id, 'clock': at.isoformat()}
+    if body is not None:
+        entry['json'] = body
+    return entry
+
+
+def _next_returner(returning: List[Tuple[datetime, str, int]],
+                   loans: Dict[str, Dict[int, Tuple[datetime, datetime]]], now: datetime) -> Optional[str]:
+    """Patron whose earliest planned return has come, dropping plans of finished loans."""
+    while returning:
+        planned, patron_id, book_id = returning[0]
+        if loans[patron_id].get(book_id, (None, None))[1] == planned:
+            return patron_id if planned <= now else None
+        heapq.heappop(returning)
+    return None
+
+
+def generate_trace(catalog: List[Dict], patrons: int, requests: int, seed: int = 42,
+                   start: Optional[datetime] = None, days: int = 90) -> Iterator[Dict]:
+    """
+    Yield a request trace against a catalog from build_dataset().
+
+    The trace models the library state as it goes: borrows only take books
+    with a copy on the shelf and never push a patron past the 5-book limit,
+    each loan gets a planned return time (LATE_RETURN_SHARE of them after the
+    due date) and is returned by the first return request after it, fee
+    lookups name books the patron has, and payments are only made (once) for
+    overdue loans. Operations that can't apply yet (a return before any loan
+    is due back) become searches.
+
+    Args:
+        catalog: Books as returned by build_dataset()
+        patrons: Number of distinct patron IDs
+        requests: Trace length
+        seed: Random seed; the same arguments always give the same trace
+        start: Simulated time of the first request
+        days: Simulated time the trace spans
+
+    Yields:
+        dict: op, method, path, patron_id, clock (ISO-8601) and json body if any
+    """
+    rng = random.Random(seed)
+    start = start or datetime(2026, 1, 5, 9, 0)
+    step = timedelta(days=days) / max(requests, 1)
+    ops, weights = zip(*OPERATION_MIX)
+
+    ranked = [book['id'] for book in catalog]
+    rng.shuffle(ranked)
+    popularity = ZipfSampler(len(ranked), rng=rng)
+    titles = {book['id']: book['title'].lower().split() for book in catalog}
+    on_shelf = {book['id']: book['copies'] for book in catalog}
+    settling = deque()
+    patron_ids = [f'{100000 + i:06d}' for i in range(patrons)]
+    # patron -> book -> (due date, planned return time)
+    loans: Dict[str, Dict[int, Tuple[datetime, datetime]]] = defaultdict(dict)
+    returning: List[Tuple[datetime, str, int]] = []
+    active = _ActivePatrons()
+    paid = set()
+
+    for i in range(requests):
+        now = start + step * i
+        while settling and settling[0][0] <= i:
+            on_shelf[settling.popleft()[1]] += 1
+
+        op = rng.choices(ops, weights)[0]
+        if op == 'return':
+            patron_id = _next_returner(returning, loans, now)
+        elif op != 'borrow' and active:
+            patron_id = active.choice(rng)
+        else:
+            patron_id = None
+        patron_id = patron_id or rng.choice(patron_ids)
+        patron_loans = loans[patron_id]
+
+        if op == 'borrow' and len(patron_loans) < MAX_BOOKS_PER_PATRON:
+            wanted = min(rng.choice((1, 1, 1, 2, 3)), MAX_BOOKS_PER_PATRON - len(patron_loans))
+            book_ids = []
+            for _ in range(wanted * 3):
+                book_id = ranked[popularity.sample()]
+                if on_shelf[book_id] > 0 and book_id not in patron_loans and book_id not in book_ids:
+                    book_ids.append(book_id)
+                    if len(book_ids) == wanted:
+                        break
+            if book_ids:
+                for book_id in book_ids:
+                    on_shelf[book_id] -= 1
+                    if rng.random() < LATE_RETURN_SHARE:
+                        kept = rng.uniform(LOAN_DAYS + 1, LOAN_DAYS + 30)
+                    else:
+                        kept = rng.uniform(1, LOAN_DAYS)
+                    planned = now + timedelta(days=kept)
+                    patron_loans[book_id] = (now + timedelta(days=LOAN_DAYS), planned)
+                    heapq.heappush(returning, (planned, patron_id, book_id))
+                active.add(patron_id)
+                yield _entry('borrow', 'POST', '/api/borrow/batch', patron_id, now,
+                             {'patron_id': patron_id, 'book_ids': book_ids})
+                continue
+
+        elif op == 'return' and returning and returning[0][0] <= now:
+            book_ids = sorted(book_id for book_id, (_, planned) in patron_loans.items() if planned <= now)
+            for book_id in book_ids:
+                del patron_loans[book_id]
+                paid.discard((patron_id, book_id))
+                settling.append((i + RETURN_SETTLE_REQUESTS, book_id))
+            if not patron_loans:
+                active.remove(patron_id)
+            yield _entry('return', 'POST', '/api/return/batch', patron_id, now,
+                         {'patron_id': patron_id, 'book_ids': book_ids})
+            continue
+
+        elif op in ('late_fee', 'pay') and patron_loans:
+            overdue = [book_id for book_id, (due, _) in patron_loans.items()
+                       if due.date() < now.date() and (patron_id, book_id) not in paid]
+            if op == 'pay' and overdue:
+                book_id = rng.choice(overdue)
+                paid.add((patron_id, book_id))
+                yield _entry('pay', 'POST', f'/api/late_fee/{patron_id}/{book_id}/pay', patron_id, now)
+                continue
+            book_id = rng.choice(list(patron_loans))
+            yield _entry('late_fee', 'GET', f'/api/late_fee/{patron_id}/{book_id}', patron_id, now)
+            continue
+
+        word = rng.choice(titles[ranked[popularity.sample()]])
+        yield _entry('search', 'GET', f'/api/search?q={quote(word)}', patron_id, now)
+
+
+def write_trace(entries: Iterable[Dict], path: str) -> int:
+    """Write trace entries as JSON lines; returns the number written."""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as out:
+        for entry in entries:
+            out.write(json.dumps(entry) + '\n')
+            count += 1
+    return count
+
+
+def read_trace(path: str) -> Iterator[Dict]:
+    """Read a trace written by write_trace()."""
+    with open(path, encoding='utf-8') as trace:
+        for line in trace:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def _latency_summary(seconds: List[float]) -> Dict:
+    ordered = sorted(seconds)
+    return {
+        'p50': round(_percentile(ordered, 0.50) * 1000, 3),
+        'p90': round(_percentile(ordered, 0.90) * 1000, 3),
+        'p99': round(_percentile(ordered, 0.99) * 1000, 3),
+        'max': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def _app_sender(app):
+    """Send entries through Flask test clients (one per worker thread)."""
+    local = threading.local()
+
+    def send(entry: Dict, headers: Dict) -> Tuple[int, Optional[Dict]]:
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        response = local.client.open(entry['path'], method=entry['method'],
+                                     json=entry.get('json'), headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+    return send
+
+
+def _http_sender(base_url: str, timeout: float = 30.0):
+    """Send entries to a running server (one HTTP session per worker thread)."""
+    import requests
+
+    local = threading.local()
+
+    def send(entry: Dict, headers: Dict) -> Tuple[int, Optional[Dict]]:
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        response = local.session.request(entry['method'], base_url.rstrip('/') + entry['path'],
+                                         json=entry.get('json'), headers=headers, timeout=timeout)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    return send
+
+
+def _failed(status: int, body: Optional[Dict]) -> bool:
+    # Batch endpoints answer 200 with success=false when no book went through
+    return status == 0 or status >= 400 or (isinstance(body, dict) and body.get('success') is False)
+
+
+def replay(trace: Iterable[Dict], rate: Optional[float] = None, workers: int = DEFAULT_WORKERS,
+           app=None, url: Optional[str] = None) -> Dict:
+    """
+    Drive the app with a trace and measure it.
+
+    Args:
+        trace: Entries from generate_trace() or read_trace()
+        rate: Target requests per second (None sends as fast as workers allow)
+        workers: Concurrent senders; a patron's requests always use the same one
+        app: Flask app to call in-process (ignored when url is given)
+        url: Base URL of a running server, e.g. http://localhost:5000. The
+            server must have LIBRARY_CLOCK_HEADER=X-Clock-Now for simulated time.
+
+    Returns:
+        dict: requests, duration, throughput, error rate, status codes,
+        latency percentiles (ms) overall and per operation
+    """
+    send = _http_sender(url) if url else _app_sender(app)
+    queues = [queue.Queue(WORKER_QUEUE_SIZE) for _ in range(workers)]
+    results = [[] for _ in range(workers)]
+
+    def work(index: int):
+        inbox, out = queues[index], results[index]
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            entry, scheduled = item
+            began = scheduled if scheduled is not None else time.perf_counter()
+            headers = {CLOCK_HEADER: entry['clock'], 'X-Client-ID': entry.get('patron_id') or f'replay-{index}'}
+            try:
+                status, body = send(entry, headers)
+            except Exception:
+                status, body = 0, None
+            out.append((entry['op'], status, _failed(status, body), time.perf_counter() - began))
+
+    threads = [threading.Thread(target=work, args=(i,), daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    sent = 0
+    for sent, entry in enumerate(trace, start=1):
+        scheduled = None
+        if rate:
+            scheduled = start + (sent - 1) / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        patron_id = entry.get('patron_id')
+        target = hash(patron_id) % workers if patron_id else sent % workers
+        queues[target].put((entry, scheduled))
+    for inbox in queues:
+        inbox.put(None)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    outcomes = [outcome for worker in results for outcome in worker]
+    by_op = defaultdict(list)
+    for outcome in outcomes:
+        by_op[outcome[0]].append(outcome)
+    errors = sum(1 for outcome in outcomes if outcome[2])
+    return {
+        'requests': sent,
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(sent / elapsed, 1) if elapsed else 0.0,
+        'target_rps': rate,
+        'errors': errors,
+        'error_rate': round(errors / sent, 4) if sent else 0.0,
+        'status_codes': dict(sorted(Counter(str(outcome[1]) for outcome in outcomes).items())),
+        'latency_ms': _latency_summary([outcome[3] for outcome in outcomes]),
+        'by_op': {
+            op: {'requests': len(rows), 'errors': sum(1 for row in rows if row[2]),
+                 **_latency_summary([row[3] for row in rows])}
+            for op, rows in sorted(by_op.items())
+        },
+    }
+
+
+def replay_app(db_path: str, payment_latency: float = 0.0):
+    """
+    Create an app on `db_path` that accepts simulated time and uses a stub gateway.
+
+    Per-client rate limits are lifted: a replay compresses weeks of one
+    patron's requests into seconds, which no real client would send. The
+    in-flight request cap still applies.
+    """
+    from app import create_app
+
+    database.DATABASE = db_path
+    app = create_app(dev_mode=False)
+    limiter = app.extensions['rate_limiter']
+    limiter.limits = {group: (1e9, 10 ** 9) for group in limiter.limits}
+    app.config['CLOCK_HEADER'] = CLOCK_HEADER
+    app.config['PAYMENT_GATEWAY'] = StubPaymentGateway(payment_latency)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate and replay synthetic library traffic.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='build a dataset and a matching trace')
+    generate.add_argument('--books', type=int, default=10000)
+    generate.add_argument('--patrons', type=int, default=2000)
+    generate.add_argument('--requests', type=int, default=100000)
+    generate.add_argument('--days', type=int, default=90)
+    generate.add_argument('--seed', type=int, default=42)
+    generate.add_argument('--db', default='workload.db')
+    generate.add_argument('--trace', default='workload.jsonl')
+
+    replay_cmd = commands.add_parser('replay', help='replay a trace and report latency')
+    replay_cmd.add_argument('--db', default='workload.db')
+    replay_cmd.add_argument('--trace', default='workload.jsonl')
+    replay_cmd.add_argument('--rate', type=float, default=None, help='requests per second (default: unpaced)')
+    replay_cmd.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    replay_cmd.add_argument('--limit', type=int, default=None, help='replay only the first N requests')
+    replay_cmd.add_argument('--payment-latency', type=float, default=0.0, help='stub gateway delay (s)')
+    replay_cmd.add_argument('--url', default=None, help='replay against a running server instead')
+    replay_cmd.add_argument('--profile-sql', action='store_true', help='add the busiest SQL statements')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        catalog = build_dataset(args.db, args.books, args.seed)
+        count = write_trace(generate_trace(catalog, args.patrons, args.requests, args.seed, days=args.days),
+                            args.trace)
+        print(f"Wrote {len(catalog)} books to {args.db} and {count} requests to {args.trace}")
+        return
+
+    profiler = enable_profiling() if args.profile_sql and not args.url else None
+    app = None if args.url else replay_app(args.db, args.payment_latency)
+    report = replay(islice(read_trace(args.trace), args.limit), args.rate, args.workers, app, args.url)
+    if profiler:
+        report['sql'] = profiler.summary(limit=10)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()